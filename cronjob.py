@@ -1,17 +1,22 @@
 #!/usr/bin/env /path/to/.venv/bin/python3
 
 import datetime
-import json
+import hashlib
 import logging
 import os
 import sys
-from typing import Dict, List
+import tempfile
+from dataclasses import dataclass
+from typing import IO, Dict, Optional
 
-import requests
 from azure.storage.blob import BlobClient, BlobServiceClient
 from azure.storage.blob import ContainerClient as BlobContainerClient
 from tqdm import tqdm
 
+from src.common.changes import get_change_marker
+from src.common.fetch import download, fetch_all
+from src.common.storage import get_blob_metadata, upload_stream
+
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 
@@ -26,31 +31,81 @@ PATH_XV = "https://app.parlamento.pt/webutils/docs/doc.txt?path=6148523063446f76
 PATH_XVI = "https://app.parlamento.pt/webutils/docs/doc.txt?path=9%2bS1R0rmlrJvA0k2UXLx9yXhooCL9aOS1uwNJphMqHhYpUJSfAZL3TuTXUSEdgr0rEqcbxbKyZ8kkqjsINFMLdFXsUnM%2ffrx2L%2bqlZZftbIFjCovRHvFD1l%2bEhYNkY5XJyJr8JB%2brn0T%2fU3ryaefr2nendsQE9PEZevIlvAUVSXpDfYXejIDMEK6PLJ1fAgqrpwN1mQ33joes2PSsmGkTJ16S7ccT94syYr4ehW2V3Kj3yAMuDHW68rp8MCMl1QfCCBu52Fo%2bhdG6ax7R5OHARHV0l8PXrC2deUDz1R6kaF7rIpQiSDX%2fRhM8E1OrXS%2fziFr1wbBtE1zThR4P%2basXA%3d%3d&fich=IniciativasXVI_json.txt&Inline=true"
 
 ALL_PATHS = [
-    #  ("XIV", PATH_XIV),  # no need since the file is not being updated
+    # not updated anymore, but unchanged files are not downloaded again
+    ("XIV", PATH_XIV),
     ("XV", PATH_XV),
     ("XVI", PATH_XVI),
 ]
 
 
-def get_raw_data(path: str) -> List[Dict]:
-    """Load the most recent data provided by Parlamento"""
+CHUNK_SIZE = 1024 * 1024
 
-    try:
-        payload = requests.get(
-            path,
-            # fake, but wihtout it the request is rejected
-            headers={
-                "User-Agent": "Mozilla/5.0",
-            },
-            #timeout=40,
-        )
-        assert payload.status_code == 200
 
-        return payload.json()
+@dataclass
+class RawData:
+    # validators and content hash to be stored with the blob
+    metadata: Dict[str, str]
+    # downloaded content, None when it did not change
+    file: Optional[IO[bytes]] = None
+
+    @property
+    def changed(self) -> bool:
+        return self.file is not None
+
+
+def get_raw_data(path: str, metadata: Dict[str, str]) -> RawData:
+    """
+    Download the most recent data provided by Parlamento to a temporary file.
+
+    `metadata` is the one stored with the previous download. It is used to make
+    a conditional request, when the source supports it, and otherwise to detect
+    that the content did not change through its hash.
+    """
+
+    headers = {}
+    if metadata.get("source_etag"):
+        headers["If-None-Match"] = metadata["source_etag"]
+    if metadata.get("source_last_modified"):
+        headers["If-Modified-Since"] = metadata["source_last_modified"]
+
+    file = tempfile.TemporaryFile()
+    try:
+        # resumed when interrupted, these files have several MB
+        payload = download(path, file, headers=headers)
+        if payload.status_code == 304:
+            file.close()
+            return RawData(metadata=metadata)
+
+        payload.raise_for_status()
+
+        file.seek(0)
+        content_hash = hashlib.sha256()
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+
+        new_metadata = {"content_sha256": content_hash.hexdigest()}
+        if payload.headers.get("ETag"):
+            new_metadata["source_etag"] = payload.headers["ETag"]
+        if payload.headers.get("Last-Modified"):
+            new_metadata["source_last_modified"] = payload.headers["Last-Modified"]
     except Exception:
+        file.close()
         logger.exception(f"Error downloading {path}.")
         raise
 
+    if new_metadata["content_sha256"] == metadata.get("content_sha256"):
+        file.close()
+        return RawData(metadata=new_metadata)
+
+    # an error page instead of the json file
+    file.seek(0)
+    if file.read(16).lstrip(b"\xef\xbb\xbf \t\r\n")[:1] not in (b"[", b"{"):
+        file.close()
+        raise ValueError(f"{path} did not return a json file.")
+
+    file.seek(0)
+    return RawData(metadata=new_metadata, file=file)
+
 
 def get_blob_container() -> BlobContainerClient:
     """
@@ -89,21 +144,54 @@ if __name__ == "__main__":
     # Get Blob Storage client
     blob_storage_container_client = get_blob_container()
 
-    # Go through each supported legislature and download it
-    for legislature_name, legislature_path in tqdm(
-        ALL_PATHS, "processing_legislatures", file=sys.stdout
+    blob_clients: Dict[str, BlobClient] = {
+        legislature_name: blob_storage_container_client.get_blob_client(
+            f"{legislature_name}.json"
+        )
+        for legislature_name, _ in ALL_PATHS
+    }
+    metadatas = {
+        legislature_name: get_blob_metadata(blob_client)
+        for legislature_name, blob_client in blob_clients.items()
+    }
+
+    # download all legislatures at the same time
+    all_data = fetch_all(
+        lambda x: get_raw_data(x[1], metadatas[x[0]]),
+        ALL_PATHS,
+    )
+
+    # Go through each supported legislature and upload it
+    for (legislature_name, _), data in tqdm(
+        list(zip(ALL_PATHS, all_data)), "processing_legislatures", file=sys.stdout
     ):
         logger.info(f"Start processing {legislature_name}")
 
-        data = get_raw_data(legislature_path)
+        blob_client = blob_clients[legislature_name]
+        metadata = metadatas[legislature_name]
 
         try:
-            blob_client: BlobClient = blob_storage_container_client.get_blob_client(
-                f"{legislature_name}.json"
-            )
-            blob_client.upload_blob(json.dumps(data), overwrite=True)
+            if data.changed:
+                # the content hash in the metadata lets the daily updater
+                # know if there is something new to process
+                with data.file:
+                    upload_stream(blob_client, data.file, metadata=data.metadata)
+            else:
+                logger.info(f"{legislature_name} did not change, skipping upload.")
+                if data.metadata != metadata:
+                    blob_client.set_blob_metadata(data.metadata)
         except Exception:
             logger.exception(f"Error processing {legislature_name}.")
             raise
 
+    # lets the daily updater process the new raw data right away, only
+    # written when some hash changed
+    get_change_marker(blob_storage_container_client).write(
+        {
+            legislature_name: data.metadata["content_sha256"]
+            for (legislature_name, _), data in zip(ALL_PATHS, all_data)
+            if data.metadata.get("content_sha256")
+        }
+    )
+
     logger.info("Done.")
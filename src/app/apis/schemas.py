@@ -26,6 +26,28 @@ class PartyCorrelationsOut(BaseModel):
     partido: List[PartyCorrelations]
 
 
+class DeputyVoteStats(BaseModel):
+    votacoes: int
+    presencas: int
+    divergencias: int
+    rebeldias: int
+    assiduidade: Optional[float]
+    concordancia: Optional[float]
+    rebeldia: Optional[float]
+
+
+class DeputyMonthStats(DeputyVoteStats):
+    mes: str
+
+
+class DeputyStatsOut(BaseModel):
+    id: str
+    nome: str
+    partido: Optional[str]
+    total: DeputyVoteStats
+    meses: List[DeputyMonthStats]
+
+
 class EventPhase(str, Enum):
     GENERALIDADE = "Votação na generalidade"
     ESPECIALIDADE = "Votação na especialidade"
@@ -39,6 +61,46 @@ class Legislature(str, Enum):
     XVI = "XVI"
 
 
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class ColumnarDataset(str, Enum):
+    VOTES = "votes"
+    PARTY_APPROVALS = "party-approvals"
+    PARTY_CORRELATIONS = "party-correlations"
+
+
+class ColumnarFormat(str, Enum):
+    ARROW = "arrow"
+    PARQUET = "parquet"
+
+
+class BatchStatistic(str, Enum):
+    PARTY_APPROVALS = "party-approvals"
+    PARTY_CORRELATIONS = "party-correlations"
+    INITIATIVES = "initiatives"
+
+
+class BatchQuery(BaseModel):
+    statistic: BatchStatistic
+    legislature: Legislature = Legislature.XV
+    event_phase: EventPhase = EventPhase.GENERALIDADE
+    type: Optional[str] = None
+    name_filter: Optional[str] = None
+    party: Optional[str] = None
+    deputy: Optional[str] = None
+    dt_ini: Optional[date] = None
+    dt_fin: Optional[date] = None
+    limit: int = Field(20, ge=0)
+    offset: int = Field(0, ge=0)
+
+
+class BatchIn(BaseModel):
+    queries: List[BatchQuery] = Field(min_length=1, max_length=50)
+
+
 class Initiative(BaseModel):
     iniciativa_evento_fase: str
     iniciativa_titulo: str
@@ -55,6 +117,19 @@ class InitiativesOut(BaseModel):
     initiativas: List[Initiative]
 
 
+class RelatedInitiative(BaseModel):
+    iniciativa_id: str
+    iniciativa_nr: str
+    iniciativa_tipo: str
+    iniciativa_titulo: str
+    distancia: int
+
+
+class RelatedInitiativesOut(BaseModel):
+    iniciativa_id: str
+    iniciativas: List[RelatedInitiative]
+
+
 class Party(BaseModel):
     name: str
     description: str
@@ -0,0 +1,60 @@
+import json
+from typing import Iterable
+
+import pandas as pd
+
+from src.app.apis import schemas
+from src.app.responses import serialize_model
+from src.parliament.parties import VOTE_COLUMN_PREFIX, PartyRegistry
+
+TOTAL_COLUMNS = ["total_iniciativas", "total_iniciativas_aprovadas"]
+
+
+def build_party_approvals(
+    approvals: pd.DataFrame, registry: PartyRegistry, party_names: Iterable[str]
+) -> pd.DataFrame:
+    """
+    Party approvals (see `votes.get_party_approvals`) as returned by the API:
+    with the id of each author and the parties of the legislature that did not
+    present any initiative yet, with everything at 0, after the ones that did.
+    """
+
+    if approvals.empty and not len(approvals.columns):
+        approvals = pd.DataFrame(columns=TOTAL_COLUMNS)
+
+    missing = pd.Index(list(dict.fromkeys(party_names))).difference(
+        approvals.index, sort=False
+    )
+    table = approvals.reindex(approvals.index.append(missing), fill_value=0)
+    table.insert(0, "id", table.index.map(registry.party_id))
+
+    return table
+
+
+def serialize_party_approvals(table: pd.DataFrame) -> bytes:
+    """
+    Serialize a table from `build_party_approvals` as the API response.
+    """
+
+    # values as they were always serialized, through pandas
+    split = json.loads(table.to_json(orient="split"))
+    columns = split["columns"]
+
+    autores = []
+    for nome, values in zip(split["index"], split["data"]):
+        values = dict(zip(columns, values))
+        autores.append(
+            {
+                "id": values["id"],
+                "nome": nome,
+                "total_iniciativas": values["total_iniciativas"],
+                "total_iniciativas_aprovadas": values["total_iniciativas_aprovadas"],
+                "aprovacoes": {
+                    k[len(VOTE_COLUMN_PREFIX) :]: v
+                    for k, v in values.items()
+                    if k.startswith(VOTE_COLUMN_PREFIX)
+                },
+            }
+        )
+
+    return serialize_model(schemas.PartyApprovalsOut, autores=autores)
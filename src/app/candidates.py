@@ -0,0 +1,74 @@
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from pydantic import ValidationError
+
+from src.app.apis import schemas
+from src.app.responses import Payload, dump_json, precompress, serialize_model
+
+logger = logging.getLogger(__name__)
+
+
+def _serialize(candidates: List[Dict]) -> Payload:
+    """
+    Serialize (and compress) the candidates as FastAPI would after validating
+    them with the response model, so it happens once instead of per request.
+    """
+
+    try:
+        content = serialize_model(schemas.CandidatesOut, candidates=candidates)
+    except ValidationError as e:
+        logger.warning(f"Invalid candidates, serializing them as they are: {e}")
+        content = dump_json({"candidates": candidates})
+
+    return precompress(content)
+
+
+def serialize_parties(parties: pd.DataFrame) -> bytes:
+    """
+    Serialize the parties of an election as returned by the API.
+    """
+
+    return dump_json({"parties": json.loads(parties.to_json(orient="index"))})
+
+
+EMPTY = _serialize([])
+
+
+class CandidatesIndex:
+    """
+    Candidates grouped by party and by (district, party), with each group
+    already serialized, so each lookup is a dict access.
+    """
+
+    def __init__(self, candidates: pd.DataFrame):
+        records = json.loads(candidates.to_json(orient="records"))
+
+        by_party = defaultdict(list)
+        by_district = defaultdict(list)
+        by_district_party = defaultdict(list)
+        for record in records:
+            by_party[record["party"]].append(record)
+            by_district[record["district"]].append(record)
+            by_district_party[(record["district"], record["party"])].append(record)
+
+        self._by_party: Dict[str, Payload] = {
+            party: _serialize(group) for party, group in by_party.items()
+        }
+        self._by_district: Dict[str, Payload] = {
+            district: _serialize(group) for district, group in by_district.items()
+        }
+        self._by_district_party: Dict[Tuple[str, str], Payload] = {
+            key: _serialize(group) for key, group in by_district_party.items()
+        }
+
+    def by_party(self, party: Optional[str]) -> Payload:
+        return self._by_party.get(party, EMPTY)
+
+    def by_district(self, district: str, party: Optional[str] = None) -> Payload:
+        if party:
+            return self._by_district_party.get((district, party), EMPTY)
+        return self._by_district.get(district, EMPTY)
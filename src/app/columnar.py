@@ -0,0 +1,100 @@
+import hashlib
+import io
+from datetime import date
+from typing import Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.app.apis import schemas
+
+MEDIA_TYPES = {
+    schemas.ColumnarFormat.ARROW: "application/vnd.apache.arrow.stream",
+    schemas.ColumnarFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+
+def get_version(dfs: Iterable[pd.DataFrame]) -> str:
+    """
+    Hash of the content of the DataFrames, the same while the data does not
+    change
+    """
+
+    digest = hashlib.sha1()
+    for df in dfs:
+        digest.update(",".join(map(str, df.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+
+    return digest.hexdigest()[:16]
+
+
+class VotesTable:
+    """
+    Initiative votes as an Arrow table sorted by date, so the votes between any
+    two dates are a slice of the table (which does not copy any data).
+
+    Built once when the snapshot of the legislature is loaded, the downloads
+    only slice and filter its buffers.
+    """
+
+    def __init__(self, initiative_votes: pd.DataFrame):
+        import pyarrow as pa
+
+        votes = initiative_votes.sort_values("iniciativa_evento_data", kind="stable")
+        self.table = pa.Table.from_pandas(votes, preserve_index=False)
+        self.dates = votes["iniciativa_evento_data"].to_numpy(dtype="datetime64[D]")
+
+    def get(
+        self,
+        event_phase: schemas.EventPhase,
+        dt_ini: Optional[date] = None,
+        dt_fin: Optional[date] = None,
+    ) -> Any:
+        import pyarrow.compute as pc
+
+        lo = np.searchsorted(self.dates, np.datetime64(dt_ini, "D")) if dt_ini else 0
+        hi = (
+            np.searchsorted(self.dates, np.datetime64(dt_fin, "D"), side="right")
+            if dt_fin
+            else len(self.dates)
+        )
+        table = self.table.slice(lo, max(hi - lo, 0))
+
+        if event_phase != schemas.EventPhase.ALL:
+            table = table.filter(
+                pc.equal(table["iniciativa_evento_fase"], event_phase.value)
+            )
+
+        return table
+
+
+def get_table(df: pd.DataFrame, index: Optional[str] = None) -> Any:
+    """
+    Arrow table of a DataFrame, with the index as the column `index` or
+    without it when not given
+    """
+
+    import pyarrow as pa
+
+    if index:
+        df = df.rename_axis(index).reset_index()
+
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def serialize_table(table: Any, format: schemas.ColumnarFormat) -> bytes:
+    """
+    Arrow table as an Arrow IPC stream or a Parquet file
+    """
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = io.BytesIO()
+    if format == schemas.ColumnarFormat.PARQUET:
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    return sink.getvalue()
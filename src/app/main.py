@@ -1,21 +1,43 @@
+import hashlib
 import json
 import logging
 import os
 import sys
+import time
 from datetime import date
-from typing import Dict, Optional
-from copy import deepcopy
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
 import pandas as pd
-import uvicorn as uvicorn
-from azure.storage.blob import BlobServiceClient
-from azure.storage.blob import ContainerClient as BlobContainerClient
+from azure.core.exceptions import ResourceNotFoundError
 # from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
+from src.app import approvals, columnar, memory, profiling, queries
+from src.app.candidates import CandidatesIndex, serialize_parties
 from src.app.apis import schemas
-from src.elections.extract import extract_legislativas_2019
-from src.parliament.initiatives import votes
+from src.app.responses import encoded_response, precompress, serialize_model
+from src.app.store import (
+    ElectionSnapshot,
+    ElectionStore,
+    LegislatureSnapshot,
+    LegislatureStore,
+)
+from src.common import metrics
+from src.common.manifest import Manifest, read_manifest
+from src.common.metrics import timed
+from src.common.storage import read_blob
+from src.elections.extract import Election, load_election
+from src.parliament.initiatives.extract import ONGOING_PATHS
+from src.parliament.initiatives.deputies import DeputyRollups, get_deputies_stats
+from src.parliament.initiatives.graph import InitiativeGraph
+from src.parliament.initiatives.series import TooManyPoints
+from src.parliament.legislatures.intervals import LegislatureIntervals
+from src.parliament.parties import PartyRegistry
+
+if TYPE_CHECKING:
+    from azure.storage.blob import ContainerClient as BlobContainerClient
 
 # load_dotenv(dotenv_path=".env")
 
@@ -29,7 +51,7 @@ logger.addHandler(handler)
 #########################
 
 
-def get_blob_container() -> BlobContainerClient:
+def get_blob_container() -> "BlobContainerClient":
     """
     Connects to Azure Blob Storage and return its client. Expects to load from
     env vars all needed information, otherwise will fail.
@@ -42,6 +64,8 @@ def get_blob_container() -> BlobContainerClient:
         logger.exception("Error collection env vars to access blob storage:")
         raise
 
+    from azure.storage.blob import BlobServiceClient
+
     try:
         blob_service_client = BlobServiceClient.from_connection_string(
             connection_string
@@ -56,8 +80,17 @@ def get_blob_container() -> BlobContainerClient:
     return container_client
 
 
-# Get Blob Storage client
-blob_storage_container_client = get_blob_container()
+# Blob Storage client, connected on first use and not when importing
+blob_storage_container_client: Optional["BlobContainerClient"] = None
+
+
+def get_container_client() -> "BlobContainerClient":
+    global blob_storage_container_client
+
+    if blob_storage_container_client is None:
+        blob_storage_container_client = get_blob_container()
+
+    return blob_storage_container_client
 
 
 ####################################
@@ -65,128 +98,284 @@ blob_storage_container_client = get_blob_container()
 ####################################
 
 
-ALL_LEGISLATURES = ["XIV", "XV", "XVI"]
+ALL_LEGISLATURES = [legislature.value for legislature in schemas.Legislature]
+
+# legislatures still being updated, the closed ones do not change anymore
+ONGOING_LEGISLATURES = [legislature for legislature, _ in ONGOING_PATHS]
+
+# closed legislatures are only loaded when requested
+LAZY_LOADING = os.environ.get("LAZY_LOADING", "1").lower() in ("1", "true")
+
+# legislatures loaded on access are evicted after these minutes without requests
+LAZY_IDLE_MINUTES = float(os.environ.get("LAZY_IDLE_MINUTES", 30))
+
+
+def read_blob_json(container_client: "BlobContainerClient", blob_name: str) -> Any:
+    """
+    Download a JSON blob and parse it, timing both stages separately
+    """
+
+    with timed("load_data.download"):
+        raw = read_blob(container_client.get_blob_client(blob_name))
+
+    metrics.SNAPSHOT_BYTES.set(len(raw), blob=blob_name)
+
+    with timed("load_data.parse"):
+        return json.loads(raw)
 
 
 def load_party_approvals(
-    legislature: str, phase: str, container_client: BlobContainerClient
+    legislature: str, phase: str, container_client: "BlobContainerClient"
 ) -> pd.DataFrame:
     """
     Load party approvals for a full legislature from Blob Storage
     """
 
-    data = container_client.get_blob_client(
-        f"{legislature}_party_approvals_{phase}.json"
-    )
-    return pd.DataFrame.from_dict(
-        json.loads(data.download_blob().readall()), orient="index"
+    data = read_blob_json(
+        container_client, f"{legislature}_party_approvals_{phase}.json"
     )
+    return pd.DataFrame.from_dict(data, orient="index")
 
 
 def load_party_correlations(
-    legislature: str, phase: str, container_client: BlobContainerClient
+    legislature: str, phase: str, container_client: "BlobContainerClient"
 ) -> pd.DataFrame:
     """
     Load party correlations for a full legislature from Blob Storage
     """
 
-    data = container_client.get_blob_client(
-        f"{legislature}_party_correlations_{phase}.json"
-    )
-    return pd.DataFrame.from_dict(
-        json.loads(data.download_blob().readall()), orient="index"
+    data = read_blob_json(
+        container_client, f"{legislature}_party_correlations_{phase}.json"
     )
+    return pd.DataFrame.from_dict(data, orient="index")
 
 
 def load_initiative_votes(
-    legislature: str, container_client: BlobContainerClient
+    legislature: str, container_client: "BlobContainerClient"
 ) -> pd.DataFrame:
     """
     Load initiative votes of a certain legislature from Blob Storage
     """
 
-    data = container_client.get_blob_client(f"{legislature}_initiatives_votes.json")
-    df = pd.DataFrame.from_dict(
-        json.loads(data.download_blob().readall()), orient="index"
-    )
+    data = read_blob_json(container_client, f"{legislature}_initiatives_votes.json")
+    df = pd.DataFrame.from_dict(data, orient="index")
 
     df["iniciativa_evento_data"] = pd.to_datetime(
         df["iniciativa_evento_data"], unit="ms"
     )
+
+    metrics.SNAPSHOT_ROWS.set(
+        len(df), table="initiatives_votes", legislature=legislature
+    )
     return df
 
 
 def load_legislatures_fields(
-    legislature: str, container_client: BlobContainerClient
+    legislature: str, container_client: "BlobContainerClient"
 ) -> Dict:
     """
     Load initiative votes of a certain legislature from Blob Storage
     """
 
-    data = container_client.get_blob_client(f"{legislature}_legislatures.json")
+    return read_blob_json(container_client, f"{legislature}_legislatures.json")
 
-    return json.loads(data.download_blob().readall())
 
+def load_deputy_rollups(
+    legislature: str, container_client: "BlobContainerClient"
+) -> DeputyRollups:
+    """
+    Load the deputies vote rollups of a certain legislature from Blob Storage,
+    empty for the legislatures without them
+    """
 
-party_approvals = None
-party_correlations = None
-initiative_votes = None
-parties_legislatives_2019 = None
-candidates_legislatives_2019 = None
-legislature_fields = None
+    try:
+        data = read_blob_json(container_client, f"{legislature}_deputy_rollups.json")
+    except ResourceNotFoundError:
+        return DeputyRollups()
 
+    return DeputyRollups.from_dict(data)
 
-def load_data():
+
+def load_initiatives_graph(
+    legislature: str, container_client: "BlobContainerClient"
+) -> Optional[InitiativeGraph]:
     """
-    Load all data into memory
+    Load how the initiatives of a certain legislature relate to each other from
+    Blob Storage, None for the legislatures without it
     """
 
-    # no thread safe, to be fixed when the api usage justify
-    global party_approvals
-    global party_correlations
-    global initiative_votes
-    global parties_legislatives_2019
-    global candidates_legislatives_2019
-    global legislature_fields
-
-    # parliament data
+    try:
+        data = read_blob_json(container_client, f"{legislature}_initiatives_graph.json")
+    except ResourceNotFoundError:
+        return None
+
+    return InitiativeGraph.from_dict(data)
+
+
+def load_party_registry(
+    legislature: str, container_client: "BlobContainerClient"
+) -> Optional[PartyRegistry]:
+    """
+    Load the party registry used to process the initiatives of a certain
+    legislature from Blob Storage, None for the legislatures without it
+    """
+
+    try:
+        data = read_blob_json(container_client, f"{legislature}_party_registry.json")
+    except ResourceNotFoundError:
+        return None
+
+    return PartyRegistry.from_dict(data)
+
+
+def load_legislature_intervals(
+    legislature: str, container_client: "BlobContainerClient"
+) -> Optional[LegislatureIntervals]:
+    """
+    Load the composition intervals of a certain legislature from Blob Storage,
+    None for the legislatures without them
+    """
+
+    try:
+        data = read_blob_json(
+            container_client, f"{legislature}_legislature_intervals.json"
+        )
+    except ResourceNotFoundError:
+        return None
+
+    return LegislatureIntervals.from_dict(data)
+
+
+def load_legislature(legislature: str) -> LegislatureSnapshot:
+    """
+    Load all the parliament data of a legislature from Blob Storage, of its
+    current version (see `Manifest`)
+    """
+
+    container_client = manifest.container(get_container_client(), legislature)
+
+    legislature_fields = load_legislatures_fields(
+        legislature=legislature, container_client=container_client
+    )
+    # the same parties and deputies used to process the initiatives
+    parties = load_party_registry(legislature, container_client)
+    if parties is None:
+        parties = PartyRegistry.from_legislature_fields(legislature_fields)
+
+    legislature_intervals = load_legislature_intervals(legislature, container_client)
+
+    # approvals already with all the parties and serialized, as returned when
+    # there are no filters
     party_approvals = {
-        legislature: {
-            phase.value: load_party_approvals(
-                legislature, phase.name.lower(), blob_storage_container_client
-            )
-            for phase in schemas.EventPhase
-        }
-        for legislature in ALL_LEGISLATURES
+        phase.value: approvals.build_party_approvals(
+            load_party_approvals(legislature, phase.name.lower(), container_client),
+            parties,
+            queries.get_party_names(legislature_fields),
+        )
+        for phase in schemas.EventPhase
     }
 
-    party_correlations = {
-        legislature: {
+    return LegislatureSnapshot(
+        party_approvals=party_approvals,
+        party_correlations={
             phase.value: load_party_correlations(
-                legislature, phase.name.lower(), blob_storage_container_client
+                legislature, phase.name.lower(), container_client
             )
             for phase in schemas.EventPhase
-        }
-        for legislature in ALL_LEGISLATURES
-    }
+        },
+        initiative_votes=load_initiative_votes(legislature, container_client),
+        legislature_fields=legislature_fields,
+        parties=parties,
+        party_approvals_responses={
+            phase: precompress(approvals.serialize_party_approvals(table))
+            for phase, table in party_approvals.items()
+        },
+        deputy_stats_responses={
+            deputy: precompress(serialize_model(schemas.DeputyStatsOut, **stats))
+            for deputy, stats in get_deputies_stats(
+                load_deputy_rollups(legislature, container_client),
+                parties,
+                legislature_intervals,
+            ).items()
+        },
+        initiatives_graph=load_initiatives_graph(legislature, container_client),
+        legislature_intervals=legislature_intervals,
+    )
 
-    initiative_votes = {
-        legislature: load_initiative_votes(legislature, blob_storage_container_client)
-        for legislature in ALL_LEGISLATURES
-    }
 
-    legislature_fields = {
-        legislature: load_legislatures_fields(
-            legislature=legislature, container_client=blob_storage_container_client
+def load_election_snapshot(election: Election) -> Optional[ElectionSnapshot]:
+    """
+    Load the data of an election into memory, None when it was not processed
+    """
+
+    with timed("load_data.elections"):
+        tables = load_election(get_container_client(), election)
+        if tables is None:
+            return None
+
+        parties, candidates = tables
+
+        return ElectionSnapshot(
+            parties=precompress(serialize_parties(parties)),
+            # candidates are only accessed by party and district
+            candidates=CandidatesIndex(candidates),
         )
-        for legislature in ALL_LEGISLATURES
-    }
 
-    # legislative data
-    (
-        parties_legislatives_2019,
-        candidates_legislatives_2019,
-    ) = extract_legislativas_2019()
+
+legislatures = None
+elections = None
+# versions of the data loaded
+manifest = Manifest()
+
+
+@timed("load_data")
+def load_data():
+    """
+    Load all data into memory
+    """
+
+    # no thread safe, to be fixed when the api usage justify
+    global legislatures
+    global elections
+    global manifest
+
+    manifest = read_manifest(get_container_client())
+
+    # parliament data, most recent legislatures first since those are the
+    # ones kept in memory if the budget is not enough for all
+    legislatures = LegislatureStore(
+        load_legislature,
+        budget=memory.get_memory_budget(),
+        idle_seconds=LAZY_IDLE_MINUTES * 60,
+    )
+    # even when there are no requests
+    legislatures.start_sweeper()
+    if LAZY_LOADING:
+        legislatures.load(
+            [leg for leg in ALL_LEGISLATURES[::-1] if leg in ONGOING_LEGISLATURES],
+            lazy=[
+                leg for leg in ALL_LEGISLATURES[::-1] if leg not in ONGOING_LEGISLATURES
+            ],
+        )
+    else:
+        legislatures.load(ALL_LEGISLATURES[::-1])
+
+    # elections data, each election is loaded on first access
+    elections = ElectionStore(load_election_snapshot)
+
+    logger.info(json.dumps(memory_report()))
+
+
+def memory_report() -> Dict:
+    """
+    Memory used by the data loaded into memory
+    """
+
+    report = legislatures.memory_report()
+    report["elections"] = elections.memory_report()
+    report["held_bytes"] += sum(report["elections"].values())
+
+    return report
 
 
 ######################
@@ -206,11 +395,24 @@ tags_metadata = [
     },
 ]
 
+router = APIRouter()
 
-app = FastAPI(openapi_tags=tags_metadata)
+
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+
+    # use the route template, not the raw path, to keep cardinality bounded
+    route = request.scope.get("route")
+    metrics.REQUEST_LATENCY.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        endpoint=route.path if route else "unmatched",
+        status=response.status_code,
+    )
+    return response
 
 
-@app.on_event("startup")
 async def startup_event():
     # The idea is to load all cached data during the app boostrap.
     # In some endpoints due the parameters it is not possible to just
@@ -219,11 +421,13 @@ async def startup_event():
     load_data()
 
 
-@app.get(
+@router.get(
     "/parliament/party-approvals",
     tags=["Parliament"],
 )
+@profiling.profiled
 def get_party_approvals(
+    request: Request,
     legislature: schemas.Legislature = schemas.Legislature.XV,
     event_phase: schemas.EventPhase = schemas.EventPhase.GENERALIDADE,
     type: Optional[str] = None,
@@ -234,97 +438,25 @@ def get_party_approvals(
     Get the % that each party approves initiatives from other parties.
     """
 
+    snapshot = legislatures[legislature.value]
+
+    data_initiatives_votes_ = None
     if dt_ini or dt_fin or type:
-        data_initiatives_votes_ = initiative_votes[legislature.value]
-
-        if event_phase != schemas.EventPhase.ALL:
-            data_initiatives_votes_ = data_initiatives_votes_[
-                data_initiatives_votes_["iniciativa_evento_fase"] == event_phase
-            ]
-
-        if dt_ini:
-            data_initiatives_votes_ = data_initiatives_votes_[
-                data_initiatives_votes_["iniciativa_evento_data"].dt.date >= dt_ini
-            ]
-
-        if dt_fin:
-            data_initiatives_votes_ = data_initiatives_votes_[
-                data_initiatives_votes_["iniciativa_evento_data"].dt.date <= dt_fin
-            ]
-
-        if type:
-            data_initiatives_votes_ = data_initiatives_votes_[
-                data_initiatives_votes_["iniciativa_tipo"] == type
-            ]
-
-        _party_approvals = votes.get_party_approvals(data_initiatives_votes_).to_json(
-            orient="index"
-        )
-    else:
-        _party_approvals = party_approvals[legislature.value][
-            event_phase.value
-        ].to_json(orient="index")
+        with timed("party_approvals.filter"):
+            data_initiatives_votes_ = queries.filter_initiative_votes(
+                snapshot.initiative_votes, event_phase, dt_ini, dt_fin, type
+            )
+
+    return encoded_response(
+        request, queries.party_approvals(snapshot, event_phase, data_initiatives_votes_)
+    )
 
-    all_parties_names = [
-        party["nome"] for party in 
-        legislature_fields[legislature.value]["partidos"]
-    ]
 
-    # transform to the expected schema
-    approvals = []
-    for autor, value in json.loads(_party_approvals).items():
-        data = {
-            "id": autor.lower()
-            .replace(" ", "-")
-            .replace("cristina-rodrigues", "cr")
-            .replace("joacine-katar-moreira", "jkm")
-            .replace("antónio-maló-de-abreu", "ama")
-            .replace("miguel-arruda", "mar"),
-            "nome": autor,
-            "total_iniciativas": value["total_iniciativas"],
-            "total_iniciativas_aprovadas": value["total_iniciativas_aprovadas"],
-        }
-
-        data["aprovacoes"] = {
-            k.replace("iniciativa_votacao_", ""): v
-            for k, v in value.items()
-            if k.startswith("iniciativa_votacao_")
-        }
-
-        if autor in all_parties_names:
-            all_parties_names.remove(autor)
-
-        approvals.append(data)
-
-    # it means some parties still did not present any initiative
-    if all_parties_names:
-        for party in all_parties_names:
-            example = deepcopy(data)
-
-            example["id"] = party.lower().\
-                replace(" ", "-").\
-                replace("cristina-rodrigues", "cr").\
-                replace("joacine-katar-moreira", "jkm").\
-                replace("antónio-maló-de-abreu", "ama").\
-                replace("miguel-arruda", "mar")
-            example["nome"] = party
-            example["total_iniciativas"] = 0
-            example["total_iniciativas_aprovadas"] = 0
-
-            example["aprovacoes"] = {
-                k: 0
-                for k in data["aprovacoes"].keys()
-            }
-
-            approvals.append(example)
-
-    return {"autores": approvals}
-
-
-@app.get(
+@router.get(
     "/parliament/party-correlations",
     tags=["Parliament"],
 )
+@profiling.profiled
 def get_party_correlations(
     legislature: schemas.Legislature = schemas.Legislature.XV,
     event_phase: schemas.EventPhase = schemas.EventPhase.GENERALIDADE,
@@ -336,53 +468,47 @@ def get_party_correlations(
     Get the percentage of times that 2 parties vote the same.
     """
 
+    snapshot = legislatures[legislature.value]
+
+    data_initiatives_votes_ = None
     if dt_ini or dt_fin or type:
-        data_initiatives_votes_ = initiative_votes[legislature.value]
-
-        if event_phase != schemas.EventPhase.ALL:
-            data_initiatives_votes_ = data_initiatives_votes_[
-                data_initiatives_votes_["iniciativa_evento_fase"] == event_phase
-            ]
-
-        if dt_ini:
-            data_initiatives_votes_ = data_initiatives_votes_[
-                data_initiatives_votes_["iniciativa_evento_data"].dt.date >= dt_ini
-            ]
-
-        if dt_fin:
-            data_initiatives_votes_ = data_initiatives_votes_[
-                data_initiatives_votes_["iniciativa_evento_data"].dt.date <= dt_fin
-            ]
-
-        if type:
-            data_initiatives_votes_ = data_initiatives_votes_[
-                data_initiatives_votes_["iniciativa_tipo"] == type
-            ]
-
-        _party_corr = votes.get_party_correlations(data_initiatives_votes_).to_json(
-            orient="index"
-        )
-    else:
-        _party_corr = party_correlations[legislature.value][event_phase.value].to_json(
-            orient="index"
-        )
+        with timed("party_correlations.filter"):
+            data_initiatives_votes_ = queries.filter_initiative_votes(
+                snapshot.initiative_votes, event_phase, dt_ini, dt_fin, type
+            )
 
-    # transform to the expected schema
-    res = []
-    for _, corr in json.loads(_party_corr).items():
-        res.append(
-            {
-                "nome": corr.pop("nome").replace("iniciativa_votacao_", ""),
-                "correlacoes": {
-                    k.replace("iniciativa_votacao_", ""): v for k, v in corr.items()
-                },
-            }
-        )
+    return queries.party_correlations(snapshot, event_phase, data_initiatives_votes_)
+
+
+@router.get("/parliament/party-agreement-series", tags=["Parliament"])
+@profiling.profiled
+def get_party_agreement_series(
+    legislature: schemas.Legislature = schemas.Legislature.XV,
+    event_phase: schemas.EventPhase = schemas.EventPhase.GENERALIDADE,
+    window: int = Query(28, ge=1, le=3650, description="days considered in each point"),
+    step: int = Query(7, ge=1, description="days between points"),
+    dt_ini: Optional[date] = None,
+    dt_fin: Optional[date] = None,
+):
+    """
+    Get how the agreement between each pair of parties, the approval of the
+    initiatives and how often each party votes in favor evolve over time.
+    Each point considers the votes in the `window` days until its date.
+    """
 
-    return {"partido": res}
+    snapshot = legislatures[legislature.value]
 
+    with timed("party_agreement_series.compute"):
+        try:
+            return snapshot.vote_series(event_phase.value).get(
+                window, step, dt_ini, dt_fin
+            )
+        except TooManyPoints as e:
+            raise HTTPException(status_code=422, detail=str(e))
 
-@app.get("/parliament/initiatives", tags=["Parliament"])
+
+@router.get("/parliament/initiatives", tags=["Parliament"])
+@profiling.profiled
 def get_initiatives(
     legislature: schemas.Legislature = schemas.Legislature.XV,
     event_phase: schemas.EventPhase = schemas.EventPhase.GENERALIDADE,
@@ -399,83 +525,253 @@ def get_initiatives(
     Portuguese Republic.
     """
 
-    data_initiatives_votes_ = initiative_votes[legislature.value]
-
-    if event_phase != schemas.EventPhase.ALL:
-        data_initiatives_votes_ = data_initiatives_votes_[
-            data_initiatives_votes_["iniciativa_evento_fase"] == event_phase
-        ]
-
-    if dt_ini:
-        data_initiatives_votes_ = data_initiatives_votes_[
-            data_initiatives_votes_["iniciativa_evento_data"].dt.date >= dt_ini
-        ]
-
-    if dt_fin:
-        data_initiatives_votes_ = data_initiatives_votes_[
-            data_initiatives_votes_["iniciativa_evento_data"].dt.date <= dt_fin
-        ]
-
-    if name_filter:
-        data_initiatives_votes_ = data_initiatives_votes_[
-            data_initiatives_votes_["iniciativa_titulo"]
-            .str.lower()
-            .str.contains(name_filter.lower())
-        ]
-
-    if party:
-        data_initiatives_votes_ = data_initiatives_votes_[
-            data_initiatives_votes_["iniciativa_autor"].str.lower() == party.lower()
-        ]
-
-    if deputy:
-        data_initiatives_votes_ = data_initiatives_votes_[
-            data_initiatives_votes_["iniciativa_autor_deputado"]
-            .str.lower()
-            .str.contains(deputy.lower())
-        ]
-
-    initiatives = (
-        votes.get_initiatives(data_initiatives_votes_)
-        .sort_values("iniciativa_data")
-        .head(limit + offset)
-        .tail(limit)
-        .to_json(orient="index")
+    with timed("initiatives.filter"):
+        data_initiatives_votes_ = queries.filter_initiative_votes(
+            legislatures[legislature.value].initiative_votes,
+            event_phase,
+            dt_ini,
+            dt_fin,
+            name_filter=name_filter,
+            party=party,
+            deputy=deputy,
+        )
+
+    return queries.initiatives(data_initiatives_votes_, limit, offset)
+
+
+@router.get("/parliament/initiatives/export", tags=["Parliament"])
+def export_initiatives(
+    legislature: schemas.Legislature = schemas.Legislature.XV,
+    event_phase: schemas.EventPhase = schemas.EventPhase.ALL,
+    format: schemas.ExportFormat = schemas.ExportFormat.NDJSON,
+    type: Optional[str] = None,
+    name_filter: Optional[str] = None,
+    party: Optional[str] = None,
+    deputy: Optional[str] = None,
+    dt_ini: Optional[date] = None,
+    dt_fin: Optional[date] = None,
+):
+    """
+    Download every processed vote of a legislature at once, as NDJSON or CSV,
+    instead of paging through `/parliament/initiatives`.
+    """
+
+    content = queries.export_initiative_votes(
+        legislatures[legislature.value].initiative_votes,
+        format,
+        event_phase=event_phase,
+        dt_ini=dt_ini,
+        dt_fin=dt_fin,
+        type=type,
+        name_filter=name_filter,
+        party=party,
+        deputy=deputy,
+    )
+    media_type = {
+        schemas.ExportFormat.NDJSON: "application/x-ndjson",
+        schemas.ExportFormat.CSV: "text/csv",
+    }[format]
+    filename = f"{legislature.value}_initiatives_votes.{format.value}"
+
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/parliament/download", tags=["Parliament"])
+def download(
+    request: Request,
+    dataset: schemas.ColumnarDataset = schemas.ColumnarDataset.VOTES,
+    format: schemas.ColumnarFormat = schemas.ColumnarFormat.PARQUET,
+    legislature: schemas.Legislature = schemas.Legislature.XV,
+    event_phase: schemas.EventPhase = schemas.EventPhase.ALL,
+    dt_ini: Optional[date] = None,
+    dt_fin: Optional[date] = None,
+):
+    """
+    Download the votes (optionally between two dates), party approvals or
+    party correlations of a legislature as Arrow IPC or Parquet, to load them
+    directly into pandas or any other analytical tool.
+    """
+
+    snapshot = legislatures[legislature.value]
+
+    # the same while the data of the legislature does not change
+    variant = f"{dataset.value}|{format.value}|{event_phase.value}|{dt_ini}|{dt_fin}"
+    etag = f'"{snapshot.version()}-{hashlib.sha1(variant.encode()).hexdigest()[:8]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    with timed("download.compute"):
+        if dataset == schemas.ColumnarDataset.VOTES:
+            table = snapshot.votes_table.get(event_phase, dt_ini, dt_fin)
+        elif dataset == schemas.ColumnarDataset.PARTY_APPROVALS:
+            table = columnar.get_table(
+                snapshot.party_approvals[event_phase.value], index="autor"
+            )
+        else:
+            table = columnar.get_table(snapshot.party_correlations[event_phase.value])
+
+    with timed("download.serialize"):
+        content = columnar.serialize_table(table, format)
+
+    filename = f"{legislature.value}_{dataset.value}.{format.value}"
+
+    return Response(
+        content,
+        media_type=columnar.MEDIA_TYPES[format],
+        headers={
+            "ETag": etag,
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        },
     )
 
-    # transform to the expected schema
-    res = []
-    for _, initiative in json.loads(initiatives).items():
-        res.append(initiative)
 
-    return {"initiativas": res}
+@router.post("/parliament/batch", tags=["Parliament"])
+@profiling.profiled
+def get_batch(batch: schemas.BatchIn):
+    """
+    Get the results of many queries to the parliament endpoints at once, in
+    the same order. The queries with the same filters share the filtered
+    votes, so they are only filtered once.
+    """
+
+    with timed("batch.compute"):
+        content = queries.run_batch(legislatures, batch.queries)
+
+    return Response(content, media_type="application/json")
+
+
+@router.get("/parliament/deputies/{deputy_id}/stats", tags=["Parliament"])
+def get_deputy_stats(
+    request: Request,
+    deputy_id: str,
+    legislature: schemas.Legislature = schemas.Legislature.XV,
+) -> schemas.DeputyStatsOut:
+    """
+    Get the attendance of a deputy, how often they vote with their party and
+    how often against it, in total and per month.
+    """
+
+    content = legislatures[legislature.value].deputy_stats_responses.get(deputy_id)
+    if content is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Deputy {deputy_id} not found in legislature {legislature.value}",
+        )
+
+    return encoded_response(request, content)
+
+
+def get_initiatives_graph(
+    legislature: schemas.Legislature, initiative_id: str
+) -> InitiativeGraph:
+    graph = legislatures[legislature.value].initiatives_graph
+    if graph is None or initiative_id not in graph:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Initiative {initiative_id} not found in {legislature.value}",
+        )
 
+    return graph
 
-@app.get("/parliament/legislatures", tags=["Parliament"])
+
+@router.get("/parliament/initiatives/{initiative_id}/ancestors", tags=["Parliament"])
+def get_initiative_ancestors(
+    initiative_id: str,
+    legislature: schemas.Legislature = schemas.Legislature.XV,
+) -> schemas.RelatedInitiativesOut:
+    """
+    Get the initiatives an initiative came from, directly or through others.
+    """
+
+    graph = get_initiatives_graph(legislature, initiative_id)
+    return {
+        "iniciativa_id": initiative_id,
+        "iniciativas": graph.ancestors(initiative_id),
+    }
+
+
+@router.get("/parliament/initiatives/{initiative_id}/descendants", tags=["Parliament"])
+def get_initiative_descendants(
+    initiative_id: str,
+    legislature: schemas.Legislature = schemas.Legislature.XV,
+) -> schemas.RelatedInitiativesOut:
+    """
+    Get the initiatives originated by an initiative, directly or through others.
+    """
+
+    graph = get_initiatives_graph(legislature, initiative_id)
+    return {
+        "iniciativa_id": initiative_id,
+        "iniciativas": graph.descendants(initiative_id),
+    }
+
+
+@router.get("/parliament/initiatives/{initiative_id}/joint", tags=["Parliament"])
+def get_joint_initiatives(
+    initiative_id: str,
+    legislature: schemas.Legislature = schemas.Legislature.XV,
+) -> schemas.RelatedInitiativesOut:
+    """
+    Get the initiatives discussed jointly with an initiative.
+    """
+
+    graph = get_initiatives_graph(legislature, initiative_id)
+    return {
+        "iniciativa_id": initiative_id,
+        "iniciativas": graph.joint_initiatives(initiative_id),
+    }
+
+
+@router.get("/parliament/legislatures", tags=["Parliament"])
 def get_legislatures(
     legislature: schemas.Legislature = schemas.Legislature.XV,
+    as_of: Optional[date] = None,
 ):
     """
-    Get information regarding a particular legislature
+    Get information regarding a particular legislature, as it is now or as it
+    was at the date `as_of`
     """
-    return legislature_fields[legislature.value]
 
+    snapshot = legislatures[legislature.value]
+    if as_of is None:
+        return snapshot.legislature_fields
+
+    if snapshot.legislature_intervals is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Composition history of {legislature.value} not available",
+        )
+
+    with timed("legislatures.as_of"):
+        return snapshot.legislature_intervals.fields(as_of)
+
+
+def get_election_snapshot(type: str, year: int) -> ElectionSnapshot:
+    snapshot = elections.get(type, year)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Election {type} {year} not found")
 
-@app.get("/elections/parties", tags=["Elections"])
+    return snapshot
+
+
+@router.get("/elections/parties", tags=["Elections"])
 def get_elections_parties(
-    type: Optional[str] = "Legislativas", year: Optional[int] = 2019
+    request: Request, type: Optional[str] = "Legislativas", year: Optional[int] = 2019
 ):  # -> schemas.PartiesOut: ## TODO: it is not working
     """
     Get all the parties that participated in a certain election.
     """
 
-    # ignoring input parameters until we have other elections
+    return encoded_response(request, get_election_snapshot(type, year).parties)
 
-    return {"parties": json.loads(parties_legislatives_2019.to_json(orient="index"))}
 
-
-@app.get("/elections/candidates", tags=["Elections"])
+@router.get("/elections/candidates", tags=["Elections"])
 def get_party_candidates(
+    request: Request,
     party: Optional[str],
     type: Optional[str] = "Legislativas",
     year: Optional[int] = 2019,
@@ -484,21 +780,14 @@ def get_party_candidates(
     Get all the candidates from party in a certain election.
     """
 
-    # ignoring some input parameters until we have other elections
-
-    candidates_legislatives_2019_ = candidates_legislatives_2019[
-        candidates_legislatives_2019["party"] == party
-    ]
-
-    return {
-        "candidates": json.loads(
-            candidates_legislatives_2019_.to_json(orient="records")
-        )
-    }
+    return encoded_response(
+        request, get_election_snapshot(type, year).candidates.by_party(party)
+    )
 
 
-@app.get("/elections/candidates-district", tags=["Elections"])
+@router.get("/elections/candidates-district", tags=["Elections"])
 def get_district_candidates(
+    request: Request,
     district: str,
     type: Optional[str] = "Legislativas",
     year: Optional[int] = 2019,
@@ -508,37 +797,105 @@ def get_district_candidates(
     Get all the candidates from party in the constituency of district.
     """
 
-    # ignoring some input parameters until we have other elections
+    return encoded_response(
+        request,
+        get_election_snapshot(type, year).candidates.by_district(district, party),
+    )
 
-    candidates_legislatives_2019_ = candidates_legislatives_2019
 
-    if party:
-        candidates_legislatives_2019_ = candidates_legislatives_2019_[
-            candidates_legislatives_2019_["party"] == party
-        ]
+def require_admin(request: Request):
+    """
+    Only answer the requests with the admin token (see `profiling.is_admin`)
+    """
 
-    candidates_legislatives_2019_ = candidates_legislatives_2019_[
-        candidates_legislatives_2019_["district"] == district
-    ]
+    if not profiling.is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
 
-    return {
-        "candidates": json.loads(
-            candidates_legislatives_2019_.to_json(orient="records")
-        )
-    }
+
+@router.get(
+    "/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_admin)]
+)
+def get_metrics():
+    """
+    Expose the process metrics in the Prometheus text format.
+    """
+    return PlainTextResponse(
+        metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
 
 
-@app.get("/update")
+@router.get("/admin/memory", dependencies=[Depends(require_admin)])
+def get_memory():
+    """
+    Memory used by each object loaded into memory and how each legislature is
+    being held given the configured budget.
+    """
+    return memory_report()
+
+
+@router.get("/update")
 def update():
     """
-    Forces to reload the parliament data from our datalake.
+    Reload the legislatures whose data changed in our datalake (see
+    `Manifest`), or that are not in the manifest, the others are kept as they
+    are. The elections not found before are looked for again.
 
     This is called by our daily updater.
     """
-    logger.info("Loading new data..")
-    load_data()
+
+    global manifest
+
+    if legislatures is None:
+        logger.info("Loading new data..")
+        load_data()
+        logger.info("New data loaded.")
+        return {"reloaded": ALL_LEGISLATURES}
+
+    new_manifest = read_manifest(get_container_client())
+    # legislatures not in the manifest are read from the blobs not versioned,
+    # which may have changed without the manifest telling
+    changed = [
+        legislature
+        for legislature in ALL_LEGISLATURES
+        if new_manifest.content_hash(legislature) is None
+        or new_manifest.content_hash(legislature) != manifest.content_hash(legislature)
+    ]
+
+    # the daily updater may have stored them since
+    elections.clear_missing()
+
+    logger.info(f"Loading new data of {changed}..")
+    # new snapshots are loaded from the new version
+    manifest = new_manifest
+    with timed("update.reload"):
+        legislatures.reload(changed)
     logger.info("New data loaded.")
 
+    return {"reloaded": changed}
+
+
+def create_app() -> FastAPI:
+    """
+    Create the API. Nothing is connected to nor loaded until it starts, so
+    creating it (or importing this module) has no side effects.
+    """
+
+    app = FastAPI(openapi_tags=tags_metadata)
+    # only the responses computed per request, the ones that do not change
+    # until the next update are already compressed (see `encoded_response`)
+    app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=5)
+    app.middleware("http")(record_latency)
+    app.middleware("http")(profiling.middleware)
+    app.add_event_handler("startup", startup_event)
+    app.include_router(router)
+
+    return app
+
+
+app = create_app()
+
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=8000)
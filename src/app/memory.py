@@ -0,0 +1,67 @@
+import os
+import pickle
+import sys
+import zlib
+from typing import Any, Optional
+
+import pandas as pd
+
+
+def deep_memory_usage(obj: Any, _seen: Optional[set] = None) -> int:
+    """
+    Estimate the number of bytes held by an object, including everything it
+    references (DataFrames are measured with `deep=True`).
+    """
+
+    if _seen is None:
+        _seen = set()
+
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        size += sum(
+            deep_memory_usage(k, _seen) + deep_memory_usage(v, _seen)
+            for k, v in obj.items()
+        )
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_memory_usage(v, _seen) for v in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_memory_usage(vars(obj), _seen)
+
+    return size
+
+
+def get_memory_budget() -> Optional[int]:
+    """
+    Memory budget, in bytes, for the data held by the API. Configured through
+    the env var `MEMORY_BUDGET_MB`, no budget when not set.
+    """
+
+    budget = os.environ.get("MEMORY_BUDGET_MB")
+    return int(float(budget) * 1024 * 1024) if budget else None
+
+
+def compact(obj: Any) -> bytes:
+    """
+    Compact form of an object: pickled and compressed. Much smaller than the
+    DataFrames it holds (the votes are very repetitive strings) and a lot
+    faster to restore than parsing the original JSON.
+    """
+
+    return zlib.compress(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def restore(data: bytes) -> Any:
+    """Inverse of `compact`"""
+
+    return pickle.loads(zlib.decompress(data))
@@ -0,0 +1,265 @@
+import functools
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProfilingConfig:
+    """
+    Opt-in request profiling, configured through env vars.
+
+    Only a fraction (`sample_rate`) of the requests is profiled, and a stack
+    dump is only written when the request was slower than `threshold_ms`.
+    Requests sending the admin token in the `X-Profile` header are always
+    profiled and dumped.
+    """
+
+    enabled: bool = False
+    sample_rate: float = 0.01
+    threshold_ms: float = 1000
+    interval_ms: float = 5
+    max_samples: int = 20_000
+    directory: str = "/tmp/portuguese-politics-profiles"
+    max_files: int = 50
+    admin_token: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "ProfilingConfig":
+        return cls(
+            enabled=os.environ.get("PROFILING_ENABLED", "").lower() in ("1", "true"),
+            sample_rate=float(os.environ.get("PROFILING_SAMPLE_RATE", cls.sample_rate)),
+            threshold_ms=float(
+                os.environ.get("PROFILING_THRESHOLD_MS", cls.threshold_ms)
+            ),
+            interval_ms=float(os.environ.get("PROFILING_INTERVAL_MS", cls.interval_ms)),
+            max_samples=int(os.environ.get("PROFILING_MAX_SAMPLES", cls.max_samples)),
+            directory=os.environ.get("PROFILING_DIR", cls.directory),
+            max_files=int(os.environ.get("PROFILING_MAX_FILES", cls.max_files)),
+            admin_token=os.environ.get("PROFILING_ADMIN_TOKEN") or None,
+        )
+
+
+config = ProfilingConfig.from_env()
+
+
+@dataclass
+class ProfiledRequest:
+    method: str
+    path: str
+    query_params: Dict[str, str]
+    forced: bool
+    dump_path: Optional[str] = field(default=None)
+
+    @property
+    def name(self) -> str:
+        query = "&".join(f"{k}={v}" for k, v in self.query_params.items())
+        return f"{self.method} {self.path}" + (f"?{query}" if query else "")
+
+
+# set by the middleware when the current request was selected to be profiled
+_profiled_request: ContextVar[Optional[ProfiledRequest]] = ContextVar(
+    "profiled_request", default=None
+)
+
+
+class SamplingProfiler:
+    """
+    Periodically sample the stack of a single thread and aggregate the samples
+    in the collapsed stack format used by flamegraph tools.
+    """
+
+    def __init__(self, thread_id: int, interval_ms: float, max_samples: int):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.max_samples = max_samples
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        samples = 0
+        while not self._stop.wait(self.interval) and samples < self.max_samples:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+                frame = frame.f_back
+
+            self.stacks[";".join(reversed(stack))] += 1
+            samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self, root: str) -> str:
+        root = root.replace(";", ",")
+        return "".join(
+            f"{root};{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+def _enforce_max_files(directory: str, max_files: int):
+    """Keep only the most recent `max_files` dumps (and their metadata)"""
+
+    dumps = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".folded")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in dumps[: max(len(dumps) - max_files, 0)]:
+        for path in (entry.path, entry.path[: -len(".folded")] + ".json"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def write_dump(
+    profiler: SamplingProfiler,
+    profiled_request: ProfiledRequest,
+    duration_ms: float,
+    config: ProfilingConfig,
+) -> str:
+    """
+    Store the collapsed stacks of a request, plus its metadata in a sidecar
+    json file, and return the dump path.
+    """
+
+    os.makedirs(config.directory, exist_ok=True)
+
+    endpoint = profiled_request.path.strip("/").replace("/", "_") or "root"
+    stem = os.path.join(
+        config.directory,
+        f"{datetime.utcnow():%Y%m%dT%H%M%S%f}_{endpoint}_{int(duration_ms)}ms",
+    )
+
+    with open(f"{stem}.folded", "w") as f:
+        f.write(profiler.collapsed(profiled_request.name))
+
+    with open(f"{stem}.json", "w") as f:
+        json.dump(
+            {
+                "method": profiled_request.method,
+                "path": profiled_request.path,
+                "query_params": profiled_request.query_params,
+                "duration_ms": round(duration_ms, 1),
+                "forced": profiled_request.forced,
+                "interval_ms": config.interval_ms,
+                "samples": sum(profiler.stacks.values()),
+            },
+            f,
+        )
+
+    _enforce_max_files(config.directory, config.max_files)
+
+    return f"{stem}.folded"
+
+
+def is_admin(request: Request, header: str = "X-Admin-Token") -> bool:
+    """
+    Whether the request sent the admin token, in `header` or as a bearer
+    token. Never when there is no admin token.
+    """
+
+    if config.admin_token is None:
+        return False
+
+    token = request.headers.get(header)
+    if token is None:
+        scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else ""
+
+    return hmac.compare_digest(token.encode(), config.admin_token.encode())
+
+
+async def middleware(request: Request, call_next):
+    """
+    Decide whether the request is profiled. The profiling itself happens in
+    the endpoint thread, see `profiled`.
+    """
+
+    if not config.enabled:
+        return await call_next(request)
+
+    forced = "X-Profile" in request.headers and is_admin(request, "X-Profile")
+    if not forced and random.random() >= config.sample_rate:
+        return await call_next(request)
+
+    profiled_request = ProfiledRequest(
+        method=request.method,
+        path=request.url.path,
+        query_params=dict(request.query_params),
+        forced=forced,
+    )
+    token = _profiled_request.set(profiled_request)
+    try:
+        response = await call_next(request)
+    finally:
+        _profiled_request.reset(token)
+
+    if forced and profiled_request.dump_path:
+        response.headers["X-Profile"] = os.path.basename(profiled_request.dump_path)
+
+    return response
+
+
+def profiled(func: Callable) -> Callable:
+    """
+    Sample the stacks of the endpoint while it runs, when the request was
+    selected by the middleware, and dump them if the request was slow.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiled_request = _profiled_request.get()
+        if profiled_request is None:
+            return func(*args, **kwargs)
+
+        profiler = SamplingProfiler(
+            threading.get_ident(), config.interval_ms, config.max_samples
+        )
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.stop()
+            duration_ms = (time.perf_counter() - start) * 1000
+
+            if profiled_request.forced or duration_ms >= config.threshold_ms:
+                try:
+                    profiled_request.dump_path = write_dump(
+                        profiler, profiled_request, duration_ms, config
+                    )
+                    logger.info(
+                        f"Profile of {profiled_request.name} ({duration_ms:.0f} ms) "
+                        f"stored in {profiled_request.dump_path}"
+                    )
+                except Exception:
+                    # profiling must never break the request
+                    logger.exception("Error storing profile:")
+
+    return wrapper
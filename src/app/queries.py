@@ -0,0 +1,274 @@
+import json
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from src.app import approvals
+from src.app.apis import schemas
+from src.app.responses import Payload, dump_json
+from src.app.store import LegislatureSnapshot
+from src.common import metrics
+from src.common.metrics import timed
+from src.parliament.initiatives import votes
+
+
+def get_party_names(legislature_fields: Dict) -> List[str]:
+    return [party["nome"] for party in legislature_fields["partidos"]]
+
+
+def filter_initiative_votes(
+    initiative_votes: pd.DataFrame,
+    event_phase: schemas.EventPhase,
+    dt_ini: Optional[date] = None,
+    dt_fin: Optional[date] = None,
+    type: Optional[str] = None,
+    name_filter: Optional[str] = None,
+    party: Optional[str] = None,
+    deputy: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Initiative votes matching the filters of the parliament endpoints
+    """
+
+    data_initiatives_votes_ = initiative_votes
+
+    if event_phase != schemas.EventPhase.ALL:
+        data_initiatives_votes_ = data_initiatives_votes_[
+            data_initiatives_votes_["iniciativa_evento_fase"] == event_phase
+        ]
+
+    if dt_ini:
+        data_initiatives_votes_ = data_initiatives_votes_[
+            data_initiatives_votes_["iniciativa_evento_data"].dt.date >= dt_ini
+        ]
+
+    if dt_fin:
+        data_initiatives_votes_ = data_initiatives_votes_[
+            data_initiatives_votes_["iniciativa_evento_data"].dt.date <= dt_fin
+        ]
+
+    if type:
+        data_initiatives_votes_ = data_initiatives_votes_[
+            data_initiatives_votes_["iniciativa_tipo"] == type
+        ]
+
+    if name_filter:
+        data_initiatives_votes_ = data_initiatives_votes_[
+            data_initiatives_votes_["iniciativa_titulo"]
+            .str.lower()
+            .str.contains(name_filter.lower())
+        ]
+
+    if party:
+        data_initiatives_votes_ = data_initiatives_votes_[
+            data_initiatives_votes_["iniciativa_autor"].str.lower() == party.lower()
+        ]
+
+    if deputy:
+        data_initiatives_votes_ = data_initiatives_votes_[
+            data_initiatives_votes_["iniciativa_autor_deputado"]
+            .str.lower()
+            .str.contains(deputy.lower())
+        ]
+
+    return data_initiatives_votes_
+
+
+def export_initiative_votes(
+    initiative_votes: pd.DataFrame,
+    format: schemas.ExportFormat,
+    chunk_size: int = 1000,
+    **filters,
+) -> Iterator[bytes]:
+    """
+    Every initiative vote matching the filters (see `filter_initiative_votes`)
+    as NDJSON or CSV, `chunk_size` rows at a time, so only a chunk is ever
+    filtered and serialized in memory.
+    """
+
+    if format == schemas.ExportFormat.CSV:
+        yield initiative_votes.iloc[:0].to_csv(index=False).encode("utf-8")
+
+    for start in range(0, len(initiative_votes), chunk_size):
+        chunk = filter_initiative_votes(
+            initiative_votes.iloc[start : start + chunk_size], **filters
+        )
+        if chunk.empty:
+            continue
+
+        if format == schemas.ExportFormat.CSV:
+            content = chunk.to_csv(index=False, header=False, date_format="%Y-%m-%d")
+        else:
+            content = chunk.to_json(
+                orient="records", lines=True, date_format="iso", force_ascii=False
+            )
+            if not content.endswith("\n"):
+                content += "\n"
+
+        yield content.encode("utf-8")
+
+
+def party_approvals(
+    snapshot: LegislatureSnapshot,
+    event_phase: schemas.EventPhase,
+    data_initiatives_votes: Optional[pd.DataFrame] = None,
+) -> Payload:
+    """
+    Party approvals response, of the given initiative votes or, when not
+    given, of all the votes of the phase (already serialized and compressed).
+    """
+
+    if data_initiatives_votes is None:
+        metrics.CACHE_REQUESTS.inc(endpoint="party_approvals", result="hit")
+        return snapshot.party_approvals_responses[event_phase.value]
+
+    metrics.CACHE_REQUESTS.inc(endpoint="party_approvals", result="miss")
+
+    with timed("party_approvals.compute"):
+        _party_approvals = approvals.build_party_approvals(
+            votes.get_party_approvals(data_initiatives_votes),
+            snapshot.parties,
+            get_party_names(snapshot.legislature_fields),
+        )
+
+    with timed("party_approvals.serialize"):
+        return Payload(approvals.serialize_party_approvals(_party_approvals))
+
+
+def party_correlations(
+    snapshot: LegislatureSnapshot,
+    event_phase: schemas.EventPhase,
+    data_initiatives_votes: Optional[pd.DataFrame] = None,
+) -> Dict:
+    """
+    Party correlations response, of the given initiative votes or, when not
+    given, of all the votes of the phase.
+    """
+
+    if data_initiatives_votes is None:
+        metrics.CACHE_REQUESTS.inc(endpoint="party_correlations", result="hit")
+        _party_corr = snapshot.party_correlations[event_phase.value]
+    else:
+        metrics.CACHE_REQUESTS.inc(endpoint="party_correlations", result="miss")
+        with timed("party_correlations.compute"):
+            _party_corr = votes.get_party_correlations(data_initiatives_votes)
+
+    with timed("party_correlations.serialize"):
+        _party_corr = _party_corr.to_json(orient="index")
+
+    # transform to the expected schema
+    res = []
+    for _, corr in json.loads(_party_corr).items():
+        res.append(
+            {
+                "nome": corr.pop("nome").replace("iniciativa_votacao_", ""),
+                "correlacoes": {
+                    k.replace("iniciativa_votacao_", ""): v for k, v in corr.items()
+                },
+            }
+        )
+
+    return {"partido": res}
+
+
+def initiatives(
+    data_initiatives_votes: pd.DataFrame, limit: int = 20, offset: int = 0
+) -> Dict:
+    """
+    Initiatives response, a page of the given initiative votes
+    """
+
+    with timed("initiatives.compute"):
+        _initiatives = (
+            votes.get_initiatives(data_initiatives_votes)
+            .sort_values("iniciativa_data")
+            .head(limit + offset)
+            .tail(limit)
+        )
+
+    with timed("initiatives.serialize"):
+        _initiatives = _initiatives.to_json(orient="index")
+
+    # transform to the expected schema
+    res = []
+    for _, initiative in json.loads(_initiatives).items():
+        res.append(initiative)
+
+    return {"initiativas": res}
+
+
+def get_filters(query: schemas.BatchQuery) -> Tuple:
+    """
+    Filters of a sub-query, the same for the sub-queries sharing the votes
+    """
+
+    return (
+        query.legislature,
+        query.event_phase,
+        query.dt_ini,
+        query.dt_fin,
+        query.type,
+        query.name_filter,
+        query.party,
+        query.deputy,
+    )
+
+
+def run_batch(
+    legislatures: Dict[str, LegislatureSnapshot], queries: List[schemas.BatchQuery]
+) -> bytes:
+    """
+    Results of each sub-query, in the same order (already serialized).
+
+    The votes of each distinct set of filters are only filtered once and then
+    shared by all the statistics asking for them, while the statistics without
+    filters other than the phase are taken from the snapshot as in the
+    respective endpoints.
+    """
+
+    filtered: Dict[Tuple, pd.DataFrame] = {}
+
+    def get_votes(query: schemas.BatchQuery) -> pd.DataFrame:
+        filters = get_filters(query)
+        if filters not in filtered:
+            metrics.CACHE_REQUESTS.inc(endpoint="batch", result="miss")
+            with timed("batch.filter"):
+                filtered[filters] = filter_initiative_votes(
+                    legislatures[query.legislature.value].initiative_votes,
+                    *filters[1:],
+                )
+        else:
+            metrics.CACHE_REQUESTS.inc(endpoint="batch", result="hit")
+        return filtered[filters]
+
+    results = []
+    for query in queries:
+        snapshot = legislatures[query.legislature.value]
+        # as in the endpoints, only the phase is already computed
+        unfiltered = get_filters(query)[2:] == (None,) * 6
+
+        if query.statistic == schemas.BatchStatistic.PARTY_APPROVALS:
+            results.append(
+                party_approvals(
+                    snapshot,
+                    query.event_phase,
+                    None if unfiltered else get_votes(query),
+                ).content
+            )
+        elif query.statistic == schemas.BatchStatistic.PARTY_CORRELATIONS:
+            results.append(
+                dump_json(
+                    party_correlations(
+                        snapshot,
+                        query.event_phase,
+                        None if unfiltered else get_votes(query),
+                    )
+                )
+            )
+        else:
+            results.append(
+                dump_json(initiatives(get_votes(query), query.limit, query.offset))
+            )
+
+    return b'{"resultados":[' + b",".join(results) + b"]}"
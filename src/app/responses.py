@@ -0,0 +1,101 @@
+import gzip
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Type
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+
+@dataclass(frozen=True)
+class Payload:
+    """
+    A response body with its compressed versions, when compressed ahead
+    (see `precompress`).
+    """
+
+    content: bytes
+    gzip: Optional[bytes] = None
+
+
+def precompress(content: bytes) -> Payload:
+    """
+    Compress a response body once, to serve it compressed without spending
+    any CPU per request. Compressed versions not smaller are not kept.
+    """
+
+    def smaller(compressed: bytes) -> Optional[bytes]:
+        return compressed if len(compressed) < len(content) else None
+
+    return Payload(
+        content,
+        gzip=smaller(gzip.compress(content, compresslevel=9, mtime=0)),
+    )
+
+
+def get_accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """
+    Encodings accepted by the client (from the `Accept-Encoding` header) with
+    their preference
+    """
+
+    accepted = {}
+    for item in accept_encoding.split(","):
+        encoding, *params = [x.strip() for x in item.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if encoding:
+            accepted[encoding.lower()] = quality
+
+    return accepted
+
+
+def encoded_response(
+    request: Request, payload: Payload, media_type: str = "application/json"
+) -> Response:
+    """
+    Response with the body already compressed with gzip when the client
+    accepts it, or uncompressed otherwise (which can still be compressed by
+    the middleware).
+    """
+
+    accepted = get_accepted_encodings(request.headers.get("accept-encoding", ""))
+    quality = accepted.get("gzip", accepted.get("*", 0.0))
+
+    if payload.gzip is None or quality <= 0:
+        return Response(
+            payload.content,
+            media_type=media_type,
+            headers={"Vary": "Accept-Encoding"},
+        )
+
+    return Response(
+        payload.gzip,
+        media_type=media_type,
+        headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+    )
+
+
+def dump_json(content: Any) -> bytes:
+    """
+    Serialize the content as FastAPI JSONResponse does.
+    """
+
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def serialize_model(model: Type[BaseModel], **content) -> bytes:
+    """
+    Serialize the content as FastAPI would after validating it with the
+    response model, so it can be done once instead of per request.
+    """
+
+    return dump_json(jsonable_encoder(model(**content)))
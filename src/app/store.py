@@ -0,0 +1,471 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.app import columnar, memory
+from src.app.apis.schemas import EventPhase
+from src.app.candidates import CandidatesIndex
+from src.app.responses import Payload
+from src.elections.extract import Election, get_election
+from src.parliament.initiatives.graph import InitiativeGraph
+from src.parliament.initiatives.series import VoteSeries
+from src.parliament.legislatures.intervals import LegislatureIntervals
+from src.parliament.parties import PartyRegistry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LegislatureSnapshot:
+    """
+    Everything the API holds in memory regarding a legislature.
+    """
+
+    # by phase, with all parties of the legislature (see `build_party_approvals`)
+    party_approvals: Dict[str, pd.DataFrame]
+    party_correlations: Dict[str, pd.DataFrame]
+    initiative_votes: pd.DataFrame
+    legislature_fields: Dict
+    # built from the legislature fields when not given
+    parties: Optional[PartyRegistry] = None
+    # party approvals by phase already serialized (and compressed)
+    party_approvals_responses: Dict[str, Payload] = field(default_factory=dict)
+    # vote statistics of each deputy already serialized (and compressed), by
+    # deputy id
+    deputy_stats_responses: Dict[str, Payload] = field(default_factory=dict)
+    # not available for the legislatures processed before they were stored
+    initiatives_graph: Optional[InitiativeGraph] = None
+    legislature_intervals: Optional[LegislatureIntervals] = None
+    # by phase, built on first use (see `vote_series`)
+    _vote_series: Dict[str, VoteSeries] = field(default_factory=dict)
+    # built from the initiative votes when loaded
+    votes_table: columnar.VotesTable = field(init=False)
+    # built on first use (see `version`)
+    _version: Optional[str] = None
+
+    def __post_init__(self):
+        if self.parties is None:
+            self.parties = PartyRegistry.from_legislature_fields(
+                self.legislature_fields
+            )
+        self.votes_table = columnar.VotesTable(self.initiative_votes)
+
+    def vote_series(self, phase: str) -> VoteSeries:
+        """
+        Cumulative vote counts of a phase, to answer any time window
+        """
+
+        series = self._vote_series.get(phase)
+        if series is None:
+            votes = self.initiative_votes
+            if phase != EventPhase.ALL:
+                votes = votes[votes["iniciativa_evento_fase"] == phase]
+            series = VoteSeries.from_votes(votes)
+            self._vote_series[phase] = series
+
+        return series
+
+    def version(self) -> str:
+        """
+        Version of the data of the legislature, changes when it is updated
+        """
+
+        if self._version is None:
+            self._version = columnar.get_version(
+                [
+                    self.initiative_votes,
+                    *self.party_approvals.values(),
+                    *self.party_correlations.values(),
+                ]
+            )
+
+        return self._version
+
+    def memory_usage(self) -> Dict[str, int]:
+        usage = {}
+        for phase, df in self.party_approvals.items():
+            usage[f"party_approvals.{phase}"] = memory.deep_memory_usage(df)
+        for phase, df in self.party_correlations.items():
+            usage[f"party_correlations.{phase}"] = memory.deep_memory_usage(df)
+        usage["initiative_votes"] = memory.deep_memory_usage(self.initiative_votes)
+        usage["legislature_fields"] = memory.deep_memory_usage(self.legislature_fields)
+        usage["party_approvals_responses"] = memory.deep_memory_usage(
+            self.party_approvals_responses
+        )
+        usage["deputy_stats_responses"] = memory.deep_memory_usage(
+            self.deputy_stats_responses
+        )
+        usage["initiatives_graph"] = memory.deep_memory_usage(self.initiatives_graph)
+        usage["legislature_intervals"] = memory.deep_memory_usage(
+            self.legislature_intervals
+        )
+        usage["vote_series"] = memory.deep_memory_usage(self._vote_series)
+        usage["votes_table"] = self.votes_table.table.nbytes
+        return usage
+
+
+class Tier(str, Enum):
+    # fully loaded, ready to be used
+    RESIDENT = "resident"
+    # kept compressed in memory, restored on access and then kept as the
+    # ones loaded on access
+    COMPACT = "compact"
+    # did not fit the budget when preloaded, loaded on access
+    DEFERRED = "deferred"
+    # not preloaded, loaded on first access
+    LAZY = "lazy"
+
+
+class LegislatureStore:
+    """
+    Hold the snapshots of all legislatures within a memory budget.
+
+    Preloaded legislatures are loaded in the given order (the most relevant
+    first) and kept fully in memory while they fit the budget. The ones that do
+    not fit are kept in a compact form, or not kept at all when even that does
+    not fit, instead of bringing down the whole worker.
+
+    Lazy legislatures (the closed ones) are only loaded on first access. They
+    stay in memory while being used and are evicted, least recently used
+    first, when the budget is needed for another one or after being idle for
+    `idle_seconds` (checked on access and periodically, see `start_sweeper`).
+    The same for the compact ones once restored, which keep the compact form
+    to be restored again.
+
+    Each legislature is loaded by a single request at a time, the others
+    waiting for it, without blocking the requests for other legislatures.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], LegislatureSnapshot],
+        budget: Optional[int] = None,
+        idle_seconds: Optional[float] = None,
+    ):
+        self._loader = loader
+        self.budget = budget
+        self.idle_seconds = idle_seconds
+        self._resident: Dict[str, LegislatureSnapshot] = {}
+        self._compact: Dict[str, bytes] = {}
+        self._tiers: Dict[str, Tier] = {}
+        self._usage: Dict[str, Dict[str, int]] = {}
+        # memory held by the preloaded legislatures
+        self._used = 0
+        # legislatures loaded (or restored) on access: snapshot, size and last
+        # access
+        self._on_demand: OrderedDict[str, Tuple[LegislatureSnapshot, int, float]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        # held while a legislature is loaded on access, by legislature
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweeper = threading.Event()
+
+    def load(self, legislatures: List[str], lazy: List[str] = ()):
+        for legislature in legislatures:
+            self._preload(legislature, self._loader(legislature))
+
+        for legislature in lazy:
+            self._tiers[legislature] = Tier.LAZY
+
+    def _preload(self, legislature: str, snapshot: LegislatureSnapshot):
+        usage = snapshot.memory_usage()
+        self._usage[legislature] = usage
+        size = sum(usage.values())
+
+        if self.budget is None or self._used + size <= self.budget:
+            self._resident[legislature] = snapshot
+            self._tiers[legislature] = Tier.RESIDENT
+            self._used += size
+            return
+
+        compacted = memory.compact(snapshot)
+        if self._used + len(compacted) <= self.budget:
+            self._compact[legislature] = compacted
+            self._tiers[legislature] = Tier.COMPACT
+            self._used += len(compacted)
+        else:
+            self._tiers[legislature] = Tier.DEFERRED
+
+        logger.warning(
+            f"Legislature {legislature} ({size / 2**20:.1f} MB) does not fit the "
+            f"memory budget, kept as {self._tiers[legislature].value}."
+        )
+
+    def reload(self, legislatures: List[str]):
+        """
+        Load the given legislatures again, keeping the others as they are.
+
+        Preloaded legislatures are replaced once the new snapshot is loaded,
+        so they are always available, and the ones loaded on access are just
+        evicted, to be loaded again on the next access. Requests still using
+        the previous snapshot keep their own reference.
+        """
+
+        for legislature in legislatures:
+            tier = self._tiers.get(legislature)
+
+            if tier in (Tier.RESIDENT, Tier.COMPACT):
+                snapshot = self._loader(legislature)
+                # not while being restored from the previous snapshot
+                with self._load_lock(legislature), self._lock:
+                    # the memory held by the previous snapshot is released
+                    if tier == Tier.RESIDENT:
+                        self._used -= sum(self._usage[legislature].values())
+                    else:
+                        self._used -= len(self._compact[legislature])
+
+                    self._preload(legislature, snapshot)
+
+                    if self._tiers[legislature] != Tier.RESIDENT:
+                        self._resident.pop(legislature, None)
+                    if self._tiers[legislature] != Tier.COMPACT:
+                        self._compact.pop(legislature, None)
+                    # restored from the previous snapshot
+                    self._on_demand.pop(legislature, None)
+            elif tier is not None:
+                # not while being loaded from the previous version
+                with self._load_lock(legislature), self._lock:
+                    self._on_demand.pop(legislature, None)
+
+            logger.info(f"Legislature {legislature} reloaded.")
+
+    def _evict(self, needed: int, keep: Optional[str] = None):
+        """
+        Evict legislatures loaded on access, least recently used first, until
+        there is room for `needed` bytes (and the idle ones in any case),
+        except `keep`.
+        """
+
+        now = time.monotonic()
+        for legislature, (_, size, last_access) in list(self._on_demand.items()):
+            if legislature == keep:
+                continue
+            idle = (
+                self.idle_seconds is not None and now - last_access > self.idle_seconds
+            )
+            if idle or not self._fits(needed):
+                # requests still using it keep their own reference
+                del self._on_demand[legislature]
+                logger.info(f"Legislature {legislature} evicted from memory.")
+
+    def _fits(self, size: int) -> bool:
+        held = self._used + sum(held for _, held, _ in self._on_demand.values())
+        return self.budget is None or held + size <= self.budget
+
+    def sweep(self):
+        """
+        Evict the legislatures loaded on access idle for `idle_seconds`
+        """
+
+        with self._lock:
+            self._evict(0)
+
+    def start_sweeper(self, interval: float = 60):
+        """
+        Sweep every `interval` seconds in the background, so idle legislatures
+        are evicted even without requests
+        """
+
+        def run():
+            while not self._stop_sweeper.wait(interval):
+                self.sweep()
+
+        self._stop_sweeper.clear()
+        self._sweeper = threading.Thread(target=run, daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop_sweeper.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def _load_lock(self, legislature: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(legislature, threading.Lock())
+
+    def _get_held(self, legislature: str) -> Optional[LegislatureSnapshot]:
+        """
+        Snapshot loaded on access, when still held, marked as used
+        """
+
+        with self._lock:
+            if legislature not in self._on_demand:
+                return None
+
+            snapshot, size, _ = self._on_demand.pop(legislature)
+            self._on_demand[legislature] = (snapshot, size, time.monotonic())
+            self._evict(0, keep=legislature)
+            return snapshot
+
+    def _get_on_demand(self, legislature: str) -> LegislatureSnapshot:
+        snapshot = self._get_held(legislature)
+        if snapshot is not None:
+            return snapshot
+
+        with self._load_lock(legislature):
+            # loaded by another request meanwhile
+            snapshot = self._get_held(legislature)
+            if snapshot is not None:
+                return snapshot
+
+            with self._lock:
+                compacted = self._compact.get(legislature)
+                # measured when preloaded
+                size = sum(self._usage.get(legislature, {}).values())
+
+            # downloaded (or restored) without holding the store
+            if compacted is not None:
+                snapshot = memory.restore(compacted)
+            else:
+                snapshot = self._loader(legislature)
+                usage = snapshot.memory_usage()
+                size = sum(usage.values())
+
+            with self._lock:
+                if compacted is None:
+                    self._usage[legislature] = usage
+                self._evict(size)
+                # kept even when it does not fit alone, since it is held
+                # anyway while being used, so the budget is exceeded by it at
+                # most
+                self._on_demand[legislature] = (snapshot, size, time.monotonic())
+
+            return snapshot
+
+    def __getitem__(self, legislature: str) -> LegislatureSnapshot:
+        if self._tiers[legislature] == Tier.RESIDENT:
+            # unless no longer resident after a reload
+            snapshot = self._resident.get(legislature)
+            if snapshot is not None:
+                return snapshot
+
+        return self._get_on_demand(legislature)
+
+    def __contains__(self, legislature: str) -> bool:
+        return legislature in self._tiers
+
+    def memory_report(self) -> Dict:
+        """
+        Memory held by each legislature, per object, and how it is being held
+        """
+
+        legislatures = {}
+        for legislature, tier in self._tiers.items():
+            # lazy legislatures are only measured once loaded
+            objects = self._usage.get(legislature, {})
+            if tier == Tier.RESIDENT:
+                held = sum(objects.values())
+            else:
+                held = len(self._compact.get(legislature, b""))
+                if legislature in self._on_demand:
+                    held += self._on_demand[legislature][1]
+
+            legislatures[legislature] = {
+                "tier": tier.value,
+                "held_bytes": held,
+                "full_bytes": sum(objects.values()),
+                "objects": objects,
+            }
+
+        return {
+            "budget_bytes": self.budget,
+            "held_bytes": sum(v["held_bytes"] for v in legislatures.values()),
+            "legislatures": legislatures,
+        }
+
+
+@dataclass
+class ElectionSnapshot:
+    """
+    Everything the API holds in memory regarding an election.
+    """
+
+    # already serialized (and compressed), the response does not depend on any
+    # parameter
+    parties: Payload
+    candidates: CandidatesIndex
+
+
+class ElectionStore:
+    """
+    Hold the elections already requested.
+
+    Elections are static and small, so each one is loaded on first access and
+    then kept, and registering more elections does not change the memory used
+    at startup.
+
+    The elections not processed yet are remembered as such until
+    `clear_missing`, so requesting them does not read our datalake every time.
+    """
+
+    def __init__(self, loader: Callable[[Election], Optional[ElectionSnapshot]]):
+        self._loader = loader
+        # None when the election was not processed yet
+        self._loaded: Dict[Tuple[str, int], Optional[ElectionSnapshot]] = {}
+        self._lock = threading.Lock()
+        # held while an election is loaded, by election
+        self._load_locks: Dict[Tuple[str, int], threading.Lock] = {}
+
+    def _load_lock(self, key: Tuple[str, int]) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def get(self, type: str, year: int) -> Optional[ElectionSnapshot]:
+        """
+        Snapshot of the election, None if the election is not supported or
+        was not processed yet
+        """
+
+        election = get_election(type, year)
+        if election is None:
+            return None
+
+        with self._lock:
+            if election.key in self._loaded:
+                return self._loaded[election.key]
+
+        # loaded without holding the other elections
+        with self._load_lock(election.key):
+            with self._lock:
+                # loaded by another request meanwhile
+                if election.key in self._loaded:
+                    return self._loaded[election.key]
+
+            snapshot = self._loader(election)
+
+            with self._lock:
+                self._loaded[election.key] = snapshot
+
+        return snapshot
+
+    def clear_missing(self):
+        """
+        Forget the elections not processed, to look for them again (they may
+        be stored by now)
+        """
+
+        with self._lock:
+            self._loaded = {
+                key: snapshot
+                for key, snapshot in self._loaded.items()
+                if snapshot is not None
+            }
+
+    def memory_report(self) -> Dict[str, int]:
+        with self._lock:
+            loaded = list(self._loaded.items())
+
+        return {
+            f"{type}_{year}": memory.deep_memory_usage(snapshot)
+            for (type, year), snapshot in loaded
+            if snapshot is not None
+        }
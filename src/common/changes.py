@@ -0,0 +1,194 @@
+import datetime
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from src.common.storage import read_blob, upload_json
+
+if TYPE_CHECKING:
+    from azure.storage.blob import ContainerClient as BlobContainerClient
+
+logger = logging.getLogger(__name__)
+
+# written by the cronjob after uploading the raw data of the legislatures
+CHANGES_BLOB = "raw_changes.json"
+
+# seconds between checks of the marker
+POLL_INTERVAL = int(os.environ.get("CHANGES_POLL_SECONDS", 300))
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class ChangeMarker(ABC):
+    """
+    Hash of the raw data of each legislature, updated by the cronjob whenever
+    it uploads new raw data, so the daily updater knows what changed without
+    looking at the raw data itself.
+
+    Stored as {legislature: {"content_sha256": ..., "updated_at": ...}}.
+    """
+
+    @abstractmethod
+    def _read(self, force: bool = False) -> Optional[Dict]:
+        """
+        Content of the marker, None when it did not change since the last read
+        (unless forced), empty when it does not exist yet
+        """
+
+    @abstractmethod
+    def _write(self, marker: Dict):
+        pass
+
+    def read(self) -> Optional[Dict[str, str]]:
+        """
+        Hash of the raw data of each legislature, None when the marker did
+        not change since the last read
+        """
+
+        marker = self._read()
+        if marker is None:
+            return None
+
+        return {
+            legislature: change["content_sha256"]
+            for legislature, change in marker.items()
+        }
+
+    def write(self, hashes: Dict[str, str]):
+        """
+        Update the hash of the raw data of the given legislatures, keeping the
+        others
+        """
+
+        marker = self._read(force=True)
+
+        updated = False
+        for legislature, content_sha256 in hashes.items():
+            if marker.get(legislature, {}).get("content_sha256") != content_sha256:
+                marker[legislature] = {
+                    "content_sha256": content_sha256,
+                    "updated_at": _now(),
+                }
+                updated = True
+
+        if updated:
+            self._write(marker)
+
+
+class BlobChangeMarker(ChangeMarker):
+    """
+    Marker stored in Blob Storage. Only its properties are requested to know
+    if it changed, it is downloaded only when it did.
+    """
+
+    def __init__(self, container_client: "BlobContainerClient"):
+        self._blob_client = container_client.get_blob_client(CHANGES_BLOB)
+        self._etag: Optional[str] = None
+
+    def _read(self, force: bool = False) -> Optional[Dict]:
+        try:
+            etag = self._blob_client.get_blob_properties().etag
+            if etag == self._etag and not force:
+                return None
+            marker = json.loads(read_blob(self._blob_client))
+        except ResourceNotFoundError:
+            return {}
+
+        self._etag = etag
+        return marker
+
+    def _write(self, marker: Dict):
+        upload_json(self._blob_client, marker)
+
+
+class FileChangeMarker(ChangeMarker):
+    """
+    Marker stored in a local file, to run everything locally without Blob
+    Storage events. Only read again when the file is modified.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._mtime: Optional[int] = None
+
+    def _read(self, force: bool = False) -> Optional[Dict]:
+        try:
+            mtime = os.stat(self._path).st_mtime_ns
+            if mtime == self._mtime and not force:
+                return None
+            with open(self._path) as f:
+                marker = json.load(f)
+        except FileNotFoundError:
+            return {}
+
+        self._mtime = mtime
+        return marker
+
+    def _write(self, marker: Dict):
+        # replaced at once, never read half written
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(marker, f)
+        os.replace(tmp_path, self._path)
+
+
+def get_change_marker(container_client: "BlobContainerClient") -> ChangeMarker:
+    """
+    Marker in the local file of the env var `CHANGES_FILE` when set, otherwise
+    in Blob Storage
+    """
+
+    path = os.environ.get("CHANGES_FILE")
+    if path:
+        return FileChangeMarker(path)
+
+    return BlobChangeMarker(container_client)
+
+
+class ChangeWatcher:
+    """
+    Process each legislature as soon as the marker has a new hash of its raw
+    data. Nothing is done while the marker does not change.
+
+    A legislature is only considered processed when `process` succeeds, so it
+    is tried again in the next poll when it raises.
+    """
+
+    def __init__(self, marker: ChangeMarker, process: Callable[[List[str]], List[str]]):
+        self._marker = marker
+        self._process = process
+        # hash of the raw data of each legislature already processed
+        self._processed: Dict[str, str] = {}
+        self._pending: Dict[str, str] = {}
+
+    def poll(self) -> List[str]:
+        """
+        Process the legislatures with new raw data, returning the ones
+        processed (see `process`)
+        """
+
+        hashes = self._marker.read()
+        if hashes is not None:
+            self._pending = {
+                legislature: content_sha256
+                for legislature, content_sha256 in hashes.items()
+                if self._processed.get(legislature) != content_sha256
+            }
+
+        if not self._pending:
+            return []
+
+        changed = list(self._pending)
+        logger.info(f"New raw data of {changed}.")
+        processed = self._process(changed)
+
+        for legislature in changed:
+            self._processed[legislature] = self._pending.pop(legislature)
+
+        return processed
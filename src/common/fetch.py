@@ -0,0 +1,181 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import (IO, Any, Callable, Dict, Iterable, List, Optional, Tuple,
+                    TypeVar)
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeouts, in seconds
+TIMEOUT = (10, 120)
+
+# attempts after the first one, waiting a random time up to BACKOFF * 2 ** n
+# seconds before the n-th (full jitter)
+RETRIES = 4
+BACKOFF = 1.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# what is lost of a chunk being read when a download is interrupted
+CHUNK_SIZE = 64 * 1024
+
+# sources fetched at the same time
+MAX_CONCURRENCY = 4
+
+# fake, but without it Parlamento rejects the requests
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+# conditional headers, not sent when resuming a download
+CONDITIONAL_HEADERS = ["If-None-Match", "If-Modified-Since"]
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """
+    Session of the current thread, reusing its connections (keep-alive)
+    across requests. Sessions are not shared between threads.
+    """
+
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        _local.session = session
+
+    return session
+
+
+class RetryableStatus(requests.HTTPError):
+    """The server answered with an error that may be temporary"""
+
+
+RETRYABLE_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    RetryableStatus,
+)
+
+
+def _wait(url: str, attempt: int, error: Exception):
+    wait = random.uniform(0, BACKOFF * 2**attempt)
+    logger.warning(f"Error fetching {url} ({error}), retrying in {wait:.1f}s.")
+    time.sleep(wait)
+
+
+def _check_status(response: requests.Response):
+    if response.status_code in RETRY_STATUS:
+        raise RetryableStatus(
+            f"{response.status_code} for {response.url}", response=response
+        )
+
+
+def fetch(
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Tuple[float, float] = TIMEOUT,
+    retries: int = RETRIES,
+) -> requests.Response:
+    """
+    GET an url, retrying connection errors, timeouts and temporary errors of
+    the server. Other responses (e.g. 304 or 404) are returned as they are.
+    """
+
+    for attempt in range(retries + 1):
+        try:
+            response = get_session().get(url, headers=headers, timeout=timeout)
+            _check_status(response)
+            return response
+        except RETRYABLE_ERRORS as e:
+            if attempt == retries:
+                raise
+            _wait(url, attempt, e)
+
+
+def fetch_json(url: str, **kwargs) -> Any:
+    """
+    Content of a JSON document (see `fetch`)
+    """
+
+    response = fetch(url, **kwargs)
+    response.raise_for_status()
+
+    return response.json()
+
+
+def download(
+    url: str,
+    file: IO[bytes],
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Tuple[float, float] = TIMEOUT,
+    retries: int = RETRIES,
+) -> requests.Response:
+    """
+    Stream the content of an url into a file, in chunks, returning the
+    response (status and headers) without its content. The content is only
+    written when the status is 200.
+
+    When the download fails midway it is resumed from what was already written
+    with a range request, as long as the content did not change meanwhile
+    (`If-Range`), instead of starting again. The content is requested without
+    content encoding, so what was written is also the offset to resume from.
+    """
+
+    start = file.tell()
+    first: Optional[requests.Response] = None
+
+    for attempt in range(retries + 1):
+        written = file.tell() - start
+        request_headers = {**(headers or {}), "Accept-Encoding": "identity"}
+        if written:
+            for header in CONDITIONAL_HEADERS:
+                request_headers.pop(header, None)
+            request_headers["Range"] = f"bytes={written}-"
+            validator = first.headers.get("ETag") or first.headers.get("Last-Modified")
+            if validator:
+                request_headers["If-Range"] = validator
+
+        try:
+            with get_session().get(
+                url, headers=request_headers, stream=True, timeout=timeout
+            ) as response:
+                _check_status(response)
+
+                if response.status_code == 206 and written:
+                    logger.info(f"Resuming {url} from byte {written}.")
+                elif response.status_code == 200:
+                    # the whole content, from the start again when resuming
+                    # was not possible (e.g. the content changed)
+                    first = response
+                    file.seek(start)
+                    file.truncate()
+                else:
+                    return response
+
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    file.write(chunk)
+
+            return first
+        except RETRYABLE_ERRORS as e:
+            if attempt == retries:
+                raise
+            _wait(url, attempt, e)
+
+
+def fetch_all(
+    func: Callable[[T], R], items: Iterable[T], max_concurrency: int = MAX_CONCURRENCY
+) -> List[R]:
+    """
+    Apply `func` to each item at the same time (up to `max_concurrency`),
+    returning the results in the same order. The first error is raised.
+    """
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        return list(executor.map(func, items))
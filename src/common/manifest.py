@@ -0,0 +1,245 @@
+import datetime
+import hashlib
+import json
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (HttpResponseError, ResourceExistsError,
+                                   ResourceModifiedError,
+                                   ResourceNotFoundError)
+
+from src.common.storage import read_blob_etag, upload_json
+
+if TYPE_CHECKING:
+    from azure.storage.blob import BlobClient
+    from azure.storage.blob import ContainerClient as BlobContainerClient
+
+logger = logging.getLogger(__name__)
+
+# which version of the processed data of each legislature is the current one
+MANIFEST_BLOB = "manifest.json"
+
+# the manifest is read, updated and written by one publication at a time in
+# this process, and only written if no other process wrote it meanwhile, else
+# it is read and updated again up to `MANIFEST_RETRIES` times
+_lock = threading.Lock()
+MANIFEST_RETRIES = 5
+
+# versions replaced less than this long ago may still be read by the API,
+# besides the previous one which is always kept
+VERSION_GRACE = datetime.timedelta(hours=1)
+
+
+class Manifest:
+    """
+    Current version of the processed data of each legislature.
+
+    The blobs of a legislature are published in groups (e.g. the initiatives
+    and the composition, processed separately), each group under its own
+    versioned prefix, as {legislature: {group: {"prefix": ..., "blobs": [...],
+    "sha256": ..., "published_at": ...}}}. The hash identifies the data the
+    group was processed from, so it does not change while that data does not.
+    """
+
+    def __init__(
+        self, legislatures: Optional[Dict[str, Dict]] = None, etag: Optional[str] = None
+    ):
+        self.legislatures = legislatures or {}
+        # of the manifest blob read, None when there was none
+        self.etag = etag
+
+    def sha256(self, legislature: str, group: str) -> Optional[str]:
+        """
+        Hash of the data a group of blobs was processed from
+        """
+
+        return self.legislatures.get(legislature, {}).get(group, {}).get("sha256")
+
+    def content_hash(self, legislature: str) -> Optional[str]:
+        """
+        Hash of all the published data of a legislature, None when nothing was
+        published yet
+        """
+
+        groups = self.legislatures.get(legislature)
+        if not groups:
+            return None
+
+        content_hash = hashlib.sha256()
+        for group, entry in sorted(groups.items()):
+            content_hash.update(
+                f"{group}:{entry['prefix']}:{entry['sha256']};".encode()
+            )
+
+        return content_hash.hexdigest()
+
+    def container(
+        self, container_client: "BlobContainerClient", legislature: str
+    ) -> "PublishedContainer":
+        return PublishedContainer(container_client, self.legislatures.get(legislature))
+
+    def to_dict(self) -> Dict:
+        return {"legislaturas": self.legislatures}
+
+    @classmethod
+    def from_dict(cls, data: Dict, etag: Optional[str] = None) -> "Manifest":
+        return cls(data.get("legislaturas"), etag)
+
+
+def read_manifest(container_client: "BlobContainerClient") -> Manifest:
+    """
+    Current manifest, empty before anything was published
+    """
+
+    try:
+        content, etag = read_blob_etag(container_client.get_blob_client(MANIFEST_BLOB))
+    except ResourceNotFoundError:
+        return Manifest()
+
+    return Manifest.from_dict(json.loads(content), etag)
+
+
+def _is_conflict(error: HttpResponseError) -> bool:
+    """The manifest was written by someone else since it was read"""
+    return (
+        isinstance(error, (ResourceExistsError, ResourceModifiedError))
+        or error.status_code == 412
+    )
+
+
+def _version_time(prefix: str) -> datetime.datetime:
+    """When a version (see `Publication.prefix`) started being written"""
+    return datetime.datetime.strptime(
+        prefix.rstrip("/").rsplit("/", 1)[-1][: len("YYYYmmddTHHMMSS")],
+        "%Y%m%dT%H%M%S",
+    ).replace(tzinfo=datetime.timezone.utc)
+
+
+class PublishedContainer:
+    """
+    Container client where the blobs of a legislature are the ones of its
+    current version. Blobs not published under a version (stored before
+    versions were used, or not part of any group) keep their name.
+    """
+
+    def __init__(
+        self, container_client: "BlobContainerClient", groups: Optional[Dict[str, Dict]]
+    ):
+        self._container_client = container_client
+        self._names = {
+            name: entry["prefix"] + name
+            for entry in (groups or {}).values()
+            for name in entry["blobs"]
+        }
+
+    def get_blob_client(self, blob: str) -> "BlobClient":
+        return self._container_client.get_blob_client(self._names.get(blob, blob))
+
+
+class Publication:
+    """
+    New version of a group of blobs of a legislature.
+
+    Blobs are written under a new prefix, so the current version is never
+    touched while the new one is written, and are only used once `publish`
+    updates the manifest, which replaces all of them at once. A publication
+    not published (e.g. an error while processing) is never used.
+    """
+
+    def __init__(
+        self,
+        container_client: "BlobContainerClient",
+        legislature: str,
+        group: str,
+        sha256: str,
+    ):
+        self._container_client = container_client
+        self.legislature = legislature
+        self.group = group
+        self.sha256 = sha256
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.prefix = (
+            f"{legislature}/{group}/{now.strftime('%Y%m%dT%H%M%S')}-{sha256[:8]}/"
+        )
+        self._blobs: List[str] = []
+
+    def get_blob_client(self, blob: str) -> "BlobClient":
+        if blob not in self._blobs:
+            self._blobs.append(blob)
+        return self._container_client.get_blob_client(self.prefix + blob)
+
+    def publish(self):
+        """
+        Make this version the current one, and delete the older versions
+        """
+
+        with _lock:
+            for attempt in range(MANIFEST_RETRIES + 1):
+                manifest = read_manifest(self._container_client)
+                groups = manifest.legislatures.setdefault(self.legislature, {})
+                previous = groups.get(self.group, {}).get("prefix")
+                groups[self.group] = {
+                    "prefix": self.prefix,
+                    "blobs": self._blobs,
+                    "sha256": self.sha256,
+                    "published_at": datetime.datetime.now(
+                        datetime.timezone.utc
+                    ).isoformat(),
+                }
+                # a single blob, replaced at once when the upload is committed,
+                # as long as it is still the one read
+                conditions = (
+                    {
+                        "etag": manifest.etag,
+                        "match_condition": MatchConditions.IfNotModified,
+                    }
+                    if manifest.etag
+                    else {"match_condition": MatchConditions.IfMissing}
+                )
+                try:
+                    upload_json(
+                        self._container_client.get_blob_client(MANIFEST_BLOB),
+                        manifest.to_dict(),
+                        conditions=conditions,
+                    )
+                    break
+                except HttpResponseError as e:
+                    if not _is_conflict(e) or attempt == MANIFEST_RETRIES:
+                        raise
+                    logger.warning(
+                        f"Manifest changed while publishing {self.prefix}, retrying."
+                    )
+
+        logger.info(f"Published {self.prefix}.")
+        # the API may still be reading the previous version
+        self._delete_versions(keep=[self.prefix, previous])
+
+    def _delete_versions(self, keep: List[Optional[str]]):
+        """
+        Delete the versions of the group older than this one, published or
+        not, except `keep` and the ones replaced less than `VERSION_GRACE` ago.
+
+        A version is replaced by the next one, about when it started being
+        written (see `_version_time`).
+        """
+
+        group_prefix = f"{self.legislature}/{self.group}/"
+
+        blobs = {}
+        for blob in self._container_client.list_blobs(name_starts_with=group_prefix):
+            version = blob.name[: blob.name.index("/", len(group_prefix)) + 1]
+            # prefixes start with the time of the publication, newer ones may
+            # still be being written
+            if version < self.prefix:
+                blobs.setdefault(version, []).append(blob.name)
+
+        versions = sorted(blobs)
+        deadline = datetime.datetime.now(datetime.timezone.utc) - VERSION_GRACE
+        for version, replaced_by in zip(versions, versions[1:] + [self.prefix]):
+            if version in keep or _version_time(replaced_by) > deadline:
+                continue
+            for name in blobs[version]:
+                self._container_client.delete_blob(name)
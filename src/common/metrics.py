@@ -0,0 +1,267 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# seconds, from a cached lookup up to a full legislature being processed
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+    900.0,
+)
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Tuple) -> str:
+    if not labelnames:
+        return ""
+
+    labels = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'),
+        )
+        for name, value in zip(labelnames, labelvalues)
+    )
+    return "{" + labels + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(labels[name] for name in self.labelnames)
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        pass
+
+    def render(self) -> List[str]:
+        with self._lock:
+            samples = self._samples()
+
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type_name}",
+            *samples,
+        ]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self) -> List[str]:
+        samples = []
+        for key, (counts, total) in self._values.items():
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(
+                    self.labelnames + ("le",), key + (_format_value(bound),)
+                )
+                samples.append(f"{self.name}_bucket{labels} {count}")
+
+            labels = _format_labels(self.labelnames, key)
+            samples.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            samples.append(f"{self.name}_count{labels} {counts[-1]}")
+
+        return samples
+
+
+class Registry:
+    """
+    Keeps all metrics of the process in memory so they can be exposed in the
+    Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = OrderedDict()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        return self._register(Counter(name, description, labelnames))
+
+    def gauge(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        return self._register(Gauge(name, description, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        return self._register(Histogram(name, description, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "portuguese_politics_stage_duration_seconds",
+    "Time spent in each instrumented stage.",
+    ["stage"],
+)
+REQUEST_LATENCY = REGISTRY.histogram(
+    "portuguese_politics_request_duration_seconds",
+    "End to end latency of each endpoint.",
+    ["method", "endpoint", "status"],
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "portuguese_politics_cache_requests_total",
+    "Requests answered from the precomputed snapshot (hit) or computed (miss).",
+    ["endpoint", "result"],
+)
+SNAPSHOT_BYTES = REGISTRY.gauge(
+    "portuguese_politics_snapshot_bytes",
+    "Size of each blob loaded into memory, as downloaded.",
+    ["blob"],
+)
+SNAPSHOT_ROWS = REGISTRY.gauge(
+    "portuguese_politics_snapshot_rows",
+    "Number of rows of each table loaded into memory.",
+    ["table", "legislature"],
+)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Measure the time spent inside the block and record it under `stage`.
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - start, stage=stage)
+
+
+class StageReport:
+    """
+    Collect the duration of each stage of a run, in the order they happened,
+    so a structured report can be logged at the end.
+
+    Every stage is also recorded in the process metrics.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages: List[Dict] = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, stage: str, **attributes) -> Iterator[None]:
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            STAGE_DURATION.observe(elapsed, stage=f"{self.name}.{stage}")
+            self.stages.append(
+                {
+                    "stage": stage,
+                    **attributes,
+                    "status": status,
+                    "duration_seconds": round(elapsed, 3),
+                }
+            )
+
+    def to_dict(self) -> Dict:
+        return {
+            "run": self.name,
+            "total_duration_seconds": round(time.perf_counter() - self._start, 3),
+            "stages": self.stages,
+        }
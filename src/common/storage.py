@@ -0,0 +1,265 @@
+import base64
+import json
+import shutil
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (IO, TYPE_CHECKING, Any, Dict, Iterable, Iterator, List,
+                    Optional, Tuple, Union)
+
+import pandas as pd
+from azure.core.exceptions import ResourceNotFoundError
+
+if TYPE_CHECKING:
+    # the Azure SDK is slow to import, and the API never writes blobs
+    from azure.storage.blob import BlobClient
+
+# size of each staged block and how many are uploaded at the same time, the
+# memory used by an upload is bounded by (MAX_CONCURRENCY + 1) * BLOCK_SIZE
+BLOCK_SIZE = 4 * 1024 * 1024
+MAX_CONCURRENCY = 4
+
+# rows serialized at once when uploading a DataFrame
+ROWS_PER_CHUNK = 5_000
+
+# blobs are stored compressed with gzip, the JSON files are very repetitive
+GZIP_MAGIC = b"\x1f\x8b"
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+COMPRESSION_LEVEL = 6
+
+
+def get_blob_metadata(blob_client: "BlobClient") -> Dict[str, str]:
+    """
+    Metadata stored with a blob, empty if the blob does not exist yet.
+    """
+
+    try:
+        return dict(blob_client.get_blob_properties().metadata or {})
+    except ResourceNotFoundError:
+        return {}
+
+
+def iter_blob(blob_client: "BlobClient") -> Iterator[bytes]:
+    """
+    Download a blob in chunks, decompressing them as they arrive when the blob
+    is compressed. Blobs stored before compression was used are read as they
+    are.
+    """
+
+    # decompressed by us, regardless of the HTTP client
+    return _decompress(blob_client.download_blob(decompress=False).chunks())
+
+
+def _decompress(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    decompressor = None
+    for chunk in chunks:
+        if decompressor is None:
+            decompressor = (
+                zlib.decompressobj(GZIP_WBITS) if chunk[:2] == GZIP_MAGIC else False
+            )
+
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        if chunk:
+            yield chunk
+
+    if decompressor:
+        yield decompressor.flush()
+
+
+def read_blob(blob_client: "BlobClient") -> bytes:
+    """
+    Content of a blob, decompressed when needed.
+    """
+
+    return b"".join(iter_blob(blob_client))
+
+
+def read_blob_etag(blob_client: "BlobClient") -> Tuple[bytes, str]:
+    """
+    Content of a blob, decompressed when needed, and the ETag of that content,
+    to only replace the blob while it does not change (see `BlockBlobWriter`).
+    """
+
+    downloader = blob_client.download_blob(decompress=False)
+    return b"".join(_decompress(downloader.chunks())), downloader.properties.etag
+
+
+class BlockBlobWriter:
+    """
+    File-like object that uploads what is written to a block blob.
+
+    Written data is staged in blocks of `block_size`, up to `max_concurrency`
+    at the same time, and the blob is only replaced when the writer is closed
+    (committing the block list). When an error happens inside the `with`
+    block nothing is committed and the previous blob is kept.
+
+    When `compress` is set the content is compressed with gzip while written,
+    and stored with the matching content encoding.
+
+    `conditions` are the access conditions of the commit (e.g. `etag` and
+    `match_condition`), when they do not hold the blob is not replaced and the
+    error of the Azure SDK is raised.
+    """
+
+    def __init__(
+        self,
+        blob_client: "BlobClient",
+        metadata: Optional[Dict[str, str]] = None,
+        block_size: int = BLOCK_SIZE,
+        max_concurrency: int = MAX_CONCURRENCY,
+        compress: bool = True,
+        content_type: str = "application/json",
+        conditions: Optional[Dict[str, Any]] = None,
+    ):
+        from azure.storage.blob import ContentSettings
+
+        self._blob_client = blob_client
+        self._metadata = metadata
+        self._conditions = conditions or {}
+        self._content_settings = ContentSettings(
+            content_type=content_type, content_encoding="gzip" if compress else None
+        )
+        self._compressor = (
+            zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+            if compress
+            else None
+        )
+        self._block_size = block_size
+        self._buffer = bytearray()
+        self._block_ids: List[str] = []
+        self._futures: List[Future] = []
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        # blocks waiting to be uploaded, bounds the memory used
+        self._pending = threading.BoundedSemaphore(max_concurrency)
+        self.closed = False
+
+    def write(self, data: Union[str, bytes]) -> int:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        self._buffer += self._compressor.compress(data) if self._compressor else data
+        while len(self._buffer) >= self._block_size:
+            self._stage(bytes(self._buffer[: self._block_size]))
+            del self._buffer[: self._block_size]
+
+        return len(data)
+
+    def _stage(self, block: bytes):
+        # all block ids of a blob must have the same length
+        block_id = base64.b64encode(f"{len(self._block_ids):08d}".encode()).decode()
+        self._block_ids.append(block_id)
+
+        self._pending.acquire()
+        future = self._executor.submit(
+            self._blob_client.stage_block, block_id=block_id, data=block
+        )
+        future.add_done_callback(lambda _: self._pending.release())
+        self._futures.append(future)
+
+    def _wait(self):
+        for future in self._futures:
+            # raises the error of a failed upload
+            future.result()
+
+    def close(self):
+        if self.closed:
+            return
+
+        from azure.storage.blob import BlobBlock
+
+        try:
+            if self._compressor:
+                self._buffer += self._compressor.flush()
+            if self._buffer:
+                self._stage(bytes(self._buffer))
+                self._buffer.clear()
+            self._wait()
+
+            self._blob_client.commit_block_list(
+                [BlobBlock(block_id=block_id) for block_id in self._block_ids],
+                content_settings=self._content_settings,
+                metadata=self._metadata,
+                **self._conditions,
+            )
+        finally:
+            self.abort()
+
+    def abort(self):
+        """
+        Stop without committing, the staged blocks are discarded by Azure.
+        """
+
+        self.closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "BlockBlobWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def upload_stream(
+    blob_client: "BlobClient",
+    stream: IO[bytes],
+    metadata: Optional[Dict[str, str]] = None,
+):
+    """
+    Upload a file-like object to a blob, without reading it all into memory.
+    """
+
+    with BlockBlobWriter(blob_client, metadata=metadata) as writer:
+        shutil.copyfileobj(stream, writer, BLOCK_SIZE)
+
+
+def upload_json(
+    blob_client: "BlobClient",
+    obj: Any,
+    metadata: Optional[Dict[str, str]] = None,
+    conditions: Optional[Dict[str, Any]] = None,
+):
+    """
+    Upload an object as JSON, the same as `json.dumps(obj)`, serializing it
+    while it is uploaded. See `BlockBlobWriter` for the `conditions`.
+    """
+
+    with BlockBlobWriter(
+        blob_client, metadata=metadata, conditions=conditions
+    ) as writer:
+        for chunk in json.JSONEncoder().iterencode(obj):
+            writer.write(chunk)
+
+
+def upload_dataframe(
+    blob_client: "BlobClient",
+    df: pd.DataFrame,
+    orient: str = "index",
+    metadata: Optional[Dict[str, str]] = None,
+):
+    """
+    Upload a DataFrame as JSON, the same as `df.to_json(orient=orient)`, for
+    the orients where each row is serialized on its own ("index", "records").
+
+    Only `ROWS_PER_CHUNK` rows are serialized at a time, instead of holding
+    the whole document in memory.
+    """
+
+    if orient not in ("index", "records"):
+        raise ValueError(f"Orient {orient} is not supported.")
+
+    opening, closing = "{}" if orient == "index" else "[]"
+
+    with BlockBlobWriter(blob_client, metadata=metadata) as writer:
+        writer.write(opening)
+        for start in range(0, len(df), ROWS_PER_CHUNK):
+            chunk = df.iloc[start : start + ROWS_PER_CHUNK].to_json(orient=orient)
+
+            # each chunk is a complete document, only its rows are written
+            if start:
+                writer.write(",")
+            writer.write(chunk[1:-1])
+        writer.write(closing)
@@ -1,25 +1,47 @@
 import datetime
+import hashlib
 import json
 import logging
 import os
 import sys
+import threading
+from typing import List, Optional
 
-import requests
 from apscheduler.schedulers.blocking import BlockingScheduler
 from azure.storage.blob import BlobClient, BlobServiceClient
 from azure.storage.blob import ContainerClient as BlobContainerClient
 from tqdm import tqdm
 
 from src.app.apis.schemas import EventPhase
+from src.common.changes import POLL_INTERVAL, ChangeWatcher, get_change_marker
+from src.common.fetch import fetch
+from src.common.manifest import Publication, read_manifest
+from src.common.metrics import StageReport
+from src.common.storage import get_blob_metadata, upload_dataframe, upload_json
+from src.elections.extract import ELECTIONS, store_election
+from src.parliament.initiatives.deputies import (get_deputy_rollups_from_blob,
+                                                 store_deputy_rollups)
 from src.parliament.initiatives.extract import ONGOING_PATHS as PATHS
-from src.parliament.initiatives.extract import (get_initiatives,
+from src.parliament.initiatives.extract import (get_deputies_votes,
+                                                get_initiatives,
+                                                get_initiatives_relations,
                                                 get_initiatives_votes,
-                                                get_raw_data_from_blob)
+                                                get_non_registered_deputies,
+                                                get_raw_data_from_blob,
+                                                get_vote_patterns_from_blob,
+                                                store_deputies_votes,
+                                                store_vote_patterns)
+from src.parliament.initiatives.graph import InitiativeGraph
 from src.parliament.initiatives.votes import (get_party_approvals,
                                               get_party_correlations)
+from src.parliament.legislatures.extract import \
+    ALL_PATHS as AllLegislaturePaths
 from src.parliament.legislatures.extract import \
     ONGOING_PATHS as LegislaturePaths
-from src.parliament.legislatures.extract import get_legislatures_fields
+from src.parliament.legislatures.extract import get_legislatures_compositions
+from src.parliament.legislatures.intervals import LegislatureIntervals
+from src.parliament.parties import (get_party_registry_from_blob,
+                                    store_party_registry)
 
 logger = logging.getLogger(__name__)
 handler = logging.StreamHandler(sys.stdout)
@@ -27,6 +49,10 @@ logger.addHandler(handler)
 
 sched = BlockingScheduler()
 
+# `main` and `watch` may run at the same time, and both process and publish the
+# initiatives, reading and updating the rollups of previous runs
+initiatives_lock = threading.Lock()
+
 
 def get_blob_container() -> BlobContainerClient:
     """
@@ -60,7 +86,7 @@ def update_app():
     Send a request to Portuguese Politics app to refresh data
     """
 
-    r = requests.get("https://portuguese-politics.herokuapp.com/update")
+    r = fetch("https://portuguese-politics.herokuapp.com/update")
     if r.status_code != 200:
         logger.error(r.status_code)
         logger.error(r.content)
@@ -68,34 +94,178 @@ def update_app():
         return {"Ok"}
 
 
-def run_legislatures(blob_storage_container_client: BlobContainerClient):
-    for legislature_name, path in tqdm(
-        LegislaturePaths, "processing_legislatures", file=sys.stdout
+def run_legislatures(
+    blob_storage_container_client: BlobContainerClient, report: StageReport
+) -> List[str]:
+    """
+    Store the composition of each ongoing legislature (and of the closed ones
+    not stored yet), returning the ones whose composition changed.
+    """
+
+    published = []
+
+    manifest = read_manifest(blob_storage_container_client)
+
+    # the composition of the closed legislatures does not change anymore, it
+    # is only stored once (e.g. the first run after they are closed)
+    paths = LegislaturePaths + [
+        (legislature_name, path)
+        for legislature_name, path in AllLegislaturePaths
+        if (legislature_name, path) not in LegislaturePaths
+        and manifest.sha256(legislature_name, "composition") is None
+    ]
+
+    # all legislatures are downloaded at the same time
+    with report.stage("legislatures.extract"):
+        compositions = get_legislatures_compositions([path for _, path in paths])
+
+    for (legislature_name, _), (legislature_fields, intervals) in tqdm(
+        list(zip(paths, compositions)),
+        "processing_legislatures",
+        file=sys.stdout,
     ):
-        blob_client: BlobClient = blob_storage_container_client.get_blob_client(
-            f"{legislature_name}_legislatures.json"
+        # composition at any date, see `/parliament/legislatures?as_of=`
+        legislature_intervals = LegislatureIntervals(
+            intervals, legislature_fields["legislatura"]
+        ).to_dict()
+
+        composition_sha256 = hashlib.sha256(
+            json.dumps([legislature_fields, legislature_intervals]).encode("utf-8")
+        ).hexdigest()
+        if composition_sha256 == manifest.sha256(legislature_name, "composition"):
+            logger.info(f"{legislature_name} composition did not change, skipping.")
+            continue
+
+        publication = Publication(
+            blob_storage_container_client,
+            legislature_name,
+            "composition",
+            composition_sha256,
         )
-        legislature_fields = get_legislatures_fields(path=path)
-        blob_client.upload_blob(json.dumps(legislature_fields), overwrite=True)
+        with report.stage("legislatures.upload", legislature=legislature_name):
+            upload_json(
+                publication.get_blob_client(f"{legislature_name}_legislatures.json"),
+                legislature_fields,
+            )
+            upload_json(
+                publication.get_blob_client(
+                    f"{legislature_name}_legislature_intervals.json"
+                ),
+                legislature_intervals,
+            )
+            publication.publish()
+
+        published.append(legislature_name)
+
+    return published
+
+
+def run_elections(
+    blob_storage_container_client: BlobContainerClient, report: StageReport
+):
+    # elections data is static, only stored when not in Blob Storage yet
+    for election in ELECTIONS.values():
+        try:
+            with report.stage(f"elections.{election.name}"):
+                store_election(blob_storage_container_client, election)
+        except Exception:
+            # an election not available should not stop the others
+            logger.exception(f"Error storing election {election.name}:")
+
+
+def run_initiatives(
+    blob_storage_container_client: BlobContainerClient,
+    report: StageReport,
+    legislatures: Optional[List[str]] = None,
+) -> List[str]:
+    """
+    Process the initiatives of each ongoing legislature (or only the given
+    ones), returning the ones that had new raw data.
+    """
+
+    processed = []
 
+    manifest = read_manifest(blob_storage_container_client)
+
+    paths = [
+        (legislature_name, path)
+        for legislature_name, path in PATHS
+        if legislatures is None or legislature_name in legislatures
+    ]
 
-def run_initiatives(blob_storage_container_client: BlobContainerClient):
     # Go through each supported legislature and store the statistics
     # and raw data
-    for legislature_name, _ in tqdm(PATHS, "processing_legislatures", file=sys.stdout):
-        # load raw data (json format) from Blob Sotrage (cache from parlamento API)
-        raw_initiatives = get_raw_data_from_blob(
-            blob_storage_container_client, legislature_name
+    for legislature_name, _ in tqdm(paths, "processing_legislatures", file=sys.stdout):
+        # the cronjob stores the hash of the raw data, and we store the hash of
+        # the raw data used to compute the processed data
+        raw_sha256 = get_blob_metadata(
+            blob_storage_container_client.get_blob_client(f"{legislature_name}.json")
+        ).get("content_sha256")
+        if raw_sha256 and raw_sha256 == manifest.sha256(
+            legislature_name, "initiatives"
+        ):
+            logger.info(f"{legislature_name} raw data did not change, skipping.")
+            continue
+
+        # the blobs read by the API are written as a new version, only used
+        # once published, and the current ones are read from the current one
+        published = manifest.container(blob_storage_container_client, legislature_name)
+        publication = Publication(
+            blob_storage_container_client,
+            legislature_name,
+            "initiatives",
+            raw_sha256 or "",
         )
 
+        # load raw data (json format) from Blob Sotrage (cache from parlamento API)
+        with report.stage("initiatives.download", legislature=legislature_name):
+            raw_initiatives = get_raw_data_from_blob(
+                blob_storage_container_client, legislature_name
+            )
+
         # collect all initiatives, still very raw info
-        df_initiatives = get_initiatives(raw_initiatives)
+        with report.stage("initiatives.parse", legislature=legislature_name):
+            df_initiatives = get_initiatives(raw_initiatives)
+
+        # how initiatives relate to each other, as an adjacency structure
+        with report.stage("initiatives.relations", legislature=legislature_name):
+            initiatives_graph = InitiativeGraph.from_relations(
+                *get_initiatives_relations(raw_initiatives)
+            )
+            upload_json(
+                publication.get_blob_client(
+                    f"{legislature_name}_initiatives_graph.json"
+                ),
+                initiatives_graph.to_dict(),
+            )
 
         # free up memory
-        del raw_initiatives
+        del raw_initiatives, initiatives_graph
 
         # collect vote information from all initiatives
-        df_initiatives_votes = get_initiatives_votes(df_initiatives)
+        # parties and deputies voting in this legislature, the deputies not
+        # registered in any parliamentary group are also found in the
+        # initiatives, updated more often than the composition
+        registry = get_party_registry_from_blob(
+            published, legislature_name, get_non_registered_deputies(df_initiatives)
+        )
+        store_party_registry(publication, legislature_name, registry)
+
+        # vote results parsed in previous runs are not parsed again
+        vote_patterns = get_vote_patterns_from_blob(
+            blob_storage_container_client, legislature_name, registry
+        )
+        with report.stage(
+            "initiatives.votes",
+            legislature=legislature_name,
+            stored_vote_patterns=len(vote_patterns),
+        ):
+            df_initiatives_votes = get_initiatives_votes(
+                df_initiatives, vote_patterns, registry
+            )
+        store_vote_patterns(
+            blob_storage_container_client, legislature_name, vote_patterns, registry
+        )
 
         # we do not need those initiatives, they were dropped
         df_initiatives_votes = df_initiatives_votes[
@@ -103,11 +273,31 @@ def run_initiatives(blob_storage_container_client: BlobContainerClient):
         ]
 
         # store initiative votes in Blob Storage, already processed
-        initiatives_votes = df_initiatives_votes.to_json(orient="index")
-        blob_client: BlobClient = blob_storage_container_client.get_blob_client(
-            f"{legislature_name}_initiatives_votes.json"
-        )
-        blob_client.upload_blob(initiatives_votes, overwrite=True)
+        with report.stage("initiatives.upload", legislature=legislature_name):
+            upload_dataframe(
+                publication.get_blob_client(
+                    f"{legislature_name}_initiatives_votes.json"
+                ),
+                df_initiatives_votes,
+            )
+
+        # votes of each deputy not voting with their party, and the monthly
+        # rollups used for the deputies statistics, where only the votes not
+        # counted in previous runs are added
+        with report.stage("deputies.votes", legislature=legislature_name):
+            df_deputies_votes = get_deputies_votes(df_initiatives_votes, registry)
+            store_deputies_votes(
+                blob_storage_container_client, legislature_name, df_deputies_votes
+            )
+
+        rollups = get_deputy_rollups_from_blob(published, legislature_name, registry)
+        with report.stage(
+            "deputies.rollups",
+            legislature=legislature_name,
+            stored_votes=len(rollups.votes),
+        ):
+            rollups.update(df_initiatives_votes, df_deputies_votes, registry)
+            store_deputy_rollups(publication, legislature_name, rollups, registry)
 
         # Break the results per initiative phase and
         # store the info in Azure Blob Storage
@@ -119,50 +309,127 @@ def run_initiatives(blob_storage_container_client: BlobContainerClient):
             else:
                 df_initiatives_votes_ = df_initiatives_votes
 
-            party_approvals = get_party_approvals(df_initiatives_votes_).to_json(
-                orient="index"
-            )
-            party_correlations = get_party_correlations(df_initiatives_votes_).to_json(
-                orient="index"
-            )
-
-            # party_approvals
-            blob_client: BlobClient = blob_storage_container_client.get_blob_client(
-                f"{legislature_name}_party_approvals_{phase.name.lower()}.json"
-            )
-            blob_client.upload_blob(party_approvals, overwrite=True)
-
-            # party_correlations
-            blob_client: BlobClient = blob_storage_container_client.get_blob_client(
-                f"{legislature_name}_party_correlations_{phase.name.lower()}.json"
-            )
-            blob_client.upload_blob(party_correlations, overwrite=True)
+            with report.stage(
+                "party_approvals.compute",
+                legislature=legislature_name,
+                phase=phase.name.lower(),
+            ):
+                party_approvals = get_party_approvals(df_initiatives_votes_)
+            with report.stage(
+                "party_correlations.compute",
+                legislature=legislature_name,
+                phase=phase.name.lower(),
+            ):
+                party_correlations = get_party_correlations(df_initiatives_votes_)
+
+            with report.stage(
+                "statistics.upload",
+                legislature=legislature_name,
+                phase=phase.name.lower(),
+            ):
+                # party_approvals
+                blob_client: BlobClient = publication.get_blob_client(
+                    f"{legislature_name}_party_approvals_{phase.name.lower()}.json"
+                )
+                upload_dataframe(blob_client, party_approvals)
+
+                # party_correlations
+                blob_client: BlobClient = publication.get_blob_client(
+                    f"{legislature_name}_party_correlations_{phase.name.lower()}.json"
+                )
+                upload_dataframe(blob_client, party_correlations)
+
+        # only now, with everything stored, the new version is used (and the
+        # raw data considered processed)
+        with report.stage("initiatives.publish", legislature=legislature_name):
+            publication.publish()
+
+        processed.append(legislature_name)
+
+    return processed
 
 
 @sched.scheduled_job("cron", hour="3", minute="00")
 def main() -> None:
+    """
+    Process everything: the initiatives (only the legislatures with new raw
+    data, usually none since `watch` processes them as soon as they change),
+    the legislatures and the elections.
+    """
+
     utc_timestamp = (
         datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat()
     )
 
     logger.info("Portuguese Politics daily updater ran at %s", utc_timestamp)
 
+    report = StageReport("daily_updater")
+
     # Get Blob Storage client
     blob_storage_container_client = get_blob_container()
 
-    # get all initiatives data
-    run_initiatives(blob_storage_container_client)
+    try:
+        # get all initiatives data
+        with initiatives_lock:
+            processed = run_initiatives(blob_storage_container_client, report)
+
+        # get all legislatures data
+        published = run_legislatures(blob_storage_container_client, report)
 
-    # get all legislatures data
-    run_legislatures(blob_storage_container_client)
+        # get all elections data
+        run_elections(blob_storage_container_client, report)
 
-    # force API to reload the new data
-    update_app()
+        # force API to reload the new data, if there is any
+        if processed or published:
+            with report.stage("update_app"):
+                update_app()
+    finally:
+        # per-stage timings, one structured line per run
+        logger.info(json.dumps(report.to_dict()))
 
     logger.info("Done.")
 
 
-#if __name__ == "__main__":
-#   main()
+watcher: Optional[ChangeWatcher] = None
+
+
+def process_changes(legislatures: List[str]) -> List[str]:
+    """
+    Process the initiatives of the given legislatures and make the API reload
+    them, returning the ones processed
+    """
+
+    report = StageReport("changes")
+
+    try:
+        with initiatives_lock:
+            processed = run_initiatives(get_blob_container(), report, legislatures)
+
+        if processed:
+            with report.stage("update_app"):
+                update_app()
+    finally:
+        logger.info(json.dumps(report.to_dict()))
+
+    return processed
+
+
+@sched.scheduled_job("interval", seconds=POLL_INTERVAL, max_instances=1)
+def watch() -> None:
+    """
+    Process the initiatives of a legislature as soon as the cronjob uploads
+    new raw data, instead of waiting for the next `main`.
+    """
+
+    global watcher
+
+    if watcher is None:
+        watcher = ChangeWatcher(
+            get_change_marker(get_blob_container()), process_changes
+        )
+
+    watcher.poll()
+
 
-sched.start()
+if __name__ == "__main__":
+    sched.start()
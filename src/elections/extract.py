@@ -1,9 +1,38 @@
-from typing import Dict, List, Tuple, Union
+import json
+import logging
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
 
 import pandas as pd
-import requests
+from azure.core.exceptions import ResourceNotFoundError
 
-PATH_LEGISLATIVAS_2019 = "https://raw.githubusercontent.com/Politica-Para-Todos/ppt-archive/master/legislativas/legislativas-2019/data.json"
+from src.common.fetch import fetch_json
+from src.common.storage import BlockBlobWriter, read_blob
+
+if TYPE_CHECKING:
+    from azure.storage.blob import ContainerClient as BlobContainerClient
+
+logger = logging.getLogger(__name__)
+
+PPT_ARCHIVE = "https://raw.githubusercontent.com/Politica-Para-Todos/ppt-archive/master"
+PPT_MANIFESTOS = (
+    "https://raw.githubusercontent.com/Politica-Para-Todos/manifestos/master"
+)
+
+PATH_LEGISLATIVAS_2019 = f"{PPT_ARCHIVE}/legislativas/legislativas-2019/data.json"
+
+# candidates of elections with a single constituency (e.g. europeias) are
+# expected not to be grouped by district in PPT data, to be checked against its
+# data when one is registered
+NATIONAL_CONSTITUENCY = "Portugal"
+
+# used when the datalake does not have the processed tables (see
+# `cache_election`)
+LOCAL_CACHE_DIR = os.environ.get(
+    "ELECTIONS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "portuguese-politics")
+)
 
 # mapping between party and manifesto inside PPT repo
 PARTY_TO_MANIFESTO_LEGISLATIVAS_2019 = {
@@ -28,45 +57,96 @@ PARTY_TO_MANIFESTO_LEGISLATIVAS_2019 = {
 }
 
 
+@dataclass
+class Election:
+    """
+    An election available in PPT archive.
+    """
+
+    type: str
+    year: int
+    # folder of the election inside PPT archive
+    archive: str
+    # folder of the manifestos inside PPT manifestos repo
+    manifestos: str = ""
+    party_to_manifesto: Dict[str, Union[str, List[str]]] = field(default_factory=dict)
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return self.type.lower(), self.year
+
+    @property
+    def name(self) -> str:
+        return f"{self.type.lower()}_{self.year}"
+
+    @property
+    def path(self) -> str:
+        return f"{PPT_ARCHIVE}/{self.archive}/data.json"
+
+    # processed tables, stored once in our datalake since the data is static
+    @property
+    def parties_blob(self) -> str:
+        return f"{self.name}_parties.json"
+
+    @property
+    def candidates_blob(self) -> str:
+        return f"{self.name}_candidates.json"
+
+
+# all supported elections by (type, year), type in lower case
+ELECTIONS: Dict[Tuple[str, int], Election] = {}
+
+
+def register_election(election: Election):
+    ELECTIONS[election.key] = election
+
+
+def get_election(type: str, year: int) -> Optional[Election]:
+    return ELECTIONS.get((type.lower(), year))
+
+
+register_election(
+    Election(
+        "Legislativas",
+        2019,
+        archive="legislativas/legislativas-2019",
+        manifestos="legislativas/20191006_legislativas",
+        party_to_manifesto=PARTY_TO_MANIFESTO_LEGISLATIVAS_2019,
+    )
+)
+
+
 def get_data(path: str) -> Dict:
     """Load the most recent data provided by PPT"""
 
     try:
-        payload = requests.get(path)
-        assert payload.status_code == 200
-
-        return payload.json()
-    except Exception as e:
-        print(path)
-        raise e
+        return fetch_json(path)
+    except Exception:
+        logger.exception(f"Error downloading {path}.")
+        raise
 
 
-def extract_legislativas_2019() -> Tuple[pd.DataFrame, pd.DataFrame]:
+def extract_election(election: Election) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
-    Extract Portuguese Legislativas 2019 information from PPT community
+    Extract Portuguese election information from PPT community
 
     Will return info regarding parties and regarding candidates
     """
 
     # load data
-    raw_legislativas_2019 = get_data(PATH_LEGISLATIVAS_2019)
+    raw_election = get_data(election.path)
 
     # we do not use this information
-    raw_legislativas_2019.pop("manifestos")
+    raw_election.pop("manifestos", None)
 
     def _get_manifesto(party) -> Union[str, List]:
-        manifesto = PARTY_TO_MANIFESTO_LEGISLATIVAS_2019.get(party, "")
+        manifesto = election.party_to_manifesto.get(party, "")
         # deal with alliances
         if isinstance(manifesto, list):
-            return [
-                f"https://raw.githubusercontent.com/Politica-Para-Todos/manifestos/master/legislativas/20191006_legislativas/{m}"
-                for m in manifesto
-            ]
+            return [f"{PPT_MANIFESTOS}/{election.manifestos}/{m}" for m in manifesto]
 
         return (
-            f"https://raw.githubusercontent.com/Politica-Para-Todos/manifestos/master/legislativas/20191006_legislativas/{manifesto}"
-            if manifesto
-            else ""
+            f"{PPT_MANIFESTOS}/{election.manifestos}/{manifesto}" if manifesto else ""
         )
 
     parties = []
@@ -75,7 +155,7 @@ def extract_legislativas_2019() -> Tuple[pd.DataFrame, pd.DataFrame]:
     def clean_str(txt: str) -> str:
         return None if txt in ["-", ""] else txt
 
-    for party, values in raw_legislativas_2019["parties"].items():
+    for party, values in raw_election["parties"].items():
         tmp_party = {
             "acronym": party.strip(),
             "name": clean_str(values.get("name", "").strip()),
@@ -86,7 +166,7 @@ def extract_legislativas_2019() -> Tuple[pd.DataFrame, pd.DataFrame]:
             "email": clean_str(values.get("email", "").strip()),
             "facebook": clean_str(values.get("facebook", "").strip()),
             "instagram": clean_str(values.get("instagram", "").strip()),
-            "logo": f"https://raw.githubusercontent.com/Politica-Para-Todos/ppt-archive/master/legislativas/legislativas-2019/partidos_logos/{values['logo']}"
+            "logo": f"{PPT_ARCHIVE}/{election.archive}/partidos_logos/{values['logo']}"
             if "logo" in values
             else None,
             "twitter": clean_str(values.get("twitter", "").strip()),
@@ -97,7 +177,11 @@ def extract_legislativas_2019() -> Tuple[pd.DataFrame, pd.DataFrame]:
         # store party info
         parties.append(tmp_party)
 
-        for district, main_secundary_candidates in values.get("candidates", {}).items():
+        candidates_by_district = values.get("candidates", {})
+        if "main" in candidates_by_district or "secundary" in candidates_by_district:
+            candidates_by_district = {NATIONAL_CONSTITUENCY: candidates_by_district}
+
+        for district, main_secundary_candidates in candidates_by_district.items():
             for c in main_secundary_candidates.get(
                 "main", []
             ) + main_secundary_candidates.get("secundary", []):
@@ -119,7 +203,7 @@ def extract_legislativas_2019() -> Tuple[pd.DataFrame, pd.DataFrame]:
                             "link_parlamento": clean_str(
                                 c.get("link_parlamento", "").strip()
                             ),
-                            "photo": f"https://raw.githubusercontent.com/Politica-Para-Todos/ppt-archive/master/legislativas/legislativas-2019/cabeca_de_lista_fotos/{c['photo']}"
+                            "photo": f"{PPT_ARCHIVE}/{election.archive}/cabeca_de_lista_fotos/{c['photo']}"
                             if "photo" in c
                             else None,
                             "photo_source": clean_str(
@@ -132,3 +216,107 @@ def extract_legislativas_2019() -> Tuple[pd.DataFrame, pd.DataFrame]:
                 candidates.append(tmp_candidates)
 
     return pd.DataFrame(parties).set_index("acronym"), pd.DataFrame(candidates)
+
+
+def extract_legislativas_2019() -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Extract Portuguese Legislativas 2019 information from PPT community
+    """
+
+    return extract_election(get_election("Legislativas", 2019))
+
+
+def _to_json(parties: pd.DataFrame, candidates: pd.DataFrame) -> Tuple[str, str]:
+    return parties.to_json(orient="index"), candidates.to_json(orient="records")
+
+
+def _from_json(parties: Union[str, bytes], candidates: Union[str, bytes]):
+    return (
+        pd.DataFrame.from_dict(json.loads(parties), orient="index").rename_axis(
+            "acronym"
+        ),
+        pd.DataFrame(json.loads(candidates)),
+    )
+
+
+def store_election(
+    blob_container: "BlobContainerClient", election: Election, overwrite: bool = False
+) -> bool:
+    """
+    Extract an election and store the processed tables in our Blob Storage. The
+    data is static, so by default it only happens once.
+
+    Return if the tables were stored.
+    """
+
+    parties_blob = blob_container.get_blob_client(election.parties_blob)
+    candidates_blob = blob_container.get_blob_client(election.candidates_blob)
+
+    if not overwrite and parties_blob.exists() and candidates_blob.exists():
+        return False
+
+    parties, candidates = _to_json(*extract_election(election))
+    for blob_client, data in ((parties_blob, parties), (candidates_blob, candidates)):
+        with BlockBlobWriter(blob_client) as writer:
+            writer.write(data)
+
+    return True
+
+
+def cache_election(election: Election, overwrite: bool = False) -> bool:
+    """
+    Extract an election and store the processed tables in the local cache, to
+    use the API without the datalake. By default it only happens once.
+
+    Return if the tables were stored.
+    """
+
+    parties_path = os.path.join(LOCAL_CACHE_DIR, election.parties_blob)
+    candidates_path = os.path.join(LOCAL_CACHE_DIR, election.candidates_blob)
+
+    if (
+        not overwrite
+        and os.path.exists(parties_path)
+        and os.path.exists(candidates_path)
+    ):
+        return False
+
+    parties, candidates = _to_json(*extract_election(election))
+
+    os.makedirs(LOCAL_CACHE_DIR, exist_ok=True)
+    for path, data in ((parties_path, parties), (candidates_path, candidates)):
+        # write to a temporary file first, a partial file is never read
+        with open(f"{path}.tmp", "w") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+
+    return True
+
+
+def load_election(
+    blob_container: "BlobContainerClient", election: Election
+) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """
+    Load the processed tables of an election from our Blob Storage, or from
+    the local cache when they are not there (see `cache_election`).
+
+    Return None when the election was not processed yet, it is never extracted
+    from PPT here.
+    """
+
+    try:
+        return _from_json(
+            read_blob(blob_container.get_blob_client(election.parties_blob)),
+            read_blob(blob_container.get_blob_client(election.candidates_blob)),
+        )
+    except ResourceNotFoundError:
+        logger.warning(f"Election {election.name} not found in Blob Storage.")
+
+    parties_path = os.path.join(LOCAL_CACHE_DIR, election.parties_blob)
+    candidates_path = os.path.join(LOCAL_CACHE_DIR, election.candidates_blob)
+
+    if not (os.path.exists(parties_path) and os.path.exists(candidates_path)):
+        return None
+
+    with open(parties_path) as parties, open(candidates_path) as candidates:
+        return _from_json(parties.read(), candidates.read())
@@ -9,7 +9,8 @@ def get_most_recent_status(x: Union[Any, List], date_field):
     if not x: return {"carDes": "not found"}
 
     obj_as_list = to_list(x)
-    return list(sorted(obj_as_list, key=lambda x: x[date_field]))[-1]
+    # the last one with the most recent date, as when sorting by date
+    return max(reversed(obj_as_list), key=lambda x: x[date_field])
 
 
 class MyDict(dict):
@@ -0,0 +1,387 @@
+import json
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import pandas as pd
+from azure.core.exceptions import ResourceNotFoundError
+
+from src.common.storage import read_blob, upload_json
+from src.parliament.legislatures.intervals import LegislatureIntervals
+from src.parliament.parties import (DEFAULT_REGISTRY, PartyRegistry,
+                                    normalize_name)
+
+if TYPE_CHECKING:
+    from azure.storage.blob import ContainerClient as BlobContainerClient
+
+# bump when the rollups change, so stored rollups are computed again
+DEPUTY_ROLLUPS_VERSION = 2
+
+PARTY_ROLLUP_COLUMNS = ["partido", "mes", "votacoes", "presencas"]
+DEPUTY_ROLLUP_COLUMNS = [
+    "deputado",
+    "partido",
+    "mes",
+    "votacoes",
+    "presencas",
+    "divergencias",
+    "rebeldias",
+]
+
+ABSENT = "ausência"
+
+
+def _month(dates: pd.Series) -> pd.Series:
+    return pd.to_datetime(dates).dt.strftime("%Y-%m")
+
+
+def get_vote_keys(votes: pd.DataFrame) -> pd.Series:
+    """
+    Identify each vote, by initiative and event (each event has a single vote,
+    see `get_initiatives_votes`), with its phase and date
+    """
+
+    return (
+        votes["iniciativa_id"].astype(str)
+        + "_"
+        + votes["iniciativa_evento_id"].astype(str)
+        + "_"
+        + votes["iniciativa_evento_fase"].astype(str)
+        + "_"
+        + pd.to_datetime(votes["iniciativa_evento_data"]).dt.strftime("%Y-%m-%d")
+    )
+
+
+def get_party_rollups(
+    initiatives_votes: pd.DataFrame, registry: PartyRegistry = DEFAULT_REGISTRY
+) -> pd.DataFrame:
+    """
+    Number of votes and of votes present, per party (and deputy not registered
+    in any parliamentary group) per month.
+    """
+
+    months = _month(initiatives_votes["iniciativa_evento_data"])
+    unanime = initiatives_votes["iniciativa_votacao_unanime"] == "unanime"
+
+    rollups = []
+    for column in registry.vote_columns:
+        if column not in initiatives_votes:
+            continue
+
+        # when the vote was unanimous the parties vote is empty
+        votes_ = initiatives_votes[column].where(
+            initiatives_votes[column].notna() | ~unanime, "afavor"
+        )
+        df = pd.DataFrame(
+            {
+                "mes": months,
+                "votacoes": votes_.notna(),
+                "presencas": votes_.notna() & (votes_ != ABSENT),
+            }
+        )
+        df = df.groupby("mes", as_index=False).sum()
+        df.insert(0, "partido", column[len("iniciativa_votacao_") :])
+        rollups.append(df[df["votacoes"] > 0])
+
+    if not rollups:
+        return pd.DataFrame(columns=PARTY_ROLLUP_COLUMNS)
+
+    return pd.concat(rollups, ignore_index=True)[PARTY_ROLLUP_COLUMNS]
+
+
+def get_deputy_rollups(deputies_votes: pd.DataFrame) -> pd.DataFrame:
+    """
+    How the deputies voting differently from their party (see
+    `get_deputies_votes`) change the rollups of their party, per deputy per
+    month: the party rollups count the deputy as voting with the party.
+    """
+
+    deputies_votes = deputies_votes[deputies_votes["partido"].notna()]
+
+    party_voted = deputies_votes["voto_partido"].notna()
+    party_present = party_voted & (deputies_votes["voto_partido"] != ABSENT)
+    present = deputies_votes["voto"] != ABSENT
+    opposite = {("afavor", "contra"), ("contra", "afavor")}
+
+    df = pd.DataFrame(
+        {
+            "deputado": deputies_votes["deputado"],
+            "partido": deputies_votes["partido"],
+            "mes": _month(deputies_votes["iniciativa_evento_data"]),
+            # the vote was not counted in the party rollups
+            "votacoes": (~party_voted).astype(int),
+            "presencas": present.astype(int) - party_present.astype(int),
+            "divergencias": (
+                present
+                & party_present
+                & (deputies_votes["voto"] != deputies_votes["voto_partido"])
+            ).astype(int),
+            "rebeldias": [
+                (voto, voto_partido) in opposite
+                for voto, voto_partido in zip(
+                    deputies_votes["voto"], deputies_votes["voto_partido"]
+                )
+            ],
+        }
+    )
+    df["rebeldias"] = df["rebeldias"].astype(int)
+
+    return df.groupby(["deputado", "partido", "mes"], as_index=False).sum()[
+        DEPUTY_ROLLUP_COLUMNS
+    ]
+
+
+def _add(a: pd.DataFrame, b: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    if a.empty:
+        return b.reset_index(drop=True)
+    if b.empty:
+        return a
+    return pd.concat([a, b]).groupby(keys, as_index=False).sum()
+
+
+@dataclass
+class DeputyRollups:
+    """
+    Monthly vote counts of each party and of each deputy voting differently
+    from their party. Counts are only added, so the rollups are updated with
+    the new votes only (see `update`).
+    """
+
+    # keys of the votes already counted (see `get_vote_keys`), only the ones
+    # still in the votes of the legislature
+    votes: List[str] = field(default_factory=list)
+    parties: pd.DataFrame = field(
+        default_factory=lambda: pd.DataFrame(columns=PARTY_ROLLUP_COLUMNS)
+    )
+    deputies: pd.DataFrame = field(
+        default_factory=lambda: pd.DataFrame(columns=DEPUTY_ROLLUP_COLUMNS)
+    )
+
+    def update(
+        self,
+        initiatives_votes: pd.DataFrame,
+        deputies_votes: pd.DataFrame,
+        registry: PartyRegistry = DEFAULT_REGISTRY,
+    ) -> int:
+        """
+        Add the votes not counted yet, returning how many were added.
+
+        The votes are all the votes of the legislature so far, the keys of the
+        counted votes no longer there are dropped.
+        """
+
+        counted = set(self.votes)
+        keys = get_vote_keys(initiatives_votes)
+        new = ~keys.isin(counted)
+        if not new.any():
+            self.votes = sorted(counted.intersection(keys))
+            return 0
+
+        new_keys = set(keys[new])
+        self.parties = _add(
+            self.parties,
+            get_party_rollups(initiatives_votes[new], registry),
+            ["partido", "mes"],
+        )
+        self.deputies = _add(
+            self.deputies,
+            get_deputy_rollups(
+                deputies_votes[get_vote_keys(deputies_votes).isin(new_keys)]
+            ),
+            ["deputado", "partido", "mes"],
+        )
+        self.votes = sorted(counted.intersection(keys) | new_keys)
+
+        return int(new.sum())
+
+    def to_dict(self) -> Dict:
+        return {
+            "votes": self.votes,
+            "parties": self.parties.to_dict(orient="list"),
+            "deputies": self.deputies.to_dict(orient="list"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DeputyRollups":
+        return cls(
+            votes=data["votes"],
+            parties=pd.DataFrame(data["parties"], columns=PARTY_ROLLUP_COLUMNS),
+            deputies=pd.DataFrame(data["deputies"], columns=DEPUTY_ROLLUP_COLUMNS),
+        )
+
+
+def get_deputy_rollups_from_blob(
+    blob_container: "BlobContainerClient",
+    legislature_name: str,
+    registry: PartyRegistry = DEFAULT_REGISTRY,
+) -> DeputyRollups:
+    """
+    Load the rollups stored in previous runs. Empty when there are none or were
+    computed by another version or with other parties.
+    """
+
+    try:
+        data = json.loads(
+            read_blob(
+                blob_container.get_blob_client(
+                    f"{legislature_name}_deputy_rollups.json"
+                )
+            )
+        )
+    except ResourceNotFoundError:
+        return DeputyRollups()
+
+    if (
+        data.get("version") != DEPUTY_ROLLUPS_VERSION
+        or data.get("registry") != registry.fingerprint
+    ):
+        return DeputyRollups()
+
+    return DeputyRollups.from_dict(data)
+
+
+def store_deputy_rollups(
+    blob_container: "BlobContainerClient",
+    legislature_name: str,
+    rollups: DeputyRollups,
+    registry: PartyRegistry = DEFAULT_REGISTRY,
+):
+    upload_json(
+        blob_container.get_blob_client(f"{legislature_name}_deputy_rollups.json"),
+        {
+            "version": DEPUTY_ROLLUPS_VERSION,
+            "registry": registry.fingerprint,
+            **rollups.to_dict(),
+        },
+    )
+
+
+def _rate(count: int, total: int) -> Optional[float]:
+    return count / total if total else None
+
+
+def _stats(counts: Dict[str, int], own_party: bool) -> Dict:
+    counts = {k: int(v) for k, v in counts.items()}
+    return {
+        **counts,
+        "assiduidade": _rate(counts["presencas"], counts["votacoes"]),
+        "concordancia": (
+            _rate(counts["presencas"] - counts["divergencias"], counts["presencas"])
+            if own_party
+            else None
+        ),
+        "rebeldia": (
+            _rate(counts["rebeldias"], counts["presencas"]) if own_party else None
+        ),
+    }
+
+
+def _get_memberships(
+    rollups: DeputyRollups,
+    registry: PartyRegistry,
+    intervals: Optional[LegislatureIntervals],
+) -> pd.DataFrame:
+    """
+    First and last months of each deputy (as in the vote results) in each
+    party. Deputies not in the composition, or all of them when it is unknown,
+    are in their party during the whole legislature.
+    """
+
+    start, end = rollups.parties["mes"].min(), rollups.parties["mes"].max()
+
+    memberships = pd.DataFrame(columns=["deputado", "partido", "nome", "inicio", "fim"])
+    if intervals is not None:
+        groups = intervals.groups()
+        groups = groups[groups["partido"] != "Ninsc"]
+        parties = groups["partido"].map(normalize_name)
+        memberships = pd.DataFrame(
+            {
+                "deputado": groups["nome"].map(normalize_name),
+                "partido": [registry.code(x) or x for x in parties],
+                "nome": groups["nome"],
+                "inicio": _month(groups["inicio"]).fillna(start),
+                "fim": _month(groups["fim"]).fillna(end),
+            }
+        )
+
+    dissenters = rollups.deputies[["deputado", "partido"]].drop_duplicates()
+    unknown = dissenters.merge(
+        memberships[["deputado", "partido"]].drop_duplicates(),
+        how="left",
+        indicator=True,
+    )
+    unknown = unknown[unknown["_merge"] == "left_only"]
+
+    return pd.concat(
+        [
+            memberships,
+            unknown[["deputado", "partido"]].assign(
+                nome=unknown["deputado"], inicio=start, fim=end
+            ),
+        ],
+        ignore_index=True,
+    )
+
+
+def get_deputies_stats(
+    rollups: DeputyRollups,
+    registry: PartyRegistry = DEFAULT_REGISTRY,
+    intervals: Optional[LegislatureIntervals] = None,
+) -> Dict[str, Dict]:
+    """
+    Vote statistics of each deputy, by id: attendance, agreement with their
+    party and how often they voted against it, in total and per month.
+
+    Deputies are counted as voting with their party in the votes they did not
+    vote differently, while they were in it (see `LegislatureIntervals.groups`)
+    or, when unknown, during the whole legislature. The vote results only tell
+    when a whole party was absent, so attendance is the one of the party.
+    """
+
+    counts = ["votacoes", "presencas", "divergencias", "rebeldias"]
+    parties = rollups.parties.assign(divergencias=0, rebeldias=0)
+
+    stats = {}
+    for code, name in registry.deputies.items():
+        months = parties[parties["partido"] == code]
+        if months.empty:
+            continue
+        stats[code] = (name, None, months.set_index("mes")[counts])
+
+    deltas = {
+        key: df.set_index("mes")[counts]
+        for key, df in rollups.deputies.groupby(["deputado", "partido"])
+    }
+    memberships = _get_memberships(rollups, registry, intervals)
+    for (deputy, party), periods in memberships.groupby(
+        ["deputado", "partido"], sort=False
+    ):
+        in_party = pd.Series(False, index=parties.index)
+        for start, end in zip(periods["inicio"], periods["fim"]):
+            in_party |= (parties["mes"] >= start) & (parties["mes"] <= end)
+        months = parties[(parties["partido"] == party) & in_party].set_index("mes")[
+            counts
+        ]
+        if (deputy, party) in deltas:
+            months = months.add(deltas[deputy, party], fill_value=0)
+
+        # the same deputy in more than one party
+        if deputy in stats:
+            months = months.add(stats[deputy][2], fill_value=0)
+        stats[deputy] = (periods["nome"].iloc[-1], registry.name(party), months)
+
+    res = {}
+    for deputy, (name, party, months) in stats.items():
+        months = months.sort_index()
+        own_party = party is not None
+        res[deputy] = {
+            "id": deputy,
+            "nome": name,
+            "partido": party,
+            "total": _stats(months.sum().to_dict(), own_party),
+            "meses": [
+                {"mes": month, **_stats(row, own_party)}
+                for month, row in months.to_dict(orient="index").items()
+            ],
+        }
+
+    return res
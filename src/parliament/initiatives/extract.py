@@ -1,14 +1,22 @@
 import json
+import re
 import sys
 from collections import defaultdict
 from copy import deepcopy
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from azure.storage.blob import ContainerClient as BlobContainerClient
+from azure.core.exceptions import ResourceNotFoundError
 from tqdm import tqdm
 
+from src.common.storage import read_blob, upload_json
 from src.parliament.common import MyDict, to_list
+from src.parliament.initiatives import graph
+from src.parliament.parties import DEFAULT_REGISTRY, PartyRegistry
+
+if TYPE_CHECKING:
+    from azure.storage.blob import ContainerClient as BlobContainerClient
 
 # endpoints updated daily
 # XIV Legislatura
@@ -29,21 +37,104 @@ ONGOING_PATHS = [
     ("XVI", PATH_XVI)
 ]
 
+# bump when the vote parsing changes, so stored vote patterns are not reused
+VOTE_PATTERNS_VERSION = 1
+
+# deputies voting differently from their party show up in the vote results as
+# "name(party)", or only as how many they were (e.g. "3-ps")
+DEPUTY_TOKEN_PATTERN = re.compile(r"^(?P<deputado>[^()]+)\((?P<partido>[^()]+)\)$")
+
+# columns identifying each vote in the deputies votes
+DEPUTY_VOTE_KEY_COLUMNS = [
+    "iniciativa_id",
+    "iniciativa_evento_id",
+    "iniciativa_evento_fase",
+    "iniciativa_evento_data",
+]
+
 
 def get_raw_data_from_blob(
-    blob_container: BlobContainerClient, legislature_name: str
+    blob_container: "BlobContainerClient", legislature_name: str
 ) -> List[Dict]:
     """Load the most recent data provided by Parlamento cached in our Blob Storage"""
 
     try:
         data = blob_container.get_blob_client(f"{legislature_name}.json")
-        return json.loads(data.download_blob().readall())
+        return json.loads(read_blob(data))
     except Exception as e:
         print(blob_container.container_name)
         raise e
 
 
-# TODO: Not updated
+def get_vote_patterns_from_blob(
+    blob_container: "BlobContainerClient",
+    legislature_name: str,
+    registry: PartyRegistry = DEFAULT_REGISTRY,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Load the vote patterns parsed in previous runs, see `parse_vote_patterns`.
+    Empty when there are none or were parsed by another version or with other
+    parties.
+    """
+
+    try:
+        data = json.loads(
+            read_blob(
+                blob_container.get_blob_client(f"{legislature_name}_vote_patterns.json")
+            )
+        )
+    except ResourceNotFoundError:
+        return {}
+
+    if (
+        data.get("version") != VOTE_PATTERNS_VERSION
+        or data.get("registry") != registry.fingerprint
+    ):
+        return {}
+
+    return data["patterns"]
+
+
+def store_vote_patterns(
+    blob_container: "BlobContainerClient",
+    legislature_name: str,
+    vote_patterns: Dict[str, Dict[str, str]],
+    registry: PartyRegistry = DEFAULT_REGISTRY,
+):
+    upload_json(
+        blob_container.get_blob_client(f"{legislature_name}_vote_patterns.json"),
+        {
+            "version": VOTE_PATTERNS_VERSION,
+            "registry": registry.fingerprint,
+            "patterns": vote_patterns,
+        },
+    )
+
+
+def store_deputies_votes(
+    blob_container: "BlobContainerClient",
+    legislature_name: str,
+    deputies_votes: pd.DataFrame,
+):
+    """
+    Store the deputies votes (see `get_deputies_votes`) by column, with the
+    dates as ISO strings.
+    """
+
+    deputies_votes = deputies_votes.assign(
+        iniciativa_evento_data=deputies_votes["iniciativa_evento_data"].dt.strftime(
+            "%Y-%m-%d"
+        )
+    )
+    upload_json(
+        blob_container.get_blob_client(f"{legislature_name}_deputies_votes.json"),
+        {
+            column: [None if pd.isna(x) else x for x in values]
+            for column, values in deputies_votes.to_dict(orient="list").items()
+        },
+    )
+
+
 def get_initiatives_followups(raw_initiatives: List) -> pd.DataFrame:
     """Create a many to many relationship between initiatives (the main initiative and the folow-up)"""
 
@@ -51,40 +142,31 @@ def get_initiatives_followups(raw_initiatives: List) -> pd.DataFrame:
     for initiative in tqdm(
         raw_initiatives, "getting_initiatives_followups", file=sys.stdout
     ):
-        # save all the initiative information to be stored
-        info_to_store = {}
-
-        info_to_store["iniciativa_id"] = initiative.get("iniId", "")
-        info_to_store["iniciativa_nr"] = initiative.get("iniNr", "")
-
-        initiatives_followups = initiative.get("iniciativasOriginadas", {}).get(
-            "pt_gov_ar_objectos_iniciativas_DadosGeraisOut", []
-        )
-        if isinstance(initiatives_followups, Dict):
-            initiatives_followups = [initiatives_followups]
-
-        for initiative_followup in initiatives_followups:
-            info_to_store_details = deepcopy(info_to_store)
+        initiative = MyDict(initiative)
 
-            info_to_store_details["iniciativa_followup_id"] = initiative_followup.get(
-                "id", ""
-            )
-            info_to_store_details["iniciativa_followup_nr"] = initiative_followup.get(
-                "numero", ""
-            )
-            info_to_store_details[
-                "iniciativa_followup_assunto"
-            ] = initiative_followup.get("assunto", "")
-            info_to_store_details["iniciativa_followup_desc"] = initiative_followup.get(
-                "descTipo", ""
+        # save all the initiative information to be stored
+        info_to_store = {
+            "iniciativa_id": initiative.get("IniId", ""),
+            "iniciativa_nr": initiative.get("IniNr", ""),
+        }
+
+        for initiative_followup in to_list(initiative.get("IniciativasOriginadas", [])):
+            initiative_followup = MyDict(initiative_followup)
+            data_initiatives_followups.append(
+                {
+                    **info_to_store,
+                    "iniciativa_followup_id": initiative_followup.get("id", ""),
+                    "iniciativa_followup_nr": initiative_followup.get("numero", ""),
+                    "iniciativa_followup_assunto": initiative_followup.get(
+                        "assunto", ""
+                    ),
+                    "iniciativa_followup_desc": initiative_followup.get("descTipo", ""),
+                }
             )
 
-            data_initiatives_followups.append(info_to_store_details)
-
     return pd.DataFrame(data_initiatives_followups)
 
 
-# TODO: Not updated
 def get_initiatives_petitions(raw_initiatives: List) -> pd.DataFrame:
     """Create a many to many relationship between initiatives and petitions"""
 
@@ -92,34 +174,119 @@ def get_initiatives_petitions(raw_initiatives: List) -> pd.DataFrame:
     for initiative in tqdm(
         raw_initiatives, "geting_initiatives_petitions", file=sys.stdout
     ):
+        initiative = MyDict(initiative)
+
         # save all the initiative information to be stored
-        info_to_store = {}
+        info_to_store = {
+            "iniciativa_id": initiative.get("IniId", ""),
+            "iniciativa_nr": initiative.get("IniNr", ""),
+        }
+
+        for initiative_petition in to_list(initiative.get("Peticoes", [])):
+            initiative_petition = MyDict(initiative_petition)
+            data_initiatives_petitions.append(
+                {
+                    **info_to_store,
+                    "iniciativa_petition_id": initiative_petition.get("id", ""),
+                    "iniciativa_petition_nr": initiative_petition.get("numero", ""),
+                    "iniciativa_petition_assunto": initiative_petition.get(
+                        "assunto", ""
+                    ),
+                }
+            )
 
-        info_to_store["iniciativa_id"] = initiative.get("iniId", "")
-        info_to_store["iniciativa_nr"] = initiative.get("iniNr", "")
+    return pd.DataFrame(data_initiatives_petitions)
 
-        initiatives_petitions = initiative.get("peticoes", {}).get(
-            "pt_gov_ar_objectos_iniciativas_DadosGeraisOut", []
-        )
-        if isinstance(initiatives_petitions, Dict):
-            initiatives_petitions = [initiatives_petitions]
 
-        for initiative_petition in initiatives_petitions:
-            info_to_store_details = deepcopy(info_to_store)
+def get_initiatives_relations(
+    raw_initiatives: List,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Collect how initiatives relate to each other: the initiatives originated by
+    each one (from both sides, `IniciativasOrigem` and `IniciativasOriginadas`)
+    and the ones discussed jointly in any event.
 
-            info_to_store_details["iniciativa_petition_id"] = initiative_petition.get(
-                "id", ""
-            )
-            info_to_store_details["iniciativa_petition_nr"] = initiative_petition.get(
-                "numero", ""
-            )
-            info_to_store_details[
-                "iniciativa_petition_assunto"
-            ] = initiative_petition.get("assunto", "")
+    Return the initiatives, including the related ones from other legislatures
+    with the information available, and the relations (see `graph.py`).
+    """
 
-            data_initiatives_petitions.append(info_to_store_details)
+    initiatives = {}
+    related = {}
+    relations = []
+    for initiative in tqdm(
+        raw_initiatives, "getting_initiatives_relations", file=sys.stdout
+    ):
+        initiative = MyDict(initiative)
 
-    return pd.DataFrame(data_initiatives_petitions)
+        initiative_id = str(initiative.get("IniId", ""))
+        if not initiative_id:
+            continue
+
+        initiatives[initiative_id] = {
+            "iniciativa_id": initiative_id,
+            "iniciativa_nr": str(initiative.get("IniNr", "")),
+            "iniciativa_tipo": initiative.get("IniDescTipo", ""),
+            "iniciativa_titulo": initiative.get("IniTitulo", ""),
+        }
+
+        for origin in to_list(initiative.get("IniciativasOrigem", [])):
+            origin = MyDict(origin)
+            origin_id = str(origin.get("id", ""))
+            if origin_id:
+                related.setdefault(
+                    origin_id,
+                    {
+                        "iniciativa_id": origin_id,
+                        "iniciativa_nr": str(origin.get("numero", "")),
+                        "iniciativa_tipo": origin.get("descTipo", ""),
+                        "iniciativa_titulo": origin.get("assunto", ""),
+                    },
+                )
+                relations.append((origin_id, initiative_id, graph.ORIGINATED))
+
+        for followup in to_list(initiative.get("IniciativasOriginadas", [])):
+            followup = MyDict(followup)
+            followup_id = str(followup.get("id", ""))
+            if followup_id:
+                related.setdefault(
+                    followup_id,
+                    {
+                        "iniciativa_id": followup_id,
+                        "iniciativa_nr": str(followup.get("numero", "")),
+                        "iniciativa_tipo": followup.get("descTipo", ""),
+                        "iniciativa_titulo": followup.get("assunto", ""),
+                    },
+                )
+                relations.append((initiative_id, followup_id, graph.ORIGINATED))
+
+        for event in to_list(initiative.get("IniEventos", [])):
+            for joint in to_list(MyDict(event).get("IniciativasConjuntas", [])):
+                joint = MyDict(joint)
+                joint_id = str(joint.get("id", ""))
+                if joint_id:
+                    related.setdefault(
+                        joint_id,
+                        {
+                            "iniciativa_id": joint_id,
+                            "iniciativa_nr": str(joint.get("nr", "")),
+                            "iniciativa_tipo": joint.get("descTipo", ""),
+                            "iniciativa_titulo": joint.get("titulo", ""),
+                        },
+                    )
+                    relations.append((initiative_id, joint_id, graph.JOINT))
+
+    # the information of the initiative itself is more complete
+    nodes = list(initiatives.values()) + [
+        v for k, v in related.items() if k not in initiatives
+    ]
+
+    return (
+        pd.DataFrame(nodes, columns=graph.NODE_COLUMNS),
+        pd.DataFrame(
+            relations,
+            columns=["iniciativa_id", "iniciativa_relacionada_id", "relacao"],
+        ),
+    )
 
 
 def _get_author(initiative: pd.Series) -> str:
@@ -506,40 +673,46 @@ def get_initiatives(raw_initiatives: List) -> pd.DataFrame:
     return data_initiatives
 
 
+# a deputy not registered in any parliamentary group in a clean vote result
+NON_REGISTERED_TOKEN = re.compile(r"([^,:]+)\(ninsc\)")
+
+
+def _clean_vote_result(vote: str) -> str:
+    return (
+        vote.lower()
+        .replace(" ", "")
+        .replace("<br>", "")
+        .replace("</i>", "")
+        .replace("<i>", "")
+    )
+
+
 # Improve: in some of the following situations maybe I could infer the vote
 #          of some parties
 # https://www.parlamento.pt/ActividadeParlamentar/Paginas/DetalheIniciativa.aspx?BID=44422
 # https://www.parlamento.pt/ActividadeParlamentar/Paginas/DetalheIniciativa.aspx?BID=44343
 # https://www.parlamento.pt/ActividadeParlamentar/Paginas/DetalheIniciativa.aspx?BID=120916
-def _split_vote_result(vote: str) -> Dict[str, list]:
+def _split_vote_result(
+    vote: str, registry: PartyRegistry = DEFAULT_REGISTRY
+) -> Dict[str, list]:
     """
     Extract vote result from poll
 
-    Return a dicionary with a list of parties for each poll option
+    Return a dicionary with a list of parties (their codes in `registry`) for
+    each poll option
     """
 
     if not vote:
         return {}
 
     # clean vote information
-    vote = (
-        vote.lower()
-        .replace(" ", "")
-        .replace("<br>", "")
-        .replace("</i>", "")
-        .replace("<i>", "")
-    )
+    vote = _clean_vote_result(vote)
     vote = (
         vote.replace("afavor:", ",afavor,")
         .replace("contra:", ",contra,")
         .replace("ausência:", ",ausência,")
         .replace("abstenção:", ",abstenção,")
     )
-    vote = vote.replace("cristinarodrigues(ninsc)", "cr").replace(
-        "joacinekatarmoreira(ninsc)", "jkm").replace(
-        "antóniomalódeabreu(ninsc)", "ama").replace(
-        "miguelarruda(ninsc)","mar"
-    )
     vote = vote.split(",")
 
     result = defaultdict(list)
@@ -550,8 +723,9 @@ def _split_vote_result(vote: str) -> Dict[str, list]:
         if party in "afavor,contra,ausência,abstenção":
             current_option = party
         else:
-            if party in "ps,psd,be,pcp,cds-pp,pan,pev,ch,il,l,cr,jkm,ama,mar".split(","):
-                result[current_option].append(party)
+            code = registry.code(party)
+            if code is not None:
+                result[current_option].append(code)
             # sometimes deputies vote different from their own party
             else:
                 result[f"outros_{current_option}"].append(party)
@@ -559,9 +733,89 @@ def _split_vote_result(vote: str) -> Dict[str, list]:
     return result
 
 
-def get_initiatives_votes(initiatives: pd.DataFrame) -> pd.DataFrame:
+def get_non_registered_deputies(initiatives: pd.DataFrame) -> List[str]:
+    """
+    Deputies not registered in any parliamentary group (Ninsc) in the
+    initiatives (see `get_initiatives`), as authors or in the vote results.
+    The ones only in the vote results are named as written there, e.g.
+    "mariadasilvacosta" for "Maria da Silva Costa (Ninsc)".
+    """
+
+    # by the name as written in the vote results
+    deputies = {}
+
+    for names, parties in zip(
+        initiatives["iniciativa_autor_deputados_nomes"],
+        initiatives["iniciativa_autor_deputados_GPs"],
+    ):
+        for name, party in zip(names.split("|"), parties.split("|")):
+            if party == "Ninsc":
+                deputies.setdefault(name.lower().replace(" ", ""), name)
+
+    for vote in initiatives["iniciativa_votacao_detalhe"].dropna().unique():
+        for token in NON_REGISTERED_TOKEN.findall(_clean_vote_result(vote)):
+            deputies.setdefault(token, token)
+
+    return list(deputies.values())
+
+
+def _vote_vector(
+    vote: str, registry: PartyRegistry = DEFAULT_REGISTRY
+) -> Dict[str, str]:
+    """
+    Vote columns of a vote result, as stored for each initiative
+    """
+
+    vector = {}
+    for option, parties in _split_vote_result(vote, registry).items():
+        for party in parties:
+            if "outros" in option:
+                k = f"iniciativa_votacao_{option}"
+                vector[k] = f"{vector[k]}|{party}" if k in vector else party
+            else:
+                vector[f"iniciativa_votacao_{party}"] = option
+
+    return vector
+
+
+def parse_vote_patterns(
+    votes: pd.Series,
+    vote_patterns: Optional[Dict[str, Dict[str, str]]] = None,
+    registry: PartyRegistry = DEFAULT_REGISTRY,
+) -> Tuple[np.ndarray, List[Dict[str, str]]]:
+    """
+    Parse each distinct vote result only once, many initiatives are voted
+    together and have exactly the same result.
+
+    Return the code of each vote result (-1 when missing) and the vote vector
+    of each code. `vote_patterns` has the vectors already parsed, by vote
+    result, and is updated with the new ones.
+    """
+
+    if vote_patterns is None:
+        vote_patterns = {}
+
+    codes, uniques = pd.factorize(votes)
+
+    vectors = []
+    for vote in uniques:
+        if vote not in vote_patterns:
+            vote_patterns[vote] = _vote_vector(vote, registry)
+        vectors.append(vote_patterns[vote])
+
+    return codes, vectors
+
+
+def get_initiatives_votes(
+    initiatives: pd.DataFrame,
+    vote_patterns: Optional[Dict[str, Dict[str, str]]] = None,
+    registry: PartyRegistry = DEFAULT_REGISTRY,
+) -> pd.DataFrame:
     """
     Collect vote information from each initiative.
+
+    `vote_patterns` are the vote results parsed in previous runs, with the same
+    `registry`, updated with the new ones (see `parse_vote_patterns`).
     """
 
     # we only need this initiative information regaring votes
@@ -572,6 +826,9 @@ def get_initiatives_votes(initiatives: pd.DataFrame) -> pd.DataFrame:
         "iniciativa_titulo",
         "iniciativa_evento_fase",
         "iniciativa_evento_data",
+        # identifies the vote, an initiative can be voted more than once in the
+        # same phase and day
+        "iniciativa_evento_id",
         "iniciativa_url",
         "iniciativa_obs",
         "iniciativa_texto_subst",
@@ -586,50 +843,41 @@ def get_initiatives_votes(initiatives: pd.DataFrame) -> pd.DataFrame:
         "iniciativa_votacao_unanime",
     ]
 
-    data_initiatives = []
-    for _, row in tqdm(
-        initiatives.iterrows(),
-        "getting_initiatives_votes",
-        len(initiatives),
-        file=sys.stdout,
-    ):
-        columns_to_store = row[columns_to_keep].copy()
-
-        if row["iniciativa_votacao_res"]:
-            # create a new column for each party with the respective vote
-            vote_results = _split_vote_result(row["iniciativa_votacao_detalhe"])
-
-            for vote, parties in vote_results.items():
-                for party in parties:
-                    if "outros" in vote:
-                        k = f"iniciativa_votacao_{vote}"
-                        if k in columns_to_store:
-                            columns_to_store[k] = f"{columns_to_store[k]}|{party}"
-                        else:
-                            columns_to_store[k] = party
-                    else:
-                        columns_to_store[f"iniciativa_votacao_{party}"] = vote
-
-            if row["iniciativa_evento_obsFase"]:
-                if columns_to_store["iniciativa_votacao_desc"]:
-                    columns_to_store["iniciativa_votacao_desc"] += f'| {row["iniciativa_evento_obsFase"]}'
-                else:
-                    columns_to_store["iniciativa_votacao_desc"] = row["iniciativa_evento_obsFase"]
-
-            if row["iniciativa_votacao_unanime"] == "unanime":
-                columns_to_store["iniciativa_votacao_contra_sua_iniciativa"] = False
-            else:
-                party = columns_to_store["iniciativa_autor"].lower()
-                if f"iniciativa_votacao_{party}" in columns_to_store:
-                    columns_to_store["iniciativa_votacao_contra_sua_iniciativa"] = (
-                        columns_to_store[f"iniciativa_votacao_{party}"] == "contra"
-                    )
-                else:
-                    columns_to_store["iniciativa_votacao_contra_sua_iniciativa"] = False
+    # only initiatives with a result were voted
+    initiatives = initiatives[initiatives["iniciativa_votacao_res"].map(bool)]
+    initiatives = initiatives.reset_index(drop=True)
+    codes, vectors = parse_vote_patterns(
+        initiatives["iniciativa_votacao_detalhe"], vote_patterns, registry
+    )
 
-            data_initiatives.append(columns_to_store)
+    # create a new column for each party with the respective vote: the vector
+    # of each distinct vote result taken for all its initiatives, the last
+    # (empty) one for the initiatives without vote result (code -1)
+    votes = pd.DataFrame(vectors + [{}]).take(codes).reset_index(drop=True)
+    votes = votes.drop(columns=columns_to_keep, errors="ignore")
+
+    df_initiatives = pd.concat([initiatives[columns_to_keep], votes], axis=1)
+
+    observations = initiatives["iniciativa_evento_obsFase"]
+    has_observations = observations.map(bool)
+    descriptions = df_initiatives.loc[has_observations, "iniciativa_votacao_desc"]
+    df_initiatives.loc[has_observations, "iniciativa_votacao_desc"] = [
+        f"{description}| {observation}" if description else observation
+        for description, observation in zip(
+            descriptions, observations[has_observations]
+        )
+    ]
 
-    df_initiatives = pd.DataFrame(data_initiatives)
+    # the vote of the author party, when it has one
+    against_own = pd.Series(False, index=df_initiatives.index)
+    authors = df_initiatives["iniciativa_autor"].str.lower()
+    for party in authors.unique():
+        column = f"iniciativa_votacao_{party}"
+        if column in df_initiatives:
+            against_own |= (authors == party) & (df_initiatives[column] == "contra")
+    df_initiatives["iniciativa_votacao_contra_sua_iniciativa"] = against_own & (
+        df_initiatives["iniciativa_votacao_unanime"] != "unanime"
+    )
 
     # enhance data with processed fields
     df_initiatives["iniciativa_aprovada"] = (
@@ -637,3 +885,77 @@ def get_initiatives_votes(initiatives: pd.DataFrame) -> pd.DataFrame:
     )
 
     return df_initiatives
+
+
+def get_deputies_votes(
+    initiatives_votes: pd.DataFrame, registry: PartyRegistry = DEFAULT_REGISTRY
+) -> pd.DataFrame:
+    """
+    Vote of each deputy not voting with a party, from the initiative votes (see
+    `get_initiatives_votes`): the deputies not registered in any parliamentary
+    group and the ones voting differently from their party, with the vote of
+    their party. Deputies only counted (e.g. "3-ps") are not included.
+
+    The vote results are already split into columns, so they are not parsed
+    again.
+    """
+
+    initiatives_votes = initiatives_votes.reset_index(drop=True)
+    # when the vote was unanimous the parties vote is empty (see
+    # `get_party_approvals`)
+    unanime = initiatives_votes["iniciativa_votacao_unanime"] == "unanime"
+
+    deputies_votes = []
+    for option in ["afavor", "contra", "abstenção", "ausência"]:
+        column = f"iniciativa_votacao_outros_{option}"
+        if column not in initiatives_votes:
+            continue
+
+        tokens = initiatives_votes[column].dropna().str.split("|").explode()
+        deputies = tokens.str.extract(DEPUTY_TOKEN_PATTERN).dropna()
+        if deputies.empty:
+            continue
+
+        rows = deputies.index.to_numpy()
+        df = initiatives_votes.loc[rows, DEPUTY_VOTE_KEY_COLUMNS].reset_index(drop=True)
+        df["deputado"] = deputies["deputado"].values
+        df["partido"] = [registry.code(x) or x for x in deputies["partido"]]
+        df["voto"] = option
+
+        # vote of the party the deputy did not follow, there are only a few
+        party_votes = []
+        for row, party in zip(rows, df["partido"]):
+            party_column = f"iniciativa_votacao_{party}"
+            party_vote = None
+            if party_column in initiatives_votes:
+                party_vote = initiatives_votes.at[row, party_column]
+            if pd.isna(party_vote):
+                party_vote = "afavor" if unanime[row] else None
+            party_votes.append(party_vote)
+        df["voto_partido"] = party_votes
+
+        deputies_votes.append(df)
+
+    for code in registry.deputies:
+        column = f"iniciativa_votacao_{code}"
+        if column not in initiatives_votes:
+            continue
+
+        votes_ = initiatives_votes[column].where(
+            initiatives_votes[column].notna() | ~unanime, "afavor"
+        )
+        df = initiatives_votes.loc[votes_.notna(), DEPUTY_VOTE_KEY_COLUMNS]
+        df["deputado"] = code
+        df["partido"] = None
+        df["voto"] = votes_.dropna()
+        df["voto_partido"] = None
+
+        deputies_votes.append(df)
+
+    if not deputies_votes:
+        return pd.DataFrame(
+            columns=DEPUTY_VOTE_KEY_COLUMNS
+            + ["deputado", "partido", "voto", "voto_partido"]
+        )
+
+    return pd.concat(deputies_votes, ignore_index=True)
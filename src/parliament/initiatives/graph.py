@@ -0,0 +1,152 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# relations between initiatives (see `get_initiatives_relations`)
+ORIGINATED = "originou"
+JOINT = "conjunta"
+
+NODE_COLUMNS = [
+    "iniciativa_id",
+    "iniciativa_nr",
+    "iniciativa_tipo",
+    "iniciativa_titulo",
+]
+
+
+def _csr(
+    size: int, sources: np.ndarray, targets: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compressed sparse rows of the edges: the targets of node `i` are
+    `indices[indptr[i] : indptr[i + 1]]`
+    """
+
+    order = np.lexsort((targets, sources))
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=size), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32)
+
+
+@dataclass
+class InitiativeGraph:
+    """
+    How initiatives relate to each other, as adjacency arrays by position of
+    the initiative in `nodes`: the initiatives each one originated (and the
+    transpose, where each one came from) and the ones discussed jointly.
+    """
+
+    # information of each initiative, including the related ones from other
+    # legislatures
+    nodes: pd.DataFrame
+    children: Tuple[np.ndarray, np.ndarray]
+    joint: Tuple[np.ndarray, np.ndarray]
+    parents: Tuple[np.ndarray, np.ndarray] = field(init=False)
+    # initiative id to its position
+    index: Dict[str, int] = field(init=False)
+
+    def __post_init__(self):
+        self.index = {id_: i for i, id_ in enumerate(self.nodes["iniciativa_id"])}
+
+        indptr, indices = self.children
+        sources = np.repeat(np.arange(len(self.nodes)), np.diff(indptr))
+        self.parents = _csr(len(self.nodes), indices, sources)
+
+    @classmethod
+    def from_relations(
+        cls, initiatives: pd.DataFrame, relations: pd.DataFrame
+    ) -> "InitiativeGraph":
+        nodes = initiatives[NODE_COLUMNS].drop_duplicates("iniciativa_id")
+        nodes = nodes.sort_values("iniciativa_id").reset_index(drop=True)
+        positions = pd.Series(nodes.index, index=nodes["iniciativa_id"])
+
+        relations = relations.drop_duplicates()
+        sources = positions[relations["iniciativa_id"]].to_numpy()
+        targets = positions[relations["iniciativa_relacionada_id"]].to_numpy()
+
+        originated = (relations["relacao"] == ORIGINATED).to_numpy()
+        joint = (relations["relacao"] == JOINT).to_numpy() & (sources != targets)
+        # joint initiatives are related both ways
+        joint_sources = np.concatenate([sources[joint], targets[joint]])
+        joint_targets = np.concatenate([targets[joint], sources[joint]])
+        joint_edges = np.unique(np.stack([joint_sources, joint_targets]), axis=1)
+
+        return cls(
+            nodes=nodes,
+            children=_csr(len(nodes), sources[originated], targets[originated]),
+            joint=_csr(len(nodes), joint_edges[0], joint_edges[1]),
+        )
+
+    def _traverse(
+        self, initiative_id: str, adjacency: Tuple[np.ndarray, np.ndarray]
+    ) -> List[Tuple[int, int]]:
+        """
+        Initiatives reachable from the given one, breadth first, with their
+        distance to it
+        """
+
+        indptr, indices = adjacency
+        start = self.index[initiative_id]
+
+        visited = np.zeros(len(self.nodes), dtype=bool)
+        visited[start] = True
+        reached = []
+        frontier = np.array([start])
+        distance = 0
+        while len(frontier):
+            distance += 1
+            neighbours = np.concatenate(
+                [indices[indptr[i] : indptr[i + 1]] for i in frontier]
+            )
+            frontier = np.unique(neighbours[~visited[neighbours]])
+            visited[frontier] = True
+            reached.extend((i, distance) for i in frontier)
+
+        return reached
+
+    def _describe(self, reached: List[Tuple[int, int]]) -> List[Dict]:
+        records = self.nodes.iloc[[i for i, _ in reached]].to_dict(orient="records")
+        return [
+            {**record, "distancia": distance}
+            for record, (_, distance) in zip(records, reached)
+        ]
+
+    def __contains__(self, initiative_id: str) -> bool:
+        return initiative_id in self.index
+
+    def ancestors(self, initiative_id: str) -> List[Dict]:
+        """Initiatives the given one came from, directly or not"""
+        return self._describe(self._traverse(initiative_id, self.parents))
+
+    def descendants(self, initiative_id: str) -> List[Dict]:
+        """Initiatives originated by the given one, directly or not"""
+        return self._describe(self._traverse(initiative_id, self.children))
+
+    def joint_initiatives(self, initiative_id: str) -> List[Dict]:
+        """Initiatives discussed jointly with the given one"""
+        indptr, indices = self.joint
+        i = self.index[initiative_id]
+        return self._describe([(j, 1) for j in indices[indptr[i] : indptr[i + 1]]])
+
+    def to_dict(self) -> Dict:
+        return {
+            "nodes": self.nodes.to_dict(orient="list"),
+            "children": [x.tolist() for x in self.children],
+            "joint": [x.tolist() for x in self.joint],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "InitiativeGraph":
+        return cls(
+            nodes=pd.DataFrame(data["nodes"], columns=NODE_COLUMNS),
+            children=(
+                np.array(data["children"][0], dtype=np.int64),
+                np.array(data["children"][1], dtype=np.int32),
+            ),
+            joint=(
+                np.array(data["joint"][0], dtype=np.int64),
+                np.array(data["joint"][1], dtype=np.int32),
+            ),
+        )
@@ -0,0 +1,155 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.parliament.initiatives.votes import get_party_vote_columns
+from src.parliament.parties import VOTE_COLUMN_PREFIX
+
+# options counted as the same vote, as in `get_party_correlations`
+OPTIONS = ["afavor", "contra", "abstenção"]
+NOT_VOTED = ["ausência", ""]
+
+# most points of a series, each one with a value for every pair of parties
+MAX_POINTS = 2000
+
+
+class TooManyPoints(ValueError):
+    """The series would have more than `MAX_POINTS` points"""
+
+
+def _cumsum(x: np.ndarray) -> np.ndarray:
+    """Cumulative sum over the last axis, starting at 0"""
+
+    out = np.zeros(x.shape[:-1] + (x.shape[-1] + 1,), dtype=np.int32)
+    np.cumsum(x, axis=-1, out=out[..., 1:])
+    return out
+
+
+def _ratio(count: np.ndarray, total: np.ndarray) -> List[Optional[float]]:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = count / total
+    return [None if t == 0 else float(r) for r, t in zip(ratio, total)]
+
+
+@dataclass
+class VoteSeries:
+    """
+    Cumulative counts over the votes sorted by date, so the counts of the votes
+    between any two dates are the difference of two positions.
+
+    Each pair of parties has how many times both voted and how many times they
+    voted the same (see `get_party_correlations`), and each party how many
+    times it voted in favor (see `get_party_approvals`).
+    """
+
+    dates: np.ndarray
+    parties: List[str]
+    # pairs of parties (positions in `parties`), each pair only once
+    pairs: np.ndarray
+    agreements: np.ndarray
+    both_voted: np.ndarray
+    in_favor: np.ndarray
+    approved: np.ndarray
+
+    @classmethod
+    def from_votes(cls, initiatives_votes: pd.DataFrame) -> "VoteSeries":
+        votes = initiatives_votes.sort_values("iniciativa_evento_data", kind="stable")
+        columns = get_party_vote_columns(votes.columns)
+        values = votes[columns]
+
+        voted = (values.notna() & ~values.isin(NOT_VOTED)).to_numpy().T
+        options = np.array(
+            [
+                pd.Categorical(values[column], categories=OPTIONS).codes
+                for column in columns
+            ],
+            dtype=np.int8,
+        ).reshape(len(columns), len(votes))
+
+        pairs = np.array(
+            [(a, b) for a in range(len(columns)) for b in range(a + 1, len(columns))],
+            dtype=np.int32,
+        ).reshape(-1, 2)
+        a, b = pairs[:, 0], pairs[:, 1]
+        both_voted = voted[a] & voted[b]
+        agreements = both_voted & (options[a] == options[b]) & (options[a] >= 0)
+
+        # when the vote was unanimous the parties vote is empty
+        unanime = (votes["iniciativa_votacao_unanime"] == "unanime").to_numpy()
+        in_favor = (values == "afavor").to_numpy().T | (
+            values.isna().to_numpy().T & unanime
+        )
+
+        return cls(
+            dates=votes["iniciativa_evento_data"].to_numpy(dtype="datetime64[D]"),
+            parties=[column[len(VOTE_COLUMN_PREFIX) :] for column in columns],
+            pairs=pairs,
+            agreements=_cumsum(agreements),
+            both_voted=_cumsum(both_voted),
+            in_favor=_cumsum(in_favor),
+            approved=_cumsum(votes["iniciativa_aprovada"].to_numpy(dtype=bool)),
+        )
+
+    def get(
+        self,
+        window: int,
+        step: int,
+        dt_ini: Optional[date] = None,
+        dt_fin: Optional[date] = None,
+    ) -> Dict:
+        """
+        Agreement between each pair of parties, approval of the initiatives and
+        how often each party voted in favor, every `step` days until `dt_fin`
+        and not before `dt_ini` (the last and first votes by default), each
+        considering the votes in the previous `window` days (the date itself
+        included).
+
+        Only the dates with votes in their window are considered, and it
+        raises `TooManyPoints` when there would be more than `MAX_POINTS`.
+        """
+
+        if not len(self.dates):
+            return {"datas": [], "votacoes": [], "aprovacao": [], "partidos": {}}
+
+        # no votes before the first one, nor in the windows of the dates more
+        # than `window` days after the last one
+        first = self.dates[0]
+        last = self.dates[-1] + np.timedelta64(window - 1, "D")
+        start = max(np.datetime64(dt_ini or first, "D"), first)
+        end = min(np.datetime64(dt_fin or self.dates[-1], "D"), last)
+
+        if end >= start and (end - start) // np.timedelta64(step, "D") >= MAX_POINTS:
+            raise TooManyPoints(
+                f"More than {MAX_POINTS} points between {start} and {end}, "
+                "use a larger step or a shorter period"
+            )
+
+        # the last point is always the end of the series
+        points = np.arange(end, start - 1, -np.timedelta64(step, "D"))[::-1]
+
+        hi = np.searchsorted(self.dates, points, side="right")
+        lo = np.searchsorted(self.dates, points - np.timedelta64(window, "D"), "right")
+
+        votes = hi - lo
+        agreements = self.agreements[:, hi] - self.agreements[:, lo]
+        both_voted = self.both_voted[:, hi] - self.both_voted[:, lo]
+        in_favor = self.in_favor[:, hi] - self.in_favor[:, lo]
+
+        parties = {
+            party: {"afavor": _ratio(in_favor[i], votes), "concordancia": {}}
+            for i, party in enumerate(self.parties)
+        }
+        for i, (a, b) in enumerate(self.pairs):
+            parties[self.parties[a]]["concordancia"][self.parties[b]] = _ratio(
+                agreements[i], both_voted[i]
+            )
+
+        return {
+            "datas": [str(point) for point in points],
+            "votacoes": votes.tolist(),
+            "aprovacao": _ratio(self.approved[hi] - self.approved[lo], votes),
+            "partidos": parties,
+        }
@@ -1,9 +1,28 @@
 from collections import defaultdict
-from typing import List
+from typing import FrozenSet, Iterable, List
 
 import numpy as np
 import pandas as pd
 
+from src.parliament.parties import (DEFAULT_REGISTRY, VOTE_COLUMN_PREFIX,
+                                    PartyRegistry)
+
+# vote columns that are not the vote of a party
+NON_PARTY_VOTE_COLUMNS = frozenset(
+    "iniciativa_votacao_res iniciativa_votacao_desc iniciativa_votacao_outros_afavor iniciativa_votacao_outros_abstenção iniciativa_votacao_outros_contra iniciativa_votacao_outros_ausência iniciativa_votacao_unanime".split()
+)
+
+
+def get_party_vote_columns(
+    columns: Iterable[str], exclude: FrozenSet[str] = NON_PARTY_VOTE_COLUMNS
+) -> List[str]:
+    """
+    Columns with the vote of each party, sorted so the results have always the
+    same order
+    """
+
+    return sorted({x for x in columns if x.startswith(VOTE_COLUMN_PREFIX)} - exclude)
+
 
 def get_party_approvals(data_initiatives_votes: pd.DataFrame) -> pd.DataFrame:
     """
@@ -16,12 +35,8 @@ def get_party_approvals(data_initiatives_votes: pd.DataFrame) -> pd.DataFrame:
     data_initiatives_votes = data_initiatives_votes.copy()
 
     # get all party votes fields
-    parties_vote_direction_fields = [
-        x for x in data_initiatives_votes.columns if x.startswith("iniciativa_votacao")
-    ]
-    to_exclude = "iniciativa_votacao_res iniciativa_votacao_desc iniciativa_votacao_outros_afavor iniciativa_votacao_outros_abstenção iniciativa_votacao_outros_contra iniciativa_votacao_outros_ausência iniciativa_votacao_unanime".split()
-    parties_vote_direction_fields = list(
-        set(parties_vote_direction_fields) - set(to_exclude)
+    parties_vote_direction_fields = get_party_vote_columns(
+        data_initiatives_votes.columns
     )
 
     # when the vote was unanimous, individual party vote direction is empty
@@ -68,11 +83,7 @@ def get_party_correlations(data_initiatives_votes: pd.DataFrame) -> pd.DataFrame
         return pd.DataFrame()
 
     # get all party votes fields
-    parties_columns = [
-        x for x in data_initiatives_votes.columns if x.startswith("iniciativa_votacao")
-    ]
-    to_exclude = "iniciativa_votacao_res iniciativa_votacao_desc iniciativa_votacao_outros_afavor iniciativa_votacao_outros_abstenção iniciativa_votacao_outros_contra iniciativa_votacao_outros_ausência iniciativa_votacao_unanime".split()
-    parties_columns = list(set(parties_columns) - set(to_exclude))
+    parties_columns = get_party_vote_columns(data_initiatives_votes.columns)
 
     res = defaultdict(list)
     for party_a in parties_columns:
@@ -106,7 +117,9 @@ def get_party_correlations(data_initiatives_votes: pd.DataFrame) -> pd.DataFrame
     )
 
 
-def collect_parties_strange_votes(data_initiatives_votes: pd.DataFrame) -> pd.DataFrame:
+def collect_parties_strange_votes(
+    data_initiatives_votes: pd.DataFrame, registry: PartyRegistry = DEFAULT_REGISTRY
+) -> pd.DataFrame:
     """
     Return all entries where the party did not approve its own initiatives.
 
@@ -124,22 +137,11 @@ def collect_parties_strange_votes(data_initiatives_votes: pd.DataFrame) -> pd.Da
     "iniciativa_votacao_outros_*" and not the party column
     """
 
-    parties_columns = [
-        x for x in data_initiatives_votes.columns if x.startswith("iniciativa_votacao")
-    ]
-    to_exclude = "iniciativa_votacao_res iniciativa_votacao_desc iniciativa_votacao_outros_afavor iniciativa_votacao_outros_abstenção iniciativa_votacao_outros_contra iniciativa_votacao_outros_ausência iniciativa_votacao_unanime".split()
-    parties_columns = list(set(parties_columns) - set(to_exclude))
+    parties_columns = get_party_vote_columns(data_initiatives_votes.columns)
 
     data = []
     for col in parties_columns:
-        party = (
-            col.replace("iniciativa_votacao_", "")
-            .replace("cr", "CRISTINA RODRIGUES")
-            .replace("jkm", "JOACINE KATAR MOREIRA")
-            .replace("ama", "ANTÓNIO MALÓ DE ABREU")
-            .replace("mar", "MIGUEL ARRUDA")
-            .upper()
-        )
+        party = registry.name(col[len(VOTE_COLUMN_PREFIX) :])
 
         mask = (data_initiatives_votes["iniciativa_autor"] == party) & (
             (data_initiatives_votes[col] != "afavor")
@@ -165,13 +167,10 @@ def get_initiatives(data_initiatives_votes: pd.DataFrame) -> pd.DataFrame:
 
     data_initiatives_votes = data_initiatives_votes.copy()
 
-    # get needed fields' name
-    parties_vote_direction_fields = [
-        x for x in data_initiatives_votes.columns if x.startswith("iniciativa_votacao")
-    ]
-    to_exclude = "iniciativa_votacao_res iniciativa_votacao_outros_afavor iniciativa_votacao_outros_abstenção iniciativa_votacao_outros_contra iniciativa_votacao_outros_ausência iniciativa_votacao_unanime".split()
-    parties_vote_direction_fields = list(
-        set(parties_vote_direction_fields) - set(to_exclude)
+    # get needed fields' name, the description is also kept
+    parties_vote_direction_fields = get_party_vote_columns(
+        data_initiatives_votes.columns,
+        NON_PARTY_VOTE_COLUMNS - {"iniciativa_votacao_desc"},
     )
 
     # when the vote was unanimous, individual party vote direction is empty
@@ -1,12 +1,14 @@
 # endpoints updated daily
 # XIV Legislatura
+import re
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict
+from typing import Any, Dict, List, Tuple
 
-import requests
+import pandas as pd
 
-from src.parliament.common import get_most_recent_status
+from src.common.fetch import fetch_all, fetch_json
+from src.parliament.common import get_most_recent_status, to_list
 
 PATH_XIV = "https://app.parlamento.pt/webutils/docs/doc.txt?path=6148523063484d364c793968636d356c64433976634756755a4746305953394559575276633046695a584a3062334d76513239746347397a61634f6e77364e764a5449775a47556c4d6a44446b334a6e77364e76637939595356596c4d6a424d5a576470633278686448567959533950636d646862304e766258427663326c6a5957395953565a66616e4e76626935306548513d&fich=OrgaoComposicaoXIV_json.txt&Inline=true"
 PATH_XV = "https://app.parlamento.pt/webutils/docs/doc.txt?path=6148523063484d364c793968636d356c64433976634756755a4746305953394559575276633046695a584a3062334d76513239746347397a61634f6e77364e764a5449775a47556c4d6a44446b334a6e77364e7663793959566955794d45786c5a326c7a6247463064584a684c3039795a324676513239746347397a61574e68623168575832707a6232347564486830&fich=OrgaoComposicaoXV_json.txt&Inline=true"
@@ -19,11 +21,13 @@ ALL_PATHS = [
 ]
 
 ONGOING_PATHS = [
-    #("XV", PATH_XV),
-    # format changed, code needs to be updated
-    #("XVI", PATH_XVI)
+    ("XV", PATH_XV),
+    ("XVI", PATH_XVI)
 ]
 
+# fields of the deputies, capitalized since XV (e.g. DepGP instead of depGP)
+DEPUTY_FIELD = re.compile(r"^(Dep|Gp|Sio|Car|Leg)(?=[A-Z])")
+
 
 @dataclass
 class LegislatureMember:
@@ -34,34 +38,44 @@ class LegislatureMember:
         return {"nome": self.name, "dep_id": self.id}
 
 
+def normalize(data: Any) -> Any:
+    """
+    Same structure for the format used until XIV and the one used since XV,
+    which no longer wraps the lists in an object with a single
+    `pt_ar_wsgode_objectos_*` key and capitalizes the fields of the deputies.
+    """
+
+    if isinstance(data, list):
+        return [normalize(x) for x in data]
+
+    if not isinstance(data, dict):
+        return data
+
+    if len(data) == 1 and next(iter(data)).startswith("pt_"):
+        return to_list(normalize(next(iter(data.values()))))
+
+    return {
+        DEPUTY_FIELD.sub(lambda m: m.group(1).lower(), key): normalize(value)
+        for key, value in data.items()
+    }
+
+
 def _get_raw_data(path: str) -> Dict:
     """Load the most recent data provided by Parlamento"""
 
-    try:
-        payload = requests.get(
-            path,
-            # fake, but without it the request is rejected
-            headers={"User-Agent": "Mozilla/5.0"},
-        )
-        assert payload.status_code == 200
-
-        return payload.json()["OrganizacaoAR"]
-    except Exception as e:
-        raise e
+    return normalize(fetch_json(path)["OrganizacaoAR"])
 
 
 def _get_chair_of_general_assembly(organization_general_assembly: Dict) -> Dict:
     x = organization_general_assembly["MesaAR"]
     # getting the acronym of the legislature, eg. XV
     leg_description = x["DetalheOrgao"]["legDes"]
-    members = x["HistoricoComposicao"][
-        "pt_ar_wsgode_objectos_DadosMesaComposicaoHistorico"
-    ]
+    members = to_list(x["HistoricoComposicao"])
     president = None
     vice_presidents = []
     for member in members:
         member_role = get_most_recent_status(
-            member["depCargo"]["pt_ar_wsgode_objectos_DadosCargoDeputado"],
+            member["depCargo"],
             "carDtInicio",
         )
         if member_role["carDes"] == "Presidente":
@@ -84,19 +98,15 @@ def _get_chair_of_general_assembly(organization_general_assembly: Dict) -> Dict:
 
 
 def _get_party_deputy_counter(organization_general_assembly: Dict):
-    deputies = organization_general_assembly["Plenario"]["Composicao"][
-        "pt_ar_wsgode_objectos_DadosDeputadoSearch"
-    ]
+    deputies = to_list(organization_general_assembly["Plenario"]["Composicao"])
 
     party_counter = defaultdict(lambda: 0)
     for deputy in deputies:
         deputy_role = get_most_recent_status(
-            deputy["depSituacao"]["pt_ar_wsgode_objectos_DadosSituacaoDeputado"],
+            deputy["depSituacao"],
             "sioDtInicio",
         )
-        party = get_most_recent_status(
-            deputy["depGP"]["pt_ar_wsgode_objectos_DadosSituacaoGP"], "gpDtInicio"
-        )["gpSigla"]
+        party = get_most_recent_status(deputy["depGP"], "gpDtInicio")["gpSigla"]
 
         if "Efetivo" in deputy_role["sioDes"]:
             party_counter[party] += 1
@@ -104,20 +114,35 @@ def _get_party_deputy_counter(organization_general_assembly: Dict):
     return dict(party_counter)
 
 
+def _get_non_registered_deputies(organization_general_assembly: Dict) -> List[str]:
+    """
+    Deputies not registered in any parliamentary group, they vote on their own
+    """
+
+    deputies = to_list(organization_general_assembly["Plenario"]["Composicao"])
+
+    non_registered = []
+    for deputy in deputies:
+        party = get_most_recent_status(deputy["depGP"], "gpDtInicio")["gpSigla"]
+
+        if party == "Ninsc":
+            non_registered.append(deputy["depNomeParlamentar"])
+
+    return non_registered
+
+
 def _get_party_deputy_chair(organization_general_assembly: Dict):
-    deputies = organization_general_assembly["ConferenciaLideres"][
-        "HistoricoComposicao"
-    ]["pt_ar_wsgode_objectos_DadosOrgaoComposicaoHistorico"]
+    deputies = to_list(
+        organization_general_assembly["ConferenciaLideres"]["HistoricoComposicao"]
+    )
 
     party_group_leaders = {}
     for deputy in deputies:
         deputy_role = get_most_recent_status(
-            deputy.get("depCargo", {}).get("pt_ar_wsgode_objectos_DadosCargoDeputado", {}),
+            deputy.get("depCargo", {}),
             "carDtInicio",
         )
-        party = get_most_recent_status(
-            deputy["depGP"]["pt_ar_wsgode_objectos_DadosSituacaoGP"], "gpDtInicio"
-        )["gpSigla"]
+        party = get_most_recent_status(deputy["depGP"], "gpDtInicio")["gpSigla"]
 
         if "Líder de Grupo Parlamentar" in deputy_role["carDes"]:
             party_group_leaders[party] = deputy["depNomeParlamentar"]
@@ -126,11 +151,84 @@ def _get_party_deputy_chair(organization_general_assembly: Dict):
     return party_group_leaders
 
 
-def get_legislatures_fields(path: str) -> Dict:
-    data = _get_raw_data(path=path)
+def _get_intervals(
+    kind: str, deputy: Dict, statuses: List[Dict], fields: Tuple[str, str, str]
+) -> List[Dict]:
+    value_field, start_field, end_field = fields
+    return [
+        {
+            "tipo": kind,
+            "dep_id": deputy["depId"],
+            "nome": deputy["depNomeParlamentar"],
+            "valor": status.get(value_field) or "",
+            "inicio": status.get(start_field),
+            "fim": status.get(end_field),
+        }
+        for status in to_list(statuses)
+    ]
+
+
+def get_legislature_intervals(organization_general_assembly: Dict) -> pd.DataFrame:
+    """
+    Every situation and parliamentary group of each deputy, the roles in the
+    presiding board and the leaders of each parliamentary group, each with the
+    interval (start and end dates, no end while ongoing) it was valid.
+    """
+
+    intervals = []
+
+    deputies = to_list(organization_general_assembly["Plenario"]["Composicao"])
+    for deputy in deputies:
+        intervals += _get_intervals(
+            "situacao",
+            deputy,
+            deputy["depSituacao"],
+            ("sioDes", "sioDtInicio", "sioDtFim"),
+        )
+        intervals += _get_intervals(
+            "gp",
+            deputy,
+            deputy["depGP"],
+            ("gpSigla", "gpDtInicio", "gpDtFim"),
+        )
+
+    members = to_list(organization_general_assembly["MesaAR"]["HistoricoComposicao"])
+    for member in members:
+        intervals += _get_intervals(
+            "mesa",
+            member,
+            member["depCargo"],
+            ("carDes", "carDtInicio", "carDtFim"),
+        )
+
+    leaders = to_list(
+        organization_general_assembly["ConferenciaLideres"]["HistoricoComposicao"]
+    )
+    for leader in leaders:
+        party = get_most_recent_status(leader["depGP"], "gpDtInicio")["gpSigla"]
+        roles = _get_intervals(
+            "lider",
+            leader,
+            leader.get("depCargo", {}),
+            ("carDes", "carDtInicio", "carDtFim"),
+        )
+        # the value is the parliamentary group being led
+        intervals += [
+            {**role, "valor": party}
+            for role in roles
+            if "Líder de Grupo Parlamentar" in role["valor"]
+        ]
+
+    return pd.DataFrame(
+        intervals, columns=["tipo", "dep_id", "nome", "valor", "inicio", "fim"]
+    )
+
+
+def _get_legislatures_fields(data: Dict) -> Dict:
     chair_of_general_assembly = _get_chair_of_general_assembly(data)
     party_deputy_chair = _get_party_deputy_chair(data)
     party_counters = _get_party_deputy_counter(data)
+    non_registered_deputies = _get_non_registered_deputies(data)
     total_number_of_deputies = sum(party_counters.values())
     return {
         **chair_of_general_assembly,
@@ -147,4 +245,31 @@ def get_legislatures_fields(path: str) -> Dict:
                 for party_name, party_counter in party_counters.items()
             ]
         },
+        "deputados_nao_inscritos": non_registered_deputies,
     }
+
+
+def get_legislatures_fields(path: str) -> Dict:
+    return _get_legislatures_fields(_get_raw_data(path=path))
+
+
+def get_legislature_composition(path: str) -> Tuple[Dict, pd.DataFrame]:
+    """
+    Legislature fields (see `get_legislatures_fields`) and the intervals of its
+    composition (see `get_legislature_intervals`), from the same data.
+    """
+
+    data = _get_raw_data(path=path)
+    return _get_legislatures_fields(data), get_legislature_intervals(data)
+
+
+def get_legislatures_compositions(paths: List[str]) -> List[Tuple[Dict, pd.DataFrame]]:
+    """
+    Composition (see `get_legislature_composition`) of several legislatures,
+    downloaded at the same time.
+    """
+
+    return [
+        (_get_legislatures_fields(data), get_legislature_intervals(data))
+        for data in fetch_all(_get_raw_data, paths)
+    ]
@@ -0,0 +1,140 @@
+import bisect
+from collections import Counter
+from datetime import date
+from typing import Dict, List
+
+import pandas as pd
+
+# the last day of an interval is still part of it
+ONE_DAY = pd.Timedelta(days=1)
+
+
+class LegislatureIntervals:
+    """
+    Composition of a legislature at any date, from the intervals of each
+    deputy situation, parliamentary group and role (see
+    `get_legislature_intervals`).
+
+    The dates where anything changes split the legislature in periods where
+    the composition is the same, so a date is looked up with a binary search
+    over those dates and the fields of each period are only built once.
+    """
+
+    def __init__(self, intervals: pd.DataFrame, legislature: str = ""):
+        self.legislature = legislature
+
+        intervals = intervals.copy()
+        intervals["inicio"] = pd.to_datetime(intervals["inicio"])
+        # first day not part of the interval, none while ongoing
+        intervals["fim"] = pd.to_datetime(intervals["fim"]) + ONE_DAY
+        self._intervals = intervals
+
+        self._changes: List[pd.Timestamp] = sorted(
+            set(intervals["inicio"].dropna()) | set(intervals["fim"].dropna())
+        )
+        self._fields: Dict[int, Dict] = {}
+
+    def _active(self, day: pd.Timestamp) -> pd.DataFrame:
+        intervals = self._intervals
+        return intervals[
+            (intervals["inicio"].isna() | (intervals["inicio"] <= day))
+            & (intervals["fim"].isna() | (intervals["fim"] > day))
+        ]
+
+    def _build_fields(self, day: pd.Timestamp) -> Dict:
+        """
+        Legislature fields (see `get_legislatures_fields`) at a date
+        """
+
+        active = self._active(day)
+        by_kind = {kind: df for kind, df in active.groupby("tipo")}
+        empty = active.iloc[:0]
+
+        situations = by_kind.get("situacao", empty)
+        groups = by_kind.get("gp", empty).drop_duplicates("dep_id", keep="last")
+        board = by_kind.get("mesa", empty)
+        leaders = by_kind.get("lider", empty)
+
+        effective = set(
+            situations.loc[situations["valor"].str.contains("Efetivo"), "dep_id"]
+        )
+        party_counters = Counter(groups.loc[groups["dep_id"].isin(effective), "valor"])
+        total_number_of_deputies = sum(party_counters.values())
+        party_deputy_chair = dict(zip(leaders["valor"], leaders["nome"]))
+
+        president = board.loc[board["valor"] == "Presidente", ["nome", "dep_id"]]
+        vice_presidents = board.loc[
+            board["valor"] == "Vice-Presidente", ["nome", "dep_id"]
+        ]
+
+        return {
+            "presidente": (
+                president.to_dict(orient="records")[-1] if len(president) else None
+            ),
+            "vice_presidentes": vice_presidents.to_dict(orient="records"),
+            "legislatura": self.legislature,
+            "partidos": [
+                {
+                    "nome": party_name,
+                    "nr_deputados": party_counter,
+                    "percentagem_deputados_total": round(
+                        party_counter / total_number_of_deputies * 100, 1
+                    ),
+                    "lider_de_bancada": party_deputy_chair.get(party_name, ""),
+                }
+                for party_name, party_counter in party_counters.items()
+            ],
+            "deputados_nao_inscritos": list(
+                groups.loc[groups["valor"] == "Ninsc", "nome"]
+            ),
+        }
+
+    def fields(self, as_of: date) -> Dict:
+        """
+        Legislature fields at a date
+        """
+
+        day = pd.Timestamp(as_of)
+        # period of the date, -1 before the first change
+        period = bisect.bisect_right(self._changes, day) - 1
+
+        fields = self._fields.get(period)
+        if fields is None:
+            start = self._changes[period] if period >= 0 else day
+            fields = self._build_fields(start)
+            self._fields[period] = fields
+
+        return fields
+
+    def groups(self) -> pd.DataFrame:
+        """
+        Parliamentary group of each deputy (by name) and the first and last
+        days they were in it, no last day while ongoing
+        """
+
+        groups = self._intervals[self._intervals["tipo"] == "gp"]
+        return pd.DataFrame(
+            {
+                "nome": groups["nome"],
+                "partido": groups["valor"],
+                "inicio": groups["inicio"],
+                "fim": groups["fim"] - ONE_DAY,
+            }
+        ).reset_index(drop=True)
+
+    def to_dict(self) -> Dict:
+        intervals = self._intervals.assign(
+            inicio=self._intervals["inicio"].dt.strftime("%Y-%m-%d"),
+            fim=(self._intervals["fim"] - ONE_DAY).dt.strftime("%Y-%m-%d"),
+        )
+        return {
+            "legislatura": self.legislature,
+            "intervalos": {
+                column: [None if pd.isna(x) else x for x in values]
+                for column, values in intervals.to_dict(orient="list").items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LegislatureIntervals":
+        return cls(pd.DataFrame(data["intervalos"]), data.get("legislatura", ""))
@@ -0,0 +1,187 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from src.common.storage import read_blob, upload_json
+
+if TYPE_CHECKING:
+    from azure.storage.blob import ContainerClient as BlobContainerClient
+
+# parties voting in any of the supported legislatures, so legislatures whose
+# data does not list some of them are still parsed the same way
+KNOWN_PARTIES = ["ps", "psd", "be", "pcp", "cds-pp", "pan", "pev", "ch", "il", "l"]
+
+# deputies not registered in any parliamentary group (ninsc) vote on their own
+# and are identified by a code, these were used before codes were derived
+# from the name and are kept so the stored data does not change
+KNOWN_DEPUTIES = {
+    "Cristina Rodrigues": "cr",
+    "Joacine Katar Moreira": "jkm",
+    "António Maló de Abreu": "ama",
+    "Miguel Arruda": "mar",
+}
+
+VOTE_COLUMN_PREFIX = "iniciativa_votacao_"
+
+
+def normalize_name(name: str) -> str:
+    """Name as it shows up in the vote results"""
+    return name.lower().replace(" ", "")
+
+
+@dataclass
+class PartyRegistry:
+    """
+    Parties, and deputies voting on their own, of a legislature with the lookup
+    tables used to parse the votes and to build the API responses.
+    """
+
+    # party acronym or deputy name, by code
+    names: Dict[str, str]
+    # token in the vote results (e.g. "ps" or "cristinarodrigues(ninsc)") to code
+    token_to_code: Dict[str, str] = field(default_factory=dict)
+    # initiative author, in lower case, to its id in the API
+    name_to_id: Dict[str, str] = field(default_factory=dict)
+    # vote column (e.g. "iniciativa_votacao_ps") to its position
+    column_index: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def build(
+        cls, parties: Iterable[str] = (), deputies: Iterable[str] = ()
+    ) -> "PartyRegistry":
+        """
+        Registry with the known parties and deputies plus the given ones. A new
+        deputy is identified by its name as written in the vote results, which
+        only depends on the deputy, so the codes of the others never change
+        when a deputy is added (initials would clash).
+        """
+
+        names = {party: party.upper() for party in KNOWN_PARTIES}
+        for party in parties:
+            names.setdefault(party.lower(), party)
+
+        token_to_code = {code: code for code in names}
+        name_to_id = {}
+
+        deputy_codes = dict(KNOWN_DEPUTIES)
+        for deputy in deputies:
+            deputy_codes.setdefault(deputy, normalize_name(deputy))
+
+        for deputy, code in deputy_codes.items():
+            names[code] = deputy
+            token_to_code[code] = code
+            token_to_code[f"{normalize_name(deputy)}(ninsc)"] = code
+            name_to_id[deputy.lower()] = code
+
+        codes = sorted(names)
+        return cls(
+            names=names,
+            token_to_code=token_to_code,
+            name_to_id=name_to_id,
+            column_index={
+                f"{VOTE_COLUMN_PREFIX}{code}": i for i, code in enumerate(codes)
+            },
+        )
+
+    @classmethod
+    def from_legislature_fields(
+        cls, legislature_fields: Dict, deputies: Iterable[str] = ()
+    ) -> "PartyRegistry":
+        """
+        Registry of the parties and deputies of the legislature fields, plus
+        the given deputies (e.g. found in the initiatives)
+        """
+
+        return cls.build(
+            [party["nome"] for party in legislature_fields.get("partidos", [])],
+            [*legislature_fields.get("deputados_nao_inscritos", []), *deputies],
+        )
+
+    def to_dict(self) -> Dict:
+        deputies = self.deputies
+        return {
+            "partidos": [
+                name for code, name in self.names.items() if code not in deputies
+            ],
+            "deputados_nao_inscritos": list(deputies.values()),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PartyRegistry":
+        return cls.build(data["partidos"], data["deputados_nao_inscritos"])
+
+    def code(self, token: str) -> Optional[str]:
+        """Code of a token in the vote results, None when it is not a party"""
+        return self.token_to_code.get(token)
+
+    def party_id(self, name: str) -> str:
+        """Id used in the API for an initiative author"""
+        # authors are not always written with the same case
+        party_id = self.name_to_id.get(name.lower())
+        if party_id is None:
+            party_id = name.lower().replace(" ", "-")
+        return party_id
+
+    def name(self, code: str) -> str:
+        return self.names.get(code, code)
+
+    @property
+    def deputies(self) -> Dict[str, str]:
+        """Name of each deputy voting on their own, by code"""
+        return {code: self.names[code] for code in self.name_to_id.values()}
+
+    @property
+    def vote_columns(self) -> List[str]:
+        return list(self.column_index)
+
+    @property
+    def fingerprint(self) -> str:
+        """Changes when the vote results would be parsed differently"""
+        return hashlib.sha1(
+            json.dumps(sorted(self.token_to_code.items())).encode()
+        ).hexdigest()[:12]
+
+
+DEFAULT_REGISTRY = PartyRegistry.build()
+
+
+def get_party_registry_from_blob(
+    blob_container: "BlobContainerClient",
+    legislature_name: str,
+    deputies: Iterable[str] = (),
+) -> PartyRegistry:
+    """
+    Party registry of a legislature, from the legislature fields stored in our
+    Blob Storage (only the known parties when not there yet) and the given
+    deputies (see `PartyRegistry.from_legislature_fields`).
+    """
+
+    try:
+        legislature_fields = json.loads(
+            read_blob(
+                blob_container.get_blob_client(f"{legislature_name}_legislatures.json")
+            )
+        )
+    except ResourceNotFoundError:
+        legislature_fields = {}
+
+    return PartyRegistry.from_legislature_fields(legislature_fields, deputies)
+
+
+def store_party_registry(
+    blob_container: "BlobContainerClient",
+    legislature_name: str,
+    registry: PartyRegistry,
+):
+    """
+    Store the party registry used to process the initiatives of a legislature,
+    so the API uses the same one
+    """
+
+    upload_json(
+        blob_container.get_blob_client(f"{legislature_name}_party_registry.json"),
+        registry.to_dict(),
+    )
@@ -0,0 +1,57 @@
+import json
+from unittest import TestCase
+
+import pandas as pd
+
+from src.app.approvals import build_party_approvals, serialize_party_approvals
+from src.parliament.initiatives.votes import get_party_approvals
+from src.parliament.parties import DEFAULT_REGISTRY
+
+
+class TestPartyApprovals(TestCase):
+    def test_all_parties(self):
+        votes = pd.DataFrame(
+            {
+                "iniciativa_autor": ["PS", "Cristina Rodrigues", "PS"],
+                "iniciativa_aprovada": [True, False, True],
+                "iniciativa_votacao_unanime": ["", "", "unanime"],
+                "iniciativa_votacao_ps": ["afavor", "contra", None],
+                "iniciativa_votacao_cr": ["contra", "afavor", None],
+            }
+        )
+
+        table = build_party_approvals(
+            get_party_approvals(votes), DEFAULT_REGISTRY, ["PS", "IL", "PS"]
+        )
+        autores = json.loads(serialize_party_approvals(table))["autores"]
+
+        self.assertEqual([a["id"] for a in autores], ["ps", "cr", "il"])
+        self.assertEqual(autores[0]["total_iniciativas"], 2)
+        self.assertEqual(autores[0]["aprovacoes"], {"cr": 0.5, "ps": 1.0})
+        self.assertEqual(
+            autores[2],
+            {
+                "id": "il",
+                "nome": "IL",
+                "total_iniciativas": 0,
+                "total_iniciativas_aprovadas": 0.0,
+                "aprovacoes": {"cr": 0.0, "ps": 0.0},
+            },
+        )
+
+    def test_no_initiatives(self):
+        table = build_party_approvals(pd.DataFrame(), DEFAULT_REGISTRY, ["PS"])
+        autores = json.loads(serialize_party_approvals(table))["autores"]
+
+        self.assertEqual(
+            autores,
+            [
+                {
+                    "id": "ps",
+                    "nome": "PS",
+                    "total_iniciativas": 0,
+                    "total_iniciativas_aprovadas": 0.0,
+                    "aprovacoes": {},
+                }
+            ],
+        )
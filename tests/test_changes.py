@@ -0,0 +1,40 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from src.common.changes import ChangeWatcher, FileChangeMarker
+
+
+class TestChangeWatcher(TestCase):
+    def test_poll(self):
+        path = os.path.join(tempfile.mkdtemp(), "raw_changes.json")
+        calls = []
+        failing = []
+
+        def process(legislatures):
+            calls.append(legislatures)
+            if failing:
+                raise RuntimeError(failing.pop())
+            return legislatures
+
+        # the downloader and the updater have their own markers
+        downloader = FileChangeMarker(path)
+        watcher = ChangeWatcher(FileChangeMarker(path), process)
+
+        self.assertEqual(watcher.poll(), [])
+
+        downloader.write({"XV": "a", "XVI": "b"})
+        self.assertEqual(watcher.poll(), ["XV", "XVI"])
+        # nothing changed
+        self.assertEqual(watcher.poll(), [])
+        downloader.write({"XV": "a"})
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(len(calls), 1)
+
+        downloader.write({"XVI": "c"})
+        failing.append("error")
+        with self.assertRaises(RuntimeError):
+            watcher.poll()
+        # tried again, even though the marker did not change since
+        self.assertEqual(watcher.poll(), ["XVI"])
+        self.assertEqual(calls[1:], [["XVI"], ["XVI"]])
@@ -0,0 +1,113 @@
+import io
+from datetime import date
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from src.app import columnar, main
+from src.app.apis import schemas
+from src.app.store import LegislatureSnapshot
+
+
+def _votes() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "iniciativa_id": ["1", "2", "3", "4"],
+            "iniciativa_evento_fase": [
+                "Votação na generalidade",
+                "Votação final global",
+                "Votação na generalidade",
+                "Votação na generalidade",
+            ],
+            "iniciativa_evento_data": pd.to_datetime(
+                ["2023-03-01", "2023-01-01", "2023-02-01", "2023-02-01"]
+            ),
+            "iniciativa_votacao_ps": ["afavor", "contra", "afavor", None],
+        }
+    )
+
+
+class TestColumnar(TestCase):
+    def test_version(self):
+        votes = _votes()
+
+        self.assertEqual(
+            columnar.get_version([votes]), columnar.get_version([votes.copy()])
+        )
+        votes.loc[3, "iniciativa_votacao_ps"] = "contra"
+        self.assertNotEqual(
+            columnar.get_version([votes]), columnar.get_version([_votes()])
+        )
+
+    def test_votes_table(self):
+        import pyarrow as pa
+
+        table = columnar.VotesTable(_votes())
+
+        self.assertEqual(
+            table.get(schemas.EventPhase.ALL)["iniciativa_id"].to_pylist(),
+            ["2", "3", "4", "1"],
+        )
+        self.assertEqual(
+            table.get(
+                schemas.EventPhase.GENERALIDADE, dt_ini=date(2023, 1, 1)
+            ).num_rows,
+            3,
+        )
+        self.assertEqual(
+            table.get(schemas.EventPhase.ALL, date(2023, 1, 2), date(2023, 2, 1))[
+                "iniciativa_id"
+            ].to_pylist(),
+            ["3", "4"],
+        )
+        self.assertEqual(
+            table.get(schemas.EventPhase.ALL, date(2024, 1, 1)).num_rows, 0
+        )
+
+        content = columnar.serialize_table(
+            table.get(schemas.EventPhase.ALL), schemas.ColumnarFormat.ARROW
+        )
+        self.assertEqual(
+            pa.ipc.open_stream(content).read_all().to_pandas().shape, (4, 4)
+        )
+
+
+class TestDownload(TestCase):
+    def test_votes(self):
+        snapshot = LegislatureSnapshot(
+            party_approvals={},
+            party_correlations={},
+            initiative_votes=_votes(),
+            legislature_fields={"partidos": [{"nome": "PS"}]},
+        )
+        client = TestClient(main.app)
+
+        with patch.object(main, "legislatures", {"XV": snapshot}):
+            response = client.get(
+                "/parliament/download",
+                params={
+                    "event_phase": "Votação na generalidade",
+                    "dt_ini": "2023-02-01",
+                },
+            )
+            not_modified = client.get(
+                "/parliament/download",
+                params={
+                    "event_phase": "Votação na generalidade",
+                    "dt_ini": "2023-02-01",
+                },
+                headers={"If-None-Match": response.headers["ETag"]},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.headers["content-type"],
+            columnar.MEDIA_TYPES[schemas.ColumnarFormat.PARQUET],
+        )
+        self.assertEqual(
+            pd.read_parquet(io.BytesIO(response.content))["iniciativa_id"].tolist(),
+            ["3", "4", "1"],
+        )
+        self.assertEqual(not_modified.status_code, 304)
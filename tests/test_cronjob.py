@@ -0,0 +1,86 @@
+import hashlib
+from typing import Dict
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+import cronjob
+
+CONTENT = b'\xef\xbb\xbf[{"IniciativaId": "1"}]'
+ETAG = '"v1"'
+
+
+class TestGetRawData(TestCase):
+    def setUp(self):
+        self.requests = []
+        self.status_code = 200
+        self.content = CONTENT
+
+        patcher = patch.object(cronjob, "download", self._download)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _download(self, url, file, headers=None) -> requests.Response:
+        # stand-in for the source, answering the conditional requests
+        self.requests.append(headers)
+
+        response = requests.Response()
+        response.url = url
+        if headers.get("If-None-Match") == ETAG:
+            response.status_code = 304
+            return response
+
+        response.status_code = self.status_code
+        response.headers["ETag"] = ETAG
+        if self.status_code == 200:
+            file.write(self.content)
+        return response
+
+    def _get(self, metadata: Dict[str, str]) -> cronjob.RawData:
+        data = cronjob.get_raw_data("https://app.parlamento.pt/file", metadata)
+        if data.changed:
+            self.addCleanup(data.file.close)
+        return data
+
+    def test_changed(self):
+        data = self._get({})
+
+        self.assertTrue(data.changed)
+        self.assertEqual(data.file.read(), CONTENT)
+        self.assertEqual(
+            data.metadata,
+            {
+                "content_sha256": hashlib.sha256(CONTENT).hexdigest(),
+                "source_etag": ETAG,
+            },
+        )
+
+    def test_not_modified(self):
+        metadata = {"content_sha256": "previous", "source_etag": ETAG}
+
+        data = self._get(metadata)
+
+        self.assertEqual(self.requests, [{"If-None-Match": ETAG}])
+        self.assertFalse(data.changed)
+        self.assertEqual(data.metadata, metadata)
+
+    def test_same_hash(self):
+        # sources without validators are downloaded again, but not uploaded
+        metadata = {"content_sha256": hashlib.sha256(CONTENT).hexdigest()}
+
+        data = self._get(metadata)
+
+        self.assertEqual(self.requests, [{}])
+        self.assertFalse(data.changed)
+        self.assertEqual(data.metadata, {**metadata, "source_etag": ETAG})
+
+    def test_errors(self):
+        self.status_code = 404
+        with self.assertRaises(requests.HTTPError):
+            self._get({})
+
+        self.status_code = 200
+        self.content = b"<html>Service Unavailable</html>"
+        with self.assertRaises(ValueError):
+            self._get({})
@@ -0,0 +1,57 @@
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.daily_updater import main as daily_updater
+
+
+class TestDailyUpdater(TestCase):
+    def test_initiatives_one_at_a_time(self):
+        running = []
+        overlaps = []
+
+        def run_initiatives(blob_storage_container_client, report, legislatures=None):
+            running.append(legislatures)
+            overlaps.append(len(running) > 1)
+            time.sleep(0.05)
+            running.remove(legislatures)
+            return []
+
+        with patch.multiple(
+            daily_updater,
+            run_initiatives=run_initiatives,
+            get_blob_container=lambda: None,
+            run_legislatures=lambda *args: [],
+            run_elections=lambda *args: None,
+            update_app=lambda: None,
+        ):
+            threads = [
+                threading.Thread(target=daily_updater.main),
+                threading.Thread(target=daily_updater.process_changes, args=(["XV"],)),
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(overlaps, [False, False])
+
+    def test_update_app_only_when_changed(self):
+        for processed, published, updated in [
+            ([], [], False),
+            (["XV"], [], True),
+            ([], ["XIV"], True),
+        ]:
+            updates = []
+            with patch.multiple(
+                daily_updater,
+                run_initiatives=lambda *args: processed,
+                get_blob_container=lambda: None,
+                run_legislatures=lambda *args: published,
+                run_elections=lambda *args: None,
+                update_app=lambda: updates.append(True),
+            ):
+                daily_updater.main()
+
+            self.assertEqual(bool(updates), updated, (processed, published))
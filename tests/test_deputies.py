@@ -0,0 +1,148 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from src.parliament.initiatives.deputies import (DeputyRollups,
+                                                 get_deputies_stats)
+from src.parliament.initiatives.extract import get_deputies_votes
+from src.parliament.legislatures.intervals import LegislatureIntervals
+from src.parliament.parties import DEFAULT_REGISTRY
+
+
+def _votes() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "iniciativa_id": ["1", "2", "3", "4"],
+            "iniciativa_evento_id": ["10", "20", "30", "40"],
+            "iniciativa_evento_fase": ["Votação na generalidade"] * 4,
+            "iniciativa_evento_data": pd.to_datetime(
+                ["2023-01-10", "2023-01-20", "2023-02-01", "2023-02-15"]
+            ),
+            "iniciativa_votacao_unanime": ["", "", "unanime", ""],
+            "iniciativa_votacao_ps": ["afavor", "contra", None, "ausência"],
+            "iniciativa_votacao_cr": ["contra", "ausência", None, "afavor"],
+            "iniciativa_votacao_outros_contra": ["anasilva(ps)|2-ps", None, None, None],
+            "iniciativa_votacao_outros_abstenção": [None, "anasilva(ps)", None, None],
+        }
+    )
+
+
+class TestDeputies(TestCase):
+    def test_deputies_votes(self):
+        deputies_votes = get_deputies_votes(_votes(), DEFAULT_REGISTRY)
+
+        ana = deputies_votes[deputies_votes["deputado"] == "anasilva"]
+        self.assertEqual(
+            ana[["iniciativa_id", "partido", "voto", "voto_partido"]].values.tolist(),
+            [["1", "ps", "contra", "afavor"], ["2", "ps", "abstenção", "contra"]],
+        )
+        # unanimous votes are in favor
+        self.assertEqual(
+            deputies_votes[deputies_votes["deputado"] == "cr"]["voto"].tolist(),
+            ["contra", "ausência", "afavor", "afavor"],
+        )
+
+    def test_stats(self):
+        votes = _votes()
+        rollups = DeputyRollups()
+        rollups.update(votes, get_deputies_votes(votes))
+
+        stats = get_deputies_stats(rollups, DEFAULT_REGISTRY)
+
+        ana = stats["anasilva"]
+        self.assertEqual(ana["partido"], "PS")
+        self.assertEqual([m["mes"] for m in ana["meses"]], ["2023-01", "2023-02"])
+        self.assertEqual(
+            ana["total"],
+            {
+                "votacoes": 4,
+                "presencas": 3,
+                "divergencias": 2,
+                "rebeldias": 1,
+                "assiduidade": 0.75,
+                "concordancia": 1 / 3,
+                "rebeldia": 1 / 3,
+            },
+        )
+        self.assertEqual(stats["cr"]["nome"], "Cristina Rodrigues")
+        self.assertEqual(stats["cr"]["total"]["presencas"], 3)
+        self.assertIsNone(stats["cr"]["total"]["rebeldia"])
+
+    def test_incremental(self):
+        votes = _votes()
+        deputies_votes = get_deputies_votes(votes)
+
+        full = DeputyRollups()
+        full.update(votes, deputies_votes)
+
+        rollups = DeputyRollups()
+        self.assertEqual(rollups.update(votes.iloc[:2], deputies_votes), 2)
+        rollups = DeputyRollups.from_dict(rollups.to_dict())
+        self.assertEqual(rollups.update(votes, deputies_votes), 2)
+        self.assertEqual(rollups.update(votes, deputies_votes), 0)
+
+        self.assertEqual(
+            get_deputies_stats(rollups, DEFAULT_REGISTRY),
+            get_deputies_stats(full, DEFAULT_REGISTRY),
+        )
+
+    def test_same_day_votes(self):
+        votes = _votes()
+        # voted again in the same phase and day, known in the next run
+        again = votes.iloc[[0]].assign(
+            iniciativa_evento_id="11",
+            iniciativa_votacao_ps="contra",
+            iniciativa_votacao_outros_contra=None,
+            iniciativa_votacao_outros_abstenção="anasilva(ps)",
+        )
+
+        rollups = DeputyRollups()
+        self.assertEqual(rollups.update(votes, get_deputies_votes(votes)), 4)
+        votes = pd.concat([votes, again], ignore_index=True)
+        self.assertEqual(rollups.update(votes, get_deputies_votes(votes)), 1)
+        self.assertEqual(len(rollups.votes), 5)
+
+        ana = get_deputies_stats(rollups, DEFAULT_REGISTRY)["anasilva"]
+        self.assertEqual(ana["total"]["votacoes"], 5)
+        self.assertEqual(ana["total"]["divergencias"], 3)
+
+        # the votes no longer there are not kept
+        self.assertEqual(rollups.update(votes.iloc[1:], get_deputies_votes(votes)), 0)
+        self.assertEqual(len(rollups.votes), 4)
+
+    def test_stats_composition(self):
+        votes = _votes()
+        rollups = DeputyRollups()
+        rollups.update(votes, get_deputies_votes(votes))
+        intervals = LegislatureIntervals(
+            pd.DataFrame(
+                {
+                    "tipo": ["gp", "gp", "gp", "situacao"],
+                    "dep_id": [1, 2, 3, 3],
+                    "nome": ["Ana Silva", "Rui Costa"] + ["Cristina Rodrigues"] * 2,
+                    "valor": ["PS", "PS", "Ninsc", "Efetivo"],
+                    "inicio": ["2022-12-01", "2023-02-01", "2022-12-01", "2022-12-01"],
+                    "fim": ["2023-01-31", None, None, None],
+                }
+            )
+        )
+
+        stats = get_deputies_stats(rollups, DEFAULT_REGISTRY, intervals)
+
+        # only while in the party
+        ana = stats["anasilva"]
+        self.assertEqual(ana["nome"], "Ana Silva")
+        self.assertEqual([m["mes"] for m in ana["meses"]], ["2023-01"])
+        self.assertEqual(ana["total"]["votacoes"], 2)
+        self.assertEqual(ana["total"]["divergencias"], 2)
+
+        # never voted differently, since the mandate start
+        rui = stats["ruicosta"]
+        self.assertEqual(rui["partido"], "PS")
+        self.assertEqual([m["mes"] for m in rui["meses"]], ["2023-02"])
+        self.assertEqual(rui["total"]["votacoes"], 2)
+        self.assertEqual(rui["total"]["presencas"], 1)
+        self.assertEqual(rui["total"]["concordancia"], 1)
+
+        self.assertEqual(stats["cr"]["nome"], "Cristina Rodrigues")
+        self.assertNotIn("cristinarodrigues", stats)
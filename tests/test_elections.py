@@ -0,0 +1,197 @@
+import os
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+
+from src.app.candidates import CandidatesIndex, serialize_parties
+from src.app.responses import precompress
+from src.app.store import ElectionSnapshot, ElectionStore
+from src.elections import extract
+from src.elections.extract import (ELECTIONS, NATIONAL_CONSTITUENCY, Election,
+                                   cache_election, extract_election,
+                                   get_election, load_election,
+                                   register_election, store_election)
+from tests.test_manifest import FakeContainerClient
+
+RAW_ELECTION = {
+    "manifestos": {},
+    "parties": {
+        "PS ": {
+            "name": "Partido Socialista",
+            "website": "-",
+            "logo": "ps.png",
+            # a single constituency
+            "candidates": {
+                "main": [
+                    {
+                        "name": "Ana Silva",
+                        "position": 1,
+                        "type": "efetivo",
+                        "is_lead_candidate": True,
+                        "photo": "ana.jpg",
+                    }
+                ],
+                "secundary": [{"name": "Rui Costa", "position": 1}],
+            },
+        },
+        "L": {
+            "name": "Livre",
+            "website": "https://partidolivre.pt",
+            "candidates": {"Lisboa": {"main": [{"name": "Rui Tavares"}]}},
+        },
+    },
+}
+
+
+class TestElections(TestCase):
+    def test_get_election(self):
+        election = get_election("Legislativas", 2019)
+
+        self.assertIs(get_election("legislativas", 2019), election)
+        self.assertEqual(election.parties_blob, "legislativas_2019_parties.json")
+        self.assertIsNone(get_election("Legislativas", 1975))
+        # only registered once checked against PPT data
+        self.assertIsNone(get_election("Europeias", 2019))
+
+    def test_store_is_lazy(self):
+        loads = []
+
+        def loader(election):
+            loads.append(election.name)
+            return ElectionSnapshot(
+                parties=precompress(
+                    serialize_parties(
+                        pd.DataFrame({"name": ["Partido Socialista"]}, index=["PS"])
+                    )
+                ),
+                candidates=CandidatesIndex(
+                    pd.DataFrame({"party": ["PS"], "district": ["Lisboa"]})
+                ),
+            )
+
+        store = ElectionStore(loader)
+        self.assertEqual(store.memory_report(), {})
+
+        snapshot = store.get("Legislativas", 2019)
+        self.assertIs(store.get("LEGISLATIVAS", 2019), snapshot)
+        self.assertEqual(loads, ["legislativas_2019"])
+        self.assertEqual(
+            snapshot.parties.content,
+            b'{"parties":{"PS":{"name":"Partido Socialista"}}}',
+        )
+
+        self.assertIsNone(store.get("Autarquicas", 2019))
+        self.assertEqual(loads, ["legislativas_2019"])
+
+    def test_register_election(self):
+        election = Election("Autarquicas", 2021, archive="autarquicas/autarquicas-2021")
+        register_election(election)
+        self.addCleanup(ELECTIONS.pop, election.key)
+
+        self.assertIs(get_election("AUTARQUICAS", 2021), election)
+        self.assertEqual(election.name, "autarquicas_2021")
+        self.assertEqual(
+            election.path,
+            f"{extract.PPT_ARCHIVE}/autarquicas/autarquicas-2021/data.json",
+        )
+
+    def test_single_constituency(self):
+        election = Election("Europeias", 2019, archive="europeias/europeias-2019")
+
+        with patch.object(extract, "get_data", return_value=RAW_ELECTION) as get_data:
+            parties, candidates = extract_election(election)
+
+        get_data.assert_called_once_with(election.path)
+        self.assertEqual(parties.index.tolist(), ["PS", "L"])
+        self.assertIsNone(parties.loc["PS", "website"])
+        self.assertEqual(
+            parties.loc["PS", "logo"],
+            f"{extract.PPT_ARCHIVE}/europeias/europeias-2019/partidos_logos/ps.png",
+        )
+        self.assertEqual(
+            candidates[["party", "district", "name"]].values.tolist(),
+            [
+                ["PS", NATIONAL_CONSTITUENCY, "Ana Silva"],
+                ["PS", NATIONAL_CONSTITUENCY, "Rui Costa"],
+                ["L", "Lisboa", "Rui Tavares"],
+            ],
+        )
+        self.assertTrue(candidates.loc[0, "photo"].endswith("/ana.jpg"))
+
+    def test_load_election(self):
+        election = Election("Europeias", 2019, archive="europeias/europeias-2019")
+        container_client = FakeContainerClient()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+
+        with patch.object(extract, "LOCAL_CACHE_DIR", cache_dir.name), patch.object(
+            extract, "get_data", return_value=RAW_ELECTION
+        ) as get_data:
+            # never extracted when loading
+            self.assertIsNone(load_election(container_client, election))
+            self.assertEqual(get_data.call_count, 0)
+
+            # from the local cache when not in Blob Storage
+            self.assertTrue(cache_election(election))
+            self.assertFalse(cache_election(election))
+            parties, _ = load_election(container_client, election)
+            self.assertEqual(parties.loc["PS", "name"], "Partido Socialista")
+
+            # Blob Storage first
+            self.assertTrue(store_election(container_client, election))
+            self.assertFalse(store_election(container_client, election))
+            os.remove(os.path.join(cache_dir.name, election.parties_blob))
+            parties, candidates = load_election(container_client, election)
+            self.assertEqual(parties.index.tolist(), ["PS", "L"])
+            self.assertEqual(len(candidates), 3)
+
+        self.assertEqual(get_data.call_count, 2)
+
+    def test_store_not_processed(self):
+        election = Election("Europeias", 2019, archive="europeias/europeias-2019")
+        register_election(election)
+        self.addCleanup(ELECTIONS.pop, election.key)
+        loads = []
+
+        def loader(election):
+            loads.append(election.name)
+            return None
+
+        store = ElectionStore(loader)
+
+        self.assertIsNone(store.get("Europeias", 2019))
+        self.assertIsNone(store.get("Europeias", 2019))
+        self.assertEqual(loads, ["europeias_2019"])
+        self.assertEqual(store.memory_report(), {})
+
+        # tried again after an update, it may be stored meanwhile
+        store.clear_missing()
+        self.assertIsNone(store.get("Europeias", 2019))
+        self.assertEqual(loads, ["europeias_2019", "europeias_2019"])
+
+    def test_store_load_outside_lock(self):
+        loading = threading.Event()
+        release = threading.Event()
+
+        def loader(election):
+            if election.year == 2019:
+                loading.set()
+                release.wait(5)
+            return None
+
+        election = Election("Legislativas", 2022, archive="legislativas/2022")
+        register_election(election)
+        self.addCleanup(ELECTIONS.pop, election.key)
+        store = ElectionStore(loader)
+
+        thread = threading.Thread(target=store.get, args=("Legislativas", 2019))
+        thread.start()
+        self.assertTrue(loading.wait(5))
+        # another election is not blocked by the one being loaded
+        self.assertIsNone(store.get("Legislativas", 2022))
+        release.set()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
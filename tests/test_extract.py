@@ -1,7 +1,12 @@
 from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
 
 from src.parliament.common import MyDict
-from src.parliament.initiatives.extract import _split_vote_result
+from src.parliament.initiatives.extract import (_split_vote_result,
+                                                get_initiatives_votes,
+                                                parse_vote_patterns)
 
 
 class TestProvider(TestCase):
@@ -136,3 +141,98 @@ class TestProvider(TestCase):
         self.assertTrue(MyDict(d).get("c", {}).get("d", 10) == 10)
         self.assertTrue(MyDict(d).get("d", {}) == {})
         self.assertTrue(MyDict(d).get("d", 10) == 10)
+
+    def test_parse_vote_patterns(self):
+        votes = pd.Series(
+            [
+                "afavor:ps,psd,be,pcp,cds-pp,pan,pev,ch,il,cr,jkm",
+                "afavor:be,pcp,pan,pev,cr,jkmcontra:ps,psd,cds-pp,ilausência:ch",
+                "afavor:ps,psd,be,pcp,cds-pp,pan,pev,ch,il,cr,jkm",
+                None,
+            ]
+        )
+        vote_patterns = {}
+
+        with patch(
+            "src.parliament.initiatives.extract._split_vote_result",
+            wraps=_split_vote_result,
+        ) as split:
+            codes, vectors = parse_vote_patterns(votes, vote_patterns)
+            self.assertEqual(split.call_count, 2)
+
+            # reused in the next run
+            parse_vote_patterns(votes, vote_patterns)
+            self.assertEqual(split.call_count, 2)
+
+        self.assertEqual(list(codes), [0, 1, 0, -1])
+        self.assertEqual(vectors[1]["iniciativa_votacao_ch"], "ausência")
+        self.assertEqual(vectors[1]["iniciativa_votacao_il"], "contra")
+        self.assertEqual(len(vote_patterns), 2)
+
+    def test_get_initiatives_votes(self):
+        initiatives = pd.DataFrame(
+            {
+                "iniciativa_id": ["1", "2", "3", "4", "5"],
+                "iniciativa_votacao_res": [
+                    "Aprovado",
+                    "",
+                    "Rejeitado",
+                    "Aprovado",
+                    "Aprovado",
+                ],
+                "iniciativa_votacao_detalhe": [
+                    "afavor:ps,chcontra:psd",
+                    "afavor:ps",
+                    "afavor:chcontra:ps,psd",
+                    "afavor:ps,chcontra:psd",
+                    "",
+                ],
+                "iniciativa_autor": ["PSD", "PS", "PS", "Governo", "PS"],
+                "iniciativa_votacao_unanime": ["", "", "", "", "unanime"],
+                "iniciativa_votacao_desc": ["", "", "Requerimento", "", ""],
+                "iniciativa_evento_obsFase": ["", "", "Avocação", "", ""],
+            }
+        )
+        for column in [
+            "iniciativa_nr",
+            "iniciativa_tipo",
+            "iniciativa_titulo",
+            "iniciativa_evento_fase",
+            "iniciativa_evento_data",
+            "iniciativa_evento_id",
+            "iniciativa_url",
+            "iniciativa_obs",
+            "iniciativa_texto_subst",
+            "iniciativa_autor_grupos_parlamentares",
+            "iniciativa_autor_outros_nome",
+            "iniciativa_autor_outros_autor_comissao",
+            "iniciativa_autor_deputados_nomes",
+            "iniciativa_autor_deputados_GPs",
+        ]:
+            initiatives[column] = ""
+
+        votes = get_initiatives_votes(initiatives)
+
+        # only the voted initiatives, the same vote result in each
+        self.assertEqual(votes["iniciativa_id"].tolist(), ["1", "3", "4", "5"])
+        self.assertEqual(
+            votes[["iniciativa_votacao_ps", "iniciativa_votacao_psd"]]
+            .fillna("")
+            .values.tolist(),
+            [
+                ["afavor", "contra"],
+                ["contra", "contra"],
+                ["afavor", "contra"],
+                ["", ""],
+            ],
+        )
+        self.assertEqual(
+            votes.loc[1, "iniciativa_votacao_desc"], "Requerimento| Avocação"
+        )
+        self.assertEqual(
+            votes["iniciativa_votacao_contra_sua_iniciativa"].tolist(),
+            [True, True, False, False],
+        )
+        self.assertEqual(
+            votes["iniciativa_aprovada"].tolist(), [True, False, True, True]
+        )
@@ -0,0 +1,137 @@
+import gzip
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.common import fetch
+
+CONTENT = json.dumps({"votes": list(range(2000))}).encode()
+ETAG = '"v1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    # stand-in for the sources, failing on the first request of each path
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        Handler.requests.append((self.path, dict(self.headers)))
+        first = sum(path == self.path for path, _ in Handler.requests) == 1
+
+        if self.path == "/flaky" and first:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        # ranges are offsets in the encoded content
+        content = CONTENT
+        encoded = "gzip" in self.headers.get("Accept-Encoding", "")
+        if encoded:
+            content = gzip.compress(CONTENT)
+
+        start = 0
+        if self.headers.get("Range") and self.headers.get("If-Range") == ETAG:
+            start = int(self.headers["Range"][len("bytes=") : -1])
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header("ETag", ETAG)
+        if encoded:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(content) - start))
+        self.end_headers()
+
+        if self.path == "/interrupted" and first:
+            # the connection drops midway
+            self.wfile.write(content[: len(content) // 3])
+            self.wfile.flush()
+            self.connection.close()
+            return
+
+        self.wfile.write(content[start:])
+
+
+class TestFetch(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.requests = []
+        for patcher in [
+            patch.object(fetch, "BACKOFF", 0),
+            patch.object(fetch, "CHUNK_SIZE", 1024),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_retry(self):
+        self.assertEqual(fetch.fetch_json(f"{self.url}/flaky"), json.loads(CONTENT))
+        self.assertEqual(len(Handler.requests), 2)
+        self.assertEqual(Handler.requests[0][1]["User-Agent"], "Mozilla/5.0")
+
+    def test_resume(self):
+        with tempfile.TemporaryFile() as file:
+            response = fetch.download(f"{self.url}/interrupted", file)
+            file.seek(0)
+
+            self.assertEqual(file.read(), CONTENT)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["ETag"], ETAG)
+        self.assertEqual(len(Handler.requests), 2)
+        # resumed from what was written, not from the start
+        self.assertEqual(Handler.requests[1][1]["If-Range"], ETAG)
+        self.assertRegex(Handler.requests[1][1]["Range"], r"^bytes=[1-9]\d*-$")
+
+    def test_resume_encoded(self):
+        # servers compressing the content would resume from the decoded size
+        with tempfile.TemporaryFile() as file:
+            response = fetch.download(
+                f"{self.url}/interrupted", file, headers={"Accept-Encoding": "gzip"}
+            )
+            file.seek(0)
+
+            self.assertEqual(file.read(), CONTENT)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [headers["Accept-Encoding"] for _, headers in Handler.requests],
+            ["identity", "identity"],
+        )
+
+    def test_not_modified(self):
+        with tempfile.TemporaryFile() as file:
+            response = fetch.download(
+                f"{self.url}/file", file, headers={"If-None-Match": ETAG}
+            )
+
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(file.tell(), 0)
+
+    def test_fetch_all(self):
+        paths = ["/a", "/b", "/c", "/d", "/e"]
+
+        results = fetch.fetch_all(
+            lambda path: fetch.fetch(f"{self.url}{path}").status_code, paths
+        )
+
+        self.assertEqual(results, [200] * 5)
+        self.assertEqual(sorted(path for path, _ in Handler.requests), paths)
@@ -0,0 +1,69 @@
+from unittest import TestCase
+
+from src.parliament.initiatives.extract import (get_initiatives_followups,
+                                                get_initiatives_relations)
+from src.parliament.initiatives.graph import InitiativeGraph
+
+RAW_INITIATIVES = [
+    {
+        "IniId": "1",
+        "IniNr": "10",
+        "IniDescTipo": "Projeto de Lei",
+        "IniTitulo": "Original",
+        "IniciativasOrigem": {"id": "0", "numero": "5", "assunto": "Anterior"},
+        "IniciativasOriginadas": [{"id": "2", "numero": "20"}],
+    },
+    {
+        "IniId": "2",
+        "IniNr": "20",
+        "IniDescTipo": "Projeto de Lei",
+        "IniTitulo": "Texto de substituição",
+        "IniciativasOrigem": [{"id": "1", "numero": "10"}],
+        "IniEventos": [
+            {"IniciativasConjuntas": [{"id": "3", "nr": "30", "titulo": "Outra"}]},
+            {"IniciativasConjuntas": {"id": "4", "nr": "40"}},
+        ],
+    },
+    {
+        "IniId": "3",
+        "IniNr": "30",
+        "IniDescTipo": "Projeto de Resolução",
+        "IniTitulo": "Outra",
+        "IniciativasOriginadas": {"id": "5", "numero": "50"},
+    },
+]
+
+
+class TestInitiativeGraph(TestCase):
+    def test_followups(self):
+        followups = get_initiatives_followups(RAW_INITIATIVES)
+
+        self.assertEqual(
+            followups[["iniciativa_id", "iniciativa_followup_id"]].values.tolist(),
+            [["1", "2"], ["3", "5"]],
+        )
+
+    def test_traversal(self):
+        graph = InitiativeGraph.from_relations(
+            *get_initiatives_relations(RAW_INITIATIVES)
+        )
+        # stored and loaded again
+        graph = InitiativeGraph.from_dict(graph.to_dict())
+
+        self.assertEqual(
+            [(x["iniciativa_id"], x["distancia"]) for x in graph.ancestors("2")],
+            [("1", 1), ("0", 2)],
+        )
+        self.assertEqual(graph.ancestors("2")[1]["iniciativa_titulo"], "Anterior")
+        self.assertEqual(
+            [(x["iniciativa_id"], x["distancia"]) for x in graph.descendants("0")],
+            [("1", 1), ("2", 2)],
+        )
+        self.assertEqual(graph.descendants("2"), [])
+        self.assertEqual(
+            [x["iniciativa_id"] for x in graph.joint_initiatives("2")], ["3", "4"]
+        )
+        self.assertEqual(
+            [x["iniciativa_id"] for x in graph.joint_initiatives("3")], ["2"]
+        )
+        self.assertNotIn("6", graph)
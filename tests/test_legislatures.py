@@ -0,0 +1,142 @@
+from datetime import date
+from unittest import TestCase
+
+from src.parliament.legislatures.extract import (_get_legislatures_fields,
+                                                 get_legislature_intervals,
+                                                 normalize)
+from src.parliament.legislatures.intervals import LegislatureIntervals
+
+
+def _deputy(dep_id, name, situations, groups):
+    return {
+        "depId": dep_id,
+        "depNomeParlamentar": name,
+        "depSituacao": {
+            "pt_ar_wsgode_objectos_DadosSituacaoDeputado": [
+                {"sioDes": des, "sioDtInicio": start, "sioDtFim": end}
+                for des, start, end in situations
+            ]
+        },
+        "depGP": {
+            "pt_ar_wsgode_objectos_DadosSituacaoGP": [
+                {"gpSigla": party, "gpDtInicio": start, "gpDtFim": end}
+                for party, start, end in groups
+            ]
+        },
+    }
+
+
+def _role(deputy, roles):
+    return {
+        **deputy,
+        "depCargo": {
+            "pt_ar_wsgode_objectos_DadosCargoDeputado": [
+                {"carDes": des, "carDtInicio": start, "carDtFim": end}
+                for des, start, end in roles
+            ]
+        },
+    }
+
+
+ANA = _deputy(
+    "1", "Ana", [("Efetivo", "2022-03-29", None)], [("PS", "2022-03-29", None)]
+)
+RUI = _deputy(
+    "2",
+    "Rui",
+    [("Efetivo", "2022-03-29", "2023-01-09"), ("Suspenso(Eleito)", "2023-01-10", None)],
+    [("PSD", "2022-03-29", None)],
+)
+EVA = _deputy(
+    "3",
+    "Eva",
+    [("Efetivo Temporário", "2023-01-10", None)],
+    [("PSD", "2023-01-10", "2023-06-30"), ("Ninsc", "2023-07-01", None)],
+)
+
+RAW_DATA = {
+    "MesaAR": {
+        "DetalheOrgao": {"legDes": "XV"},
+        "HistoricoComposicao": {
+            "pt_ar_wsgode_objectos_DadosMesaComposicaoHistorico": [
+                _role(RUI, [("Presidente", "2022-03-29", "2023-01-09")]),
+                _role(ANA, [("Presidente", "2023-01-10", None)]),
+                _role(EVA, [("Vice-Presidente", "2023-01-10", None)]),
+            ]
+        },
+    },
+    "Plenario": {
+        "Composicao": {"pt_ar_wsgode_objectos_DadosDeputadoSearch": [ANA, RUI, EVA]}
+    },
+    "ConferenciaLideres": {
+        "HistoricoComposicao": {
+            "pt_ar_wsgode_objectos_DadosOrgaoComposicaoHistorico": [
+                _role(ANA, [("Líder de Grupo Parlamentar", "2022-03-29", None)]),
+            ]
+        }
+    },
+}
+
+DATA = normalize(RAW_DATA)
+
+
+def _since_xv(x):
+    """
+    Same data in the format used since XV, lists not wrapped and the fields of
+    the deputies capitalized
+    """
+
+    if isinstance(x, list):
+        return [_since_xv(v) for v in x]
+    if not isinstance(x, dict):
+        return x
+    if len(x) == 1 and next(iter(x)).startswith("pt_"):
+        return _since_xv(next(iter(x.values())))
+    return {
+        (
+            k[0].upper() + k[1:]
+            if k[:3] in ("dep", "sio", "car", "leg") or k[:2] == "gp"
+            else k
+        ): _since_xv(v)
+        for k, v in x.items()
+    }
+
+
+class TestLegislatureIntervals(TestCase):
+    def test_as_of(self):
+        intervals = LegislatureIntervals(get_legislature_intervals(DATA), "XV")
+        # stored and loaded again
+        intervals = LegislatureIntervals.from_dict(intervals.to_dict())
+
+        # the most recent composition is the current one
+        self.assertEqual(
+            intervals.fields(date(2024, 1, 1)), _get_legislatures_fields(DATA)
+        )
+
+        fields = intervals.fields(date(2022, 6, 1))
+        self.assertEqual(fields["presidente"], {"nome": "Rui", "dep_id": "2"})
+        self.assertEqual(fields["vice_presidentes"], [])
+        self.assertEqual(
+            [(p["nome"], p["nr_deputados"]) for p in fields["partidos"]],
+            [("PS", 1), ("PSD", 1)],
+        )
+        self.assertEqual(fields["partidos"][0]["lider_de_bancada"], "Ana")
+
+        fields = intervals.fields(date(2023, 3, 1))
+        self.assertEqual(fields["presidente"]["nome"], "Ana")
+        self.assertEqual(fields["deputados_nao_inscritos"], [])
+        self.assertEqual(fields["partidos"][1]["nr_deputados"], 1)
+
+        self.assertEqual(
+            intervals.fields(date(2023, 7, 1))["deputados_nao_inscritos"], ["Eva"]
+        )
+        self.assertIsNone(intervals.fields(date(2020, 1, 1))["presidente"])
+
+    def test_format_since_xv(self):
+        data = normalize(_since_xv(RAW_DATA))
+
+        self.assertEqual(_get_legislatures_fields(data), _get_legislatures_fields(DATA))
+        self.assertEqual(
+            get_legislature_intervals(data).to_dict(),
+            get_legislature_intervals(DATA).to_dict(),
+        )
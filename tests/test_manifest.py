@@ -0,0 +1,191 @@
+import datetime
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (ResourceExistsError, ResourceModifiedError,
+                                   ResourceNotFoundError)
+
+from src.common import manifest
+from src.common.manifest import MANIFEST_BLOB, Publication, read_manifest
+from src.common.storage import read_blob, upload_json
+from tests.test_storage import FakeBlobClient
+
+
+class FakeStoredBlobClient(FakeBlobClient):
+    # ETag of each committed version
+    version = 0
+
+    def download_blob(self, decompress=True):
+        if self.committed is None:
+            raise ResourceNotFoundError()
+        downloader = super().download_blob(decompress)
+        downloader.properties = type("BlobProperties", (), {"etag": str(self.version)})
+        return downloader
+
+    def commit_block_list(self, block_list, **kwargs):
+        match_condition = kwargs.get("match_condition")
+        if match_condition == MatchConditions.IfMissing and self.committed is not None:
+            raise ResourceExistsError()
+        if match_condition == MatchConditions.IfNotModified and kwargs["etag"] != str(
+            self.version
+        ):
+            raise ResourceModifiedError()
+
+        super().commit_block_list(block_list, **kwargs)
+        self.version += 1
+
+    def exists(self):
+        return self.committed is not None
+
+
+class FakeContainerClient:
+    def __init__(self):
+        self.blobs = {}
+
+    def get_blob_client(self, blob):
+        return self.blobs.setdefault(blob, FakeStoredBlobClient())
+
+    def list_blobs(self, name_starts_with=""):
+        return [
+            type("BlobProperties", (), {"name": name})()
+            for name, blob_client in list(self.blobs.items())
+            if name.startswith(name_starts_with) and blob_client.committed is not None
+        ]
+
+    def delete_blob(self, blob):
+        del self.blobs[blob]
+
+
+def _publish(container_client, sha256, content):
+    publication = Publication(container_client, "XV", "initiatives", sha256)
+    upload_json(publication.get_blob_client("XV_initiatives_votes.json"), content)
+    publication.publish()
+    return publication
+
+
+def _read(container_client):
+    manifest = read_manifest(container_client)
+    blob_client = manifest.container(container_client, "XV").get_blob_client(
+        "XV_initiatives_votes.json"
+    )
+    return json.loads(read_blob(blob_client))
+
+
+class TestManifest(TestCase):
+    def test_empty(self):
+        container_client = FakeContainerClient()
+        upload_json(
+            container_client.get_blob_client("XV_initiatives_votes.json"), {"v": 0}
+        )
+
+        manifest = read_manifest(container_client)
+
+        self.assertIsNone(manifest.content_hash("XV"))
+        # blobs stored before versions were used keep their name
+        self.assertEqual(_read(container_client), {"v": 0})
+
+    def test_publish(self):
+        container_client = FakeContainerClient()
+        publication = Publication(container_client, "XV", "initiatives", "1" * 64)
+        upload_json(publication.get_blob_client("XV_initiatives_votes.json"), {"v": 1})
+
+        # not used until published
+        self.assertIsNone(read_manifest(container_client).content_hash("XV"))
+
+        publication.publish()
+        manifest = read_manifest(container_client)
+
+        self.assertEqual(manifest.sha256("XV", "initiatives"), "1" * 64)
+        self.assertIsNotNone(manifest.content_hash("XV"))
+        self.assertIsNone(manifest.content_hash("XIV"))
+        self.assertEqual(_read(container_client), {"v": 1})
+
+    def test_content_hash(self):
+        container_client = FakeContainerClient()
+
+        _publish(container_client, "1" * 64, {"v": 1})
+        first = read_manifest(container_client).content_hash("XV")
+        _publish(container_client, "2" * 64, {"v": 2})
+        second = read_manifest(container_client).content_hash("XV")
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(_read(container_client), {"v": 2})
+
+    def test_delete_versions(self):
+        container_client = FakeContainerClient()
+
+        with patch.object(manifest, "VERSION_GRACE", datetime.timedelta(0)):
+            first = _publish(container_client, "1" * 64, {"v": 1})
+            second = _publish(container_client, "2" * 64, {"v": 2})
+            third = _publish(container_client, "3" * 64, {"v": 3})
+
+        names = set(container_client.blobs)
+
+        # the previous version may still be in use
+        self.assertNotIn(first.prefix + "XV_initiatives_votes.json", names)
+        self.assertIn(second.prefix + "XV_initiatives_votes.json", names)
+        self.assertIn(third.prefix + "XV_initiatives_votes.json", names)
+        self.assertIn(MANIFEST_BLOB, names)
+
+    def test_version_grace(self):
+        container_client = FakeContainerClient()
+
+        versions = [
+            _publish(container_client, str(i) * 64, {"v": i}) for i in range(1, 5)
+        ]
+
+        # replaced recently, the API may have loaded one of them meanwhile
+        for version in versions:
+            self.assertIn(
+                version.prefix + "XV_initiatives_votes.json", container_client.blobs
+            )
+
+    def test_publish_conflict(self):
+        container_client = FakeContainerClient()
+        _publish(container_client, "1" * 64, {"v": 1})
+        read = manifest.read_manifest
+
+        def read_manifest(container_client):
+            current = read(container_client)
+            if read_manifest.first:
+                # another process publishes the composition between the read
+                # and the write of the manifest
+                read_manifest.first = False
+                other = read(container_client)
+                other.legislatures["XV"]["composition"] = {
+                    "prefix": "XV/composition/20230101T000000-22222222/",
+                    "blobs": [],
+                    "sha256": "2" * 64,
+                }
+                upload_json(
+                    container_client.get_blob_client(MANIFEST_BLOB), other.to_dict()
+                )
+            return current
+
+        read_manifest.first = True
+        with patch.object(manifest, "read_manifest", read_manifest):
+            _publish(container_client, "3" * 64, {"v": 3})
+
+        current = read(container_client)
+        self.assertEqual(current.sha256("XV", "composition"), "2" * 64)
+        self.assertEqual(current.sha256("XV", "initiatives"), "3" * 64)
+        self.assertEqual(_read(container_client), {"v": 3})
+
+    def test_publish_first(self):
+        container_client = FakeContainerClient()
+        manifest_blob = container_client.get_blob_client(MANIFEST_BLOB)
+
+        _publish(container_client, "1" * 64, {"v": 1})
+
+        # only created when there was none
+        self.assertEqual(
+            manifest_blob.conditions, {"match_condition": MatchConditions.IfMissing}
+        )
+
+        _publish(container_client, "2" * 64, {"v": 2})
+        self.assertEqual(
+            manifest_blob.conditions,
+            {"etag": "1", "match_condition": MatchConditions.IfNotModified},
+        )
@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from src.common.metrics import Registry, StageReport
+
+
+class TestMetrics(TestCase):
+    def test_histogram_render(self):
+        registry = Registry()
+        histogram = registry.histogram("latency", "help", ["endpoint"], [0.1, 1])
+        histogram.observe(0.05, endpoint="/a")
+        histogram.observe(0.5, endpoint="/a")
+
+        lines = registry.render().splitlines()
+
+        self.assertIn("# TYPE latency histogram", lines)
+        self.assertIn('latency_bucket{endpoint="/a",le="0.1"} 1', lines)
+        self.assertIn('latency_bucket{endpoint="/a",le="1.0"} 2', lines)
+        self.assertIn('latency_bucket{endpoint="/a",le="+Inf"} 2', lines)
+        self.assertIn('latency_count{endpoint="/a"} 2', lines)
+
+    def test_counter_labels(self):
+        registry = Registry()
+        counter = registry.counter("hits", "help", ["result"])
+        counter.inc(result="hit")
+        counter.inc(result="hit")
+
+        self.assertIn('hits{result="hit"} 2.0', registry.render().splitlines())
+        with self.assertRaises(ValueError):
+            counter.inc(other="x")
+
+    def test_stage_report(self):
+        report = StageReport("run")
+        with report.stage("download", legislature="XV"):
+            pass
+        with self.assertRaises(KeyError):
+            with report.stage("parse", legislature="XV"):
+                raise KeyError()
+
+        stages = report.to_dict()["stages"]
+
+        self.assertEqual([s["stage"] for s in stages], ["download", "parse"])
+        self.assertEqual([s["status"] for s in stages], ["ok", "error"])
+        self.assertEqual(stages[0]["legislature"], "XV")
@@ -0,0 +1,91 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from src.parliament.initiatives.extract import (_split_vote_result,
+                                                get_non_registered_deputies)
+from src.parliament.parties import DEFAULT_REGISTRY, PartyRegistry
+
+
+class TestPartyRegistry(TestCase):
+    def test_known_parties_and_deputies(self):
+        self.assertEqual(DEFAULT_REGISTRY.code("cds-pp"), "cds-pp")
+        self.assertEqual(DEFAULT_REGISTRY.code("cristinarodrigues(ninsc)"), "cr")
+        self.assertEqual(DEFAULT_REGISTRY.code("miguelarruda(ninsc)"), "mar")
+        self.assertIsNone(DEFAULT_REGISTRY.code("3-ps"))
+
+        self.assertEqual(DEFAULT_REGISTRY.party_id("Joacine Katar Moreira"), "jkm")
+        self.assertEqual(DEFAULT_REGISTRY.party_id("CDS-PP"), "cds-pp")
+        self.assertEqual(DEFAULT_REGISTRY.party_id("Os Verdes"), "os-verdes")
+
+    def test_from_legislature_fields(self):
+        registry = PartyRegistry.from_legislature_fields(
+            {
+                "partidos": [{"nome": "PS"}, {"nome": "JPP"}],
+                "deputados_nao_inscritos": ["Maria da Silva Costa"],
+            }
+        )
+
+        self.assertEqual(registry.code("jpp"), "jpp")
+        self.assertEqual(registry.code("mariadasilvacosta(ninsc)"), "mariadasilvacosta")
+        self.assertEqual(registry.party_id("Maria da Silva Costa"), "mariadasilvacosta")
+        self.assertEqual(registry.name("mariadasilvacosta"), "Maria da Silva Costa")
+        self.assertIn("iniciativa_votacao_mariadasilvacosta", registry.column_index)
+        self.assertNotEqual(registry.fingerprint, DEFAULT_REGISTRY.fingerprint)
+
+        res = _split_vote_result(
+            "A Favor: PS, JPP, Maria da Silva Costa (Ninsc)<BR>Contra: CH", registry
+        )
+        self.assertDictEqual(
+            res, {"afavor": ["ps", "jpp", "mariadasilvacosta"], "contra": ["ch"]}
+        )
+
+    def test_deputy_codes_stable(self):
+        registry = PartyRegistry.build(deputies=["Maria Sá Costa"])
+        # same initials, found before it
+        joined = PartyRegistry.build(deputies=["Manuel Silva Cruz", "Maria Sá Costa"])
+
+        self.assertEqual(joined.party_id("Maria Sá Costa"), "mariasácosta")
+        self.assertEqual(joined.party_id("Manuel Silva Cruz"), "manuelsilvacruz")
+        # the codes of the deputies already there do not change
+        self.assertLessEqual(
+            registry.token_to_code.items(), joined.token_to_code.items()
+        )
+        # also when only known as written in the vote results
+        self.assertEqual(
+            PartyRegistry.build(deputies=["mariasácosta"]).code("mariasácosta(ninsc)"),
+            "mariasácosta",
+        )
+
+    def test_party_id_case(self):
+        # authors are not always written with the same case
+        self.assertEqual(DEFAULT_REGISTRY.party_id("CRISTINA RODRIGUES"), "cr")
+        self.assertEqual(DEFAULT_REGISTRY.party_id("joacine katar moreira"), "jkm")
+        self.assertEqual(DEFAULT_REGISTRY.deputies["cr"], "Cristina Rodrigues")
+
+    def test_deputies_from_initiatives(self):
+        initiatives = pd.DataFrame(
+            {
+                "iniciativa_autor_deputados_nomes": ["Ana Sofia Reis|Rui Costa", ""],
+                "iniciativa_autor_deputados_GPs": ["Ninsc|PS", ""],
+                "iniciativa_votacao_detalhe": [
+                    "A Favor: PS, Ana Sofia Reis (Ninsc)",
+                    "A Favor: PS<BR>Contra: João Silva (Ninsc), CH",
+                ],
+            }
+        )
+
+        deputies = get_non_registered_deputies(initiatives)
+        self.assertEqual(deputies, ["Ana Sofia Reis", "joãosilva"])
+
+        # no code change needed for new deputies, and the API uses the same
+        # registry as the one used to process the votes
+        registry = PartyRegistry.from_dict(
+            PartyRegistry.from_legislature_fields({}, deputies).to_dict()
+        )
+        res = _split_vote_result(
+            "A Favor: Ana Sofia Reis (Ninsc)<BR>Contra: João Silva (Ninsc)", registry
+        )
+        self.assertDictEqual(res, {"afavor": ["anasofiareis"], "contra": ["joãosilva"]})
+        self.assertEqual(registry.party_id("Ana Sofia Reis"), "anasofiareis")
+        self.assertEqual(registry.name("joãosilva"), "joãosilva")
@@ -0,0 +1,178 @@
+import asyncio
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from src.app import profiling
+from src.app.profiling import (ProfiledRequest, ProfilingConfig,
+                               SamplingProfiler, write_dump)
+
+
+def _request(headers=None) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/parliament/party-approvals",
+            "query_string": b"legislature=XV",
+            "headers": [
+                (key.lower().encode(), value.encode())
+                for key, value in (headers or {}).items()
+            ],
+        }
+    )
+
+
+def _profiled_request(forced=False) -> ProfiledRequest:
+    return ProfiledRequest(
+        method="GET",
+        path="/parliament/party-approvals",
+        query_params={"legislature": "XV"},
+        forced=forced,
+    )
+
+
+class TestProfiling(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _config(self, **kwargs) -> ProfilingConfig:
+        return ProfilingConfig(
+            **{
+                "enabled": True,
+                "sample_rate": 0,
+                "directory": self.directory.name,
+                "admin_token": "secret",
+                **kwargs,
+            }
+        )
+
+    def _middleware(self, config: ProfilingConfig, headers=None):
+        """Profiled request seen by the endpoint, and the response"""
+
+        selected = []
+
+        async def call_next(request):
+            selected.append(profiling._profiled_request.get())
+            return Response()
+
+        with mock.patch.object(profiling, "config", config):
+            response = asyncio.run(profiling.middleware(_request(headers), call_next))
+
+        return selected[0], response
+
+    def test_from_env(self):
+        with mock.patch.dict(
+            os.environ,
+            {"PROFILING_ENABLED": "true", "PROFILING_MAX_SAMPLES": "100"},
+        ):
+            config = ProfilingConfig.from_env()
+
+        self.assertTrue(config.enabled)
+        self.assertEqual(config.max_samples, 100)
+        self.assertEqual(config.max_files, ProfilingConfig.max_files)
+
+    def test_admin_header(self):
+        selected, _ = self._middleware(self._config())
+        self.assertIsNone(selected)
+
+        selected, _ = self._middleware(self._config(), {"X-Profile": "wrong"})
+        self.assertIsNone(selected)
+
+        # without a token the header is ignored
+        selected, _ = self._middleware(
+            self._config(admin_token=None), {"X-Profile": "secret"}
+        )
+        self.assertIsNone(selected)
+
+        selected, _ = self._middleware(self._config(), {"X-Profile": "secret"})
+        self.assertTrue(selected.forced)
+        self.assertEqual(
+            selected.name, "GET /parliament/party-approvals?legislature=XV"
+        )
+
+        selected, _ = self._middleware(self._config(sample_rate=1))
+        self.assertFalse(selected.forced)
+
+        # disabled
+        selected, _ = self._middleware(
+            self._config(enabled=False), {"X-Profile": "secret"}
+        )
+        self.assertIsNone(selected)
+
+    def test_is_admin(self):
+        with mock.patch.object(profiling, "config", self._config()):
+            self.assertTrue(profiling.is_admin(_request({"X-Admin-Token": "secret"})))
+            self.assertTrue(
+                profiling.is_admin(_request({"Authorization": "Bearer secret"}))
+            )
+            self.assertFalse(profiling.is_admin(_request({"X-Admin-Token": "wrong"})))
+            self.assertFalse(profiling.is_admin(_request({"X-Profile": "secret"})))
+            self.assertFalse(profiling.is_admin(_request()))
+
+        # closed without a token
+        with mock.patch.object(profiling, "config", self._config(admin_token=None)):
+            self.assertFalse(profiling.is_admin(_request({"X-Admin-Token": ""})))
+
+    def _run_profiled(self, config: ProfilingConfig, profiled_request):
+        @profiling.profiled
+        def endpoint(x):
+            return x + 1
+
+        token = profiling._profiled_request.set(profiled_request)
+        try:
+            with mock.patch.object(profiling, "config", config):
+                self.assertEqual(endpoint(1), 2)
+        finally:
+            profiling._profiled_request.reset(token)
+
+    def test_threshold(self):
+        # not selected
+        self._run_profiled(self._config(threshold_ms=0), None)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+        # faster than the threshold
+        fast = _profiled_request()
+        self._run_profiled(self._config(threshold_ms=60_000), fast)
+        self.assertIsNone(fast.dump_path)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+        slow = _profiled_request()
+        self._run_profiled(self._config(threshold_ms=0), slow)
+        self.assertTrue(os.path.exists(slow.dump_path))
+
+        # forced requests are always dumped
+        forced = _profiled_request(forced=True)
+        self._run_profiled(self._config(threshold_ms=60_000), forced)
+        self.assertTrue(os.path.exists(forced.dump_path))
+
+    def test_max_files(self):
+        config = self._config(max_files=2)
+        profiler = SamplingProfiler(0, config.interval_ms, config.max_samples)
+        profiler.stacks["endpoint (main.py:1)"] = 3
+
+        paths = []
+        for i in range(3):
+            path = write_dump(profiler, _profiled_request(), 10, config)
+            # older dumps first, regardless of the file system time resolution
+            os.utime(path, (i, i))
+            paths.append(path)
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory.name)),
+            sorted(
+                os.path.basename(path[: -len(".folded")] + extension)
+                for path in paths[1:]
+                for extension in (".folded", ".json")
+            ),
+        )
+        with open(paths[-1]) as f:
+            self.assertEqual(
+                f.read(),
+                "GET /parliament/party-approvals?legislature=XV;"
+                "endpoint (main.py:1) 3\n",
+            )
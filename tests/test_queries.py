@@ -0,0 +1,121 @@
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+
+from src.app import queries
+from src.app.apis import schemas
+from src.app.responses import precompress
+from src.app.store import LegislatureSnapshot
+from src.parliament.initiatives import votes
+
+
+def _snapshot() -> LegislatureSnapshot:
+    initiative_votes = pd.DataFrame(
+        {
+            "iniciativa_id": ["1", "2", "3"],
+            "iniciativa_evento_fase": ["Votação na generalidade"] * 3,
+            "iniciativa_evento_data": pd.to_datetime(
+                ["2023-01-01", "2023-02-01", "2023-03-01"]
+            ),
+            "iniciativa_titulo": ["Saúde", "Habitação", "Saúde mental"],
+            "iniciativa_url": ["http://a"] * 3,
+            "iniciativa_autor": ["PS", "CH", "PS"],
+            "iniciativa_autor_deputado": ["", "", ""],
+            "iniciativa_autor_deputados_nomes": ["", "", ""],
+            "iniciativa_tipo": ["Projeto de Lei"] * 3,
+            "iniciativa_votacao_res": ["Aprovado", "Rejeitado", "Aprovado"],
+            "iniciativa_votacao_unanime": ["", "", ""],
+            "iniciativa_aprovada": [True, False, True],
+            "iniciativa_votacao_ps": ["afavor", "contra", "afavor"],
+            "iniciativa_votacao_ch": ["contra", "afavor", "afavor"],
+        }
+    )
+    phase = schemas.EventPhase.GENERALIDADE.value
+    return LegislatureSnapshot(
+        party_approvals={phase: votes.get_party_approvals(initiative_votes)},
+        party_correlations={phase: votes.get_party_correlations(initiative_votes)},
+        initiative_votes=initiative_votes,
+        legislature_fields={"partidos": [{"nome": "PS"}, {"nome": "CH"}]},
+        party_approvals_responses={phase: precompress(b'{"autores":[]}')},
+    )
+
+
+class TestBatch(TestCase):
+    def test_shared_filters(self):
+        snapshot = _snapshot()
+        batch = [
+            schemas.BatchQuery(statistic="party-approvals", name_filter="saúde"),
+            schemas.BatchQuery(statistic="party-correlations", name_filter="saúde"),
+            schemas.BatchQuery(statistic="initiatives", name_filter="saúde", limit=1),
+            schemas.BatchQuery(statistic="initiatives", party="ch"),
+            # from the snapshot, without filtering
+            schemas.BatchQuery(statistic="party-approvals"),
+        ]
+
+        with patch.object(
+            queries, "filter_initiative_votes", wraps=queries.filter_initiative_votes
+        ) as filter_initiative_votes:
+            results = json.loads(queries.run_batch({"XV": snapshot}, batch))[
+                "resultados"
+            ]
+
+        self.assertEqual(filter_initiative_votes.call_count, 2)
+
+        saude = queries.filter_initiative_votes(
+            snapshot.initiative_votes,
+            schemas.EventPhase.GENERALIDADE,
+            name_filter="saúde",
+        )
+        self.assertEqual(list(saude["iniciativa_id"]), ["1", "3"])
+        self.assertEqual(
+            results[0],
+            json.loads(
+                queries.party_approvals(
+                    snapshot, schemas.EventPhase.GENERALIDADE, saude
+                ).content
+            ),
+        )
+        self.assertEqual(
+            results[1]["partido"][0],
+            {"nome": "ch", "correlacoes": {"ch": 1.0, "ps": 0.5}},
+        )
+        self.assertEqual(
+            [i["iniciativa_titulo"] for i in results[2]["initiativas"]], ["Saúde"]
+        )
+        self.assertEqual(
+            [i["iniciativa_titulo"] for i in results[3]["initiativas"]], ["Habitação"]
+        )
+        self.assertEqual(results[4], {"autores": []})
+
+
+class TestExport(TestCase):
+    def test_chunks(self):
+        initiative_votes = _snapshot().initiative_votes
+
+        chunks = list(
+            queries.export_initiative_votes(
+                initiative_votes,
+                schemas.ExportFormat.NDJSON,
+                chunk_size=2,
+                event_phase=schemas.EventPhase.ALL,
+                name_filter="saúde",
+            )
+        )
+        rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual([row["iniciativa_id"] for row in rows], ["1", "3"])
+        self.assertEqual(rows[1]["iniciativa_titulo"], "Saúde mental")
+
+        csv = b"".join(
+            queries.export_initiative_votes(
+                initiative_votes,
+                schemas.ExportFormat.CSV,
+                chunk_size=2,
+                event_phase=schemas.EventPhase.ALL,
+            )
+        )
+        expected = initiative_votes.to_csv(index=False, date_format="%Y-%m-%d")
+        self.assertEqual(csv.decode("utf-8"), expected)
@@ -0,0 +1,45 @@
+import gzip
+from unittest import TestCase
+
+from starlette.requests import Request
+
+from src.app.responses import dump_json, encoded_response, precompress
+
+
+def _request(accept_encoding: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [(b"accept-encoding", accept_encoding.encode())],
+        }
+    )
+
+
+class TestEncodedResponse(TestCase):
+    def test_negotiation(self):
+        content = dump_json({"autores": [{"id": "ps", "nome": "PS"}] * 50})
+        payload = precompress(content)
+
+        response = encoded_response(_request("gzip, deflate"), payload)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.body), content)
+
+        response = encoded_response(_request("gzip;q=0, identity"), payload)
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.body, content)
+
+        response = encoded_response(_request(""), payload)
+        self.assertEqual(response.body, content)
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+
+        # only gzip is compressed ahead
+        response = encoded_response(_request("br"), payload)
+        self.assertNotIn("content-encoding", response.headers)
+        response = encoded_response(_request("br, *;q=0.5"), payload)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+
+    def test_small(self):
+        payload = precompress(b"{}")
+
+        self.assertIsNone(payload.gzip)
+        self.assertEqual(encoded_response(_request("gzip"), payload).body, b"{}")
@@ -0,0 +1,94 @@
+from datetime import date
+from unittest import TestCase
+
+import pandas as pd
+
+from src.parliament.initiatives.series import (MAX_POINTS, TooManyPoints,
+                                               VoteSeries)
+from src.parliament.initiatives.votes import get_party_correlations
+
+
+def _votes() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "iniciativa_evento_data": pd.to_datetime(
+                ["2023-01-05", "2023-01-02", "2023-01-09", "2023-01-10", "2023-01-20"]
+            ),
+            "iniciativa_aprovada": [True, False, True, True, False],
+            "iniciativa_votacao_unanime": ["", "", "", "unanime", ""],
+            "iniciativa_votacao_ps": ["afavor", "contra", "ausência", None, "afavor"],
+            "iniciativa_votacao_psd": ["afavor", "afavor", "contra", None, "contra"],
+            "iniciativa_votacao_ch": ["contra", "contra", "contra", None, ""],
+        }
+    )
+
+
+class TestVoteSeries(TestCase):
+    def test_matches_correlations(self):
+        votes = _votes()
+        series = VoteSeries.from_votes(votes).get(
+            window=7, step=3, dt_ini=date(2023, 1, 3), dt_fin=date(2023, 1, 21)
+        )
+
+        self.assertEqual(
+            series["datas"],
+            [
+                "2023-01-03",
+                "2023-01-06",
+                "2023-01-09",
+                "2023-01-12",
+                "2023-01-15",
+                "2023-01-18",
+                "2023-01-21",
+            ],
+        )
+        self.assertEqual(series["votacoes"], [1, 2, 2, 2, 2, 0, 1])
+
+        for i, point in enumerate(series["datas"]):
+            end = pd.Timestamp(point)
+            window = votes[
+                (votes["iniciativa_evento_data"] > end - pd.Timedelta(days=7))
+                & (votes["iniciativa_evento_data"] <= end)
+            ]
+            if window.empty:
+                self.assertIsNone(series["aprovacao"][i])
+                continue
+
+            self.assertEqual(
+                series["aprovacao"][i], window["iniciativa_aprovada"].mean()
+            )
+            corr = get_party_correlations(window).set_index("nome")
+            for a, b in [("ch", "ps"), ("ch", "psd"), ("ps", "psd")]:
+                agreement = series["partidos"][a]["concordancia"][b][i]
+                expected = corr.loc[
+                    f"iniciativa_votacao_{a}", f"iniciativa_votacao_{b}"
+                ]
+                # no vote from both is 0 in the correlations
+                self.assertEqual(agreement or 0, expected)
+
+    def test_in_favor(self):
+        series = VoteSeries.from_votes(_votes()).get(window=30, step=30)
+
+        self.assertEqual(series["datas"], ["2023-01-20"])
+        # unanimous votes are in favor
+        self.assertEqual(series["partidos"]["psd"]["afavor"], [0.6])
+        self.assertEqual(series["partidos"]["ch"]["afavor"], [0.2])
+        self.assertEqual(
+            VoteSeries.from_votes(_votes().iloc[:0]).get(7, 7)["datas"], []
+        )
+
+    def test_clamped(self):
+        series = VoteSeries.from_votes(_votes())
+
+        # only the dates with votes in their window
+        clamped = series.get(
+            window=7, step=1, dt_ini=date(1, 1, 1), dt_fin=date(9999, 1, 1)
+        )
+        self.assertEqual(clamped["datas"][0], "2023-01-02")
+        self.assertEqual(clamped["datas"][-1], "2023-01-26")
+        self.assertEqual(
+            series.get(window=7, step=1, dt_ini=date(2024, 1, 1))["datas"], []
+        )
+
+        with self.assertRaises(TooManyPoints):
+            series.get(window=MAX_POINTS * 2, step=1, dt_fin=date(2040, 1, 1))
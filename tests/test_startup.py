@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+# seconds to import a module in a new process, the workers are not ready
+# before it (includes pandas and fastapi, the slowest dependencies)
+IMPORT_BUDGET = 2.0
+
+IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import {module} as module
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "modules": sorted(sys.modules),
+    "connected": getattr(module, "blob_storage_container_client", None) is not None,
+}}))
+"""
+
+
+def _import(module: str) -> dict:
+    """
+    Import a module in a new process, without access to Blob Storage
+    """
+
+    env = {
+        k: v
+        for k, v in os.environ.items()
+        if k not in ("AZURE_STORAGE_CONNECTION_STRING", "AZURE_STORAGE_CONTAINER")
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT.format(module=module)],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+        timeout=60,
+    )
+
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+class TestStartup(TestCase):
+    def test_app(self):
+        result = _import("src.app.main")
+
+        self.assertFalse(result["connected"])
+        # only needed to run it directly, or to write blobs
+        self.assertNotIn("uvicorn", result["modules"])
+        self.assertNotIn("azure.storage.blob", result["modules"])
+        self.assertLess(result["seconds"], IMPORT_BUDGET)
+
+    def test_daily_updater(self):
+        # returns instead of running the scheduler
+        result = _import("src.daily_updater.main")
+
+        self.assertLess(result["seconds"], IMPORT_BUDGET)
@@ -0,0 +1,115 @@
+import gzip
+import json
+import threading
+from unittest import TestCase
+
+import pandas as pd
+
+from src.common import storage
+from src.common.storage import (BlockBlobWriter, read_blob, upload_dataframe,
+                                upload_json)
+
+
+class FakeBlobClient:
+    def __init__(self):
+        self.blocks = {}
+        self.committed = None
+        self.metadata = None
+        self._lock = threading.Lock()
+
+    def stage_block(self, block_id, data):
+        with self._lock:
+            self.blocks[block_id] = data
+
+    def commit_block_list(
+        self, block_list, content_settings=None, metadata=None, **conditions
+    ):
+        self.committed = b"".join(self.blocks[b.id] for b in block_list)
+        self.content_settings = content_settings
+        self.metadata = metadata
+        self.conditions = conditions
+
+    def download_blob(self, decompress=True):
+        # served in small chunks, as Azure would for a large blob
+        blob = self.committed
+        downloader = type("Downloader", (), {})()
+        downloader.chunks = lambda: (blob[i : i + 7] for i in range(0, len(blob), 7))
+        return downloader
+
+
+class TestStorage(TestCase):
+    def test_block_blob_writer(self):
+        blob_client = FakeBlobClient()
+
+        with BlockBlobWriter(
+            blob_client,
+            metadata={"a": "b"},
+            block_size=10,
+            max_concurrency=2,
+            compress=False,
+        ) as writer:
+            for i in range(100):
+                writer.write(f"{i},")
+
+        self.assertEqual(
+            blob_client.committed, "".join(f"{i}," for i in range(100)).encode()
+        )
+        self.assertEqual(len(blob_client.blocks), 29)
+        self.assertEqual(blob_client.metadata, {"a": "b"})
+
+    def test_error_does_not_commit(self):
+        blob_client = FakeBlobClient()
+
+        with self.assertRaises(ValueError):
+            with BlockBlobWriter(blob_client, block_size=10) as writer:
+                writer.write("x" * 100)
+                raise ValueError()
+
+        self.assertIsNone(blob_client.committed)
+
+    def test_upload_json(self):
+        blob_client = FakeBlobClient()
+        obj = {"partidos": [{"nome": "PS", "sigla": "PS"}], "nr": 1.5, "ok": None}
+
+        upload_json(blob_client, obj)
+
+        self.assertEqual(read_blob(blob_client).decode(), json.dumps(obj))
+        self.assertEqual(blob_client.content_settings.content_encoding, "gzip")
+
+    def test_upload_dataframe(self):
+        df = pd.DataFrame(
+            {
+                "iniciativa_titulo": [f"Projeto de lei {i}" for i in range(25)],
+                "iniciativa_evento_data": pd.date_range("2023-01-01", periods=25),
+                "iniciativa_aprovada": [i % 2 == 0 for i in range(25)],
+            }
+        )
+
+        original = storage.ROWS_PER_CHUNK
+        storage.ROWS_PER_CHUNK = 10
+        try:
+            for orient in ("index", "records"):
+                for rows in (df, df.iloc[:0]):
+                    blob_client = FakeBlobClient()
+                    upload_dataframe(blob_client, rows, orient=orient)
+
+                    self.assertEqual(
+                        read_blob(blob_client).decode(), rows.to_json(orient=orient)
+                    )
+        finally:
+            storage.ROWS_PER_CHUNK = original
+
+    def test_compression(self):
+        blob_client = FakeBlobClient()
+        content = json.dumps([{"iniciativa_votacao_ps": "afavor"}] * 1_000).encode()
+
+        with BlockBlobWriter(blob_client, block_size=64) as writer:
+            writer.write(content)
+
+        self.assertEqual(gzip.decompress(blob_client.committed), content)
+        self.assertLess(len(blob_client.committed), len(content) / 10)
+        self.assertEqual(read_blob(blob_client), content)
+
+        # blobs stored before compression are read as they are
+        blob_client.committed = content
+        self.assertEqual(read_blob(blob_client), content)
@@ -0,0 +1,217 @@
+import threading
+import time
+from unittest import TestCase
+
+import pandas as pd
+
+from src.app.memory import compact, deep_memory_usage
+from src.app.store import LegislatureSnapshot, LegislatureStore, Tier
+
+
+def _snapshot(rows: int) -> LegislatureSnapshot:
+    votes = pd.DataFrame(
+        {
+            "iniciativa_titulo": [f"Projeto de lei {i}" for i in range(rows)],
+            "iniciativa_evento_fase": ["Votação na generalidade"] * rows,
+            "iniciativa_evento_data": pd.Timestamp("2023-01-01"),
+            "iniciativa_votacao_ps": ["afavor"] * rows,
+        }
+    )
+    return LegislatureSnapshot(
+        party_approvals={"Todos": pd.DataFrame({"total_iniciativas": [rows]})},
+        party_correlations={"Todos": pd.DataFrame({"nome": ["ps"]})},
+        initiative_votes=votes,
+        legislature_fields={"partidos": [{"nome": "PS"}]},
+    )
+
+
+class TestLegislatureStore(TestCase):
+    def test_deep_memory_usage(self):
+        df = pd.DataFrame({"a": ["x" * 100] * 10})
+
+        self.assertGreater(deep_memory_usage(df), 1000)
+        self.assertGreater(deep_memory_usage({"df": df}), deep_memory_usage(df))
+
+    def test_no_budget(self):
+        store = LegislatureStore(lambda leg: _snapshot(100))
+        store.load(["XV", "XIV"])
+
+        report = store.memory_report()
+
+        self.assertEqual(report["legislatures"]["XIV"]["tier"], Tier.RESIDENT)
+        self.assertIn("initiative_votes", report["legislatures"]["XV"]["objects"])
+        self.assertIs(store["XV"], store["XV"])
+
+    def test_budget(self):
+        loads = []
+
+        def loader(legislature):
+            loads.append(legislature)
+            return _snapshot(5_000)
+
+        # room for one legislature fully loaded plus one compacted
+        full = sum(_snapshot(5_000).memory_usage().values())
+        compacted = len(compact(_snapshot(5_000)))
+        store = LegislatureStore(loader, budget=full + int(compacted * 1.5))
+        store.load(["XVI", "XV", "XIV"])
+
+        tiers = {
+            leg: v["tier"] for leg, v in store.memory_report()["legislatures"].items()
+        }
+        self.assertEqual(tiers["XVI"], Tier.RESIDENT)
+        self.assertEqual(tiers["XV"], Tier.COMPACT)
+        self.assertEqual(tiers["XIV"], Tier.DEFERRED)
+        self.assertLessEqual(store.memory_report()["held_bytes"], store.budget)
+
+        # every tier still answers with the full data
+        pd.testing.assert_frame_equal(
+            store["XV"].initiative_votes, _snapshot(5_000).initiative_votes
+        )
+        loads.clear()
+        self.assertEqual(len(store["XIV"].initiative_votes), 5_000)
+        self.assertEqual(loads, ["XIV"])
+
+    def test_compact_restored_once(self):
+        full = sum(_snapshot(5_000).memory_usage().values())
+        store = LegislatureStore(lambda leg: _snapshot(5_000), budget=int(full * 1.5))
+        store.load(["XVI", "XV"])
+        self.assertEqual(store.memory_report()["legislatures"]["XV"]["tier"], "compact")
+
+        # restored once and shared, with the caches built on it
+        xv = store["XV"]
+        self.assertIs(store["XV"], xv)
+        report = store.memory_report()["legislatures"]["XV"]
+        self.assertGreater(report["held_bytes"], report["full_bytes"])
+
+        # evicted when another one is needed, restored again afterwards
+        store.load([], lazy=["XIV"])
+        store["XIV"]
+        self.assertIsNot(store["XV"], xv)
+        pd.testing.assert_frame_equal(
+            store["XV"].initiative_votes, _snapshot(5_000).initiative_votes
+        )
+
+    def test_lazy(self):
+        loads = []
+
+        def loader(legislature):
+            loads.append(legislature)
+            return _snapshot(5_000)
+
+        # room for the ongoing legislature plus a single closed one
+        full = sum(_snapshot(5_000).memory_usage().values())
+        store = LegislatureStore(loader, budget=int(full * 2.5))
+        store.load(["XVI"], lazy=["XV", "XIV"])
+
+        self.assertEqual(loads, ["XVI"])
+        self.assertEqual(store.memory_report()["legislatures"]["XIV"]["tier"], "lazy")
+
+        # loaded on first access, then kept while used
+        xiv = store["XIV"]
+        self.assertIs(store["XIV"], xiv)
+        self.assertEqual(loads, ["XVI", "XIV"])
+
+        # XV needs the room taken by XIV
+        store["XV"]
+        store["XIV"]
+        self.assertEqual(loads, ["XVI", "XIV", "XV", "XIV"])
+        self.assertLessEqual(store.memory_report()["held_bytes"], store.budget)
+
+    def test_lazy_idle(self):
+        loads = []
+
+        def loader(legislature):
+            loads.append(legislature)
+            return _snapshot(10)
+
+        store = LegislatureStore(loader, idle_seconds=0)
+        store.load([], lazy=["XIV", "XV"])
+
+        store["XIV"]
+        store["XV"]
+
+        self.assertEqual(store.memory_report()["legislatures"]["XIV"]["held_bytes"], 0)
+
+    def test_idle_single_legislature(self):
+        store = LegislatureStore(lambda leg: _snapshot(10), idle_seconds=0)
+        store.load([], lazy=["XIV"])
+
+        store["XIV"]
+        self.assertGreater(store.memory_report()["held_bytes"], 0)
+
+        # no other legislature is loaded, nor any request made
+        store.sweep()
+        self.assertEqual(store.memory_report()["held_bytes"], 0)
+
+        store["XIV"]
+        store.start_sweeper(0.01)
+        try:
+            for _ in range(100):
+                if not store.memory_report()["held_bytes"]:
+                    break
+                time.sleep(0.01)
+        finally:
+            store.stop_sweeper()
+        self.assertEqual(store.memory_report()["held_bytes"], 0)
+
+    def test_load_outside_lock(self):
+        loads = []
+        loading = threading.Event()
+        release = threading.Event()
+
+        def loader(legislature):
+            loads.append(legislature)
+            if legislature == "XIV":
+                loading.set()
+                release.wait(5)
+            return _snapshot(10)
+
+        store = LegislatureStore(loader)
+        store.load([], lazy=["XIV", "XV"])
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(store["XIV"]))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        loading.wait(5)
+
+        # other legislatures do not wait for XIV to be downloaded
+        store["XV"]
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        # loaded once, shared by the requests waiting for it
+        self.assertEqual(loads.count("XIV"), 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+
+    def test_reload(self):
+        loads = []
+
+        def loader(legislature):
+            loads.append(legislature)
+            return _snapshot(10)
+
+        store = LegislatureStore(loader)
+        store.load(["XVI", "XV"], lazy=["XIV"])
+        xvi, xv = store["XVI"], store["XV"]
+        store["XIV"]
+        loads.clear()
+
+        store.reload(["XVI", "XIV"])
+
+        # preloaded ones are replaced, the others loaded again on access
+        self.assertEqual(loads, ["XVI"])
+        self.assertIsNot(store["XVI"], xvi)
+        self.assertIs(store["XV"], xv)
+        store["XIV"]
+        self.assertEqual(loads, ["XVI", "XIV"])
+        self.assertEqual(
+            store.memory_report()["held_bytes"],
+            sum(
+                v["held_bytes"] for v in store.memory_report()["legislatures"].values()
+            ),
+        )